@@ -26,6 +26,8 @@ from scapy.utils import *
 from scapy.route import *
 from scapy.sendrecv import *
 from scapy.sessions import *
+from scapy.template import *
+from scapy.rawfilter import *
 from scapy.supersocket import *
 from scapy.volatile import *
 from scapy.as_resolvers import *
@@ -350,6 +350,7 @@ class L2bpfSocket(L2bpfListenSocket):
 
 
 class L3bpfSocket(L2bpfSocket):
+    raw_filter_support = True
 
     def recv(self, x=BPF_BUFFER_LENGTH):
         """Receive on layer 3"""
@@ -0,0 +1,472 @@
+# This file is part of Scapy
+# See http://www.secdev.org/projects/scapy for more information
+# This program is published under a GPLv2 license
+
+"""
+A classic BPF interpreter, used to filter packets without the kernel, e.g.
+when reading a capture file.
+"""
+
+import itertools
+import struct
+
+from scapy.error import Scapy_Exception
+from scapy.extlib import numpy
+from scapy.modules.six.moves import range
+
+# Typing imports
+from scapy.compat import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+# From pcap/bpf.h
+BPF_LD = 0x00
+BPF_LDX = 0x01
+BPF_ST = 0x02
+BPF_STX = 0x03
+BPF_ALU = 0x04
+BPF_JMP = 0x05
+BPF_RET = 0x06
+BPF_MISC = 0x07
+
+BPF_W = 0x00
+BPF_H = 0x08
+BPF_B = 0x10
+
+BPF_IMM = 0x00
+BPF_ABS = 0x20
+BPF_IND = 0x40
+BPF_MEM = 0x60
+BPF_LEN = 0x80
+BPF_MSH = 0xa0
+
+BPF_ADD = 0x00
+BPF_SUB = 0x10
+BPF_MUL = 0x20
+BPF_DIV = 0x30
+BPF_OR = 0x40
+BPF_AND = 0x50
+BPF_LSH = 0x60
+BPF_RSH = 0x70
+BPF_NEG = 0x80
+BPF_MOD = 0x90
+BPF_XOR = 0xa0
+
+BPF_JA = 0x00
+BPF_JEQ = 0x10
+BPF_JGT = 0x20
+BPF_JGE = 0x30
+BPF_JSET = 0x40
+
+BPF_K = 0x00
+BPF_X = 0x08
+BPF_A = 0x10
+
+BPF_TAX = 0x00
+BPF_TXA = 0x80
+
+BPF_MEMWORDS = 16
+BPF_MAXINSNS = 4096
+
+_SIZES = {BPF_W: 4, BPF_H: 2, BPF_B: 1}
+_LOADERS = {4: struct.Struct("!I"), 2: struct.Struct("!H"),
+            1: struct.Struct("!B")}
+_ALU_OPS = (BPF_ADD, BPF_SUB, BPF_MUL, BPF_DIV, BPF_OR, BPF_AND, BPF_LSH,
+            BPF_RSH, BPF_NEG, BPF_MOD, BPF_XOR)
+_JMP_OPS = (BPF_JA, BPF_JEQ, BPF_JGT, BPF_JGE, BPF_JSET)
+
+
+class BPFProgram(object):
+    """
+    A classic BPF program, run by a Python interpreter. The instructions are
+    (code, jt, jf, k) tuples, as built by libpcap::
+
+        >>> prog = BPFProgram.compile("udp port 53", DLT_EN10MB)
+        >>> prog.run(raw(Ether()/IP()/UDP()/DNS()))
+        262144
+
+    run() returns the number of bytes of the packet to keep, so 0 when
+    the packet does not match. The semantics are the ones of libpcap's
+    bpf_filter(): the loads out of the packet reject it, and the Linux
+    ancillary data (negative offsets) is not supported.
+
+    The programs can be cached in files, in the format of `tcpdump -ddd`,
+    with save() and load().
+
+    :param insns: the list of instructions
+    """
+
+    def __init__(self, insns):
+        # type: (Sequence[Tuple[int, int, int, int]]) -> None
+        self.insns = [(code, jt, jf, k & 0xffffffff)
+                      for code, jt, jf, k in insns]
+        self._validate()
+        # The instructions, with their fields split to be run faster
+        self._code = [(code & 0x07, code & 0xf8, jt, jf, k)
+                      for code, jt, jf, k in self.insns]
+
+    def _validate(self):
+        # type: () -> None
+        """Checks the program like libpcap's bpf_validate(): the jumps must
+        stay in the program, which ends with a return"""
+        if not self.insns or len(self.insns) > BPF_MAXINSNS:
+            raise Scapy_Exception("Invalid BPF program length %d" %
+                                  len(self.insns))
+        for pc, (code, jt, jf, k) in enumerate(self.insns):
+            cls, op = code & 0x07, code & 0xf8
+            valid = True
+            if cls in (BPF_LD, BPF_LDX):
+                mode = code & 0xe0
+                if cls == BPF_LD:
+                    valid = (code & 0x18) in _SIZES and \
+                        mode in (BPF_IMM, BPF_ABS, BPF_IND, BPF_MEM, BPF_LEN)
+                else:
+                    valid = op in (BPF_W | BPF_IMM, BPF_W | BPF_MEM,
+                                   BPF_W | BPF_LEN, BPF_B | BPF_MSH)
+                if mode == BPF_MEM:
+                    valid = valid and k < BPF_MEMWORDS
+            elif cls in (BPF_ST, BPF_STX):
+                valid = op == 0 and k < BPF_MEMWORDS
+            elif cls == BPF_ALU:
+                valid = (code & 0xf0) in _ALU_OPS
+                if op in (BPF_DIV, BPF_MOD):
+                    valid = valid and k != 0
+                elif op in (BPF_LSH, BPF_RSH):
+                    valid = valid and k < 32
+            elif cls == BPF_JMP:
+                if op == BPF_JA:
+                    valid = pc + 1 + k < len(self.insns)
+                else:
+                    valid = (code & 0xf0) in _JMP_OPS and \
+                        pc + 1 + max(jt, jf) < len(self.insns)
+            elif cls == BPF_RET:
+                valid = op in (BPF_K, BPF_A)
+            else:
+                valid = op in (BPF_TAX, BPF_TXA)
+            if not valid:
+                raise Scapy_Exception(
+                    "Invalid BPF instruction %d: %s" % (
+                        pc, self._format_insn(code, jt, jf, k))
+                )
+        if self.insns[-1][0] & 0x07 != BPF_RET:
+            raise Scapy_Exception("The BPF program must end with a return")
+
+    @classmethod
+    def compile(cls, filter_exp, linktype):
+        # type: (str, int) -> BPFProgram
+        """Compiles a filter expression for linktype, with libpcap"""
+        from scapy.arch.common import compile_filter
+        bpf = compile_filter(filter_exp, linktype=linktype)
+        return cls([(insn.code, insn.jt, insn.jf, insn.k)
+                    for insn in bpf.bf_insns[:bpf.bf_len]])
+
+    @classmethod
+    def load(cls, filename):
+        # type: (str) -> BPFProgram
+        """Loads a program from a file, written by save(), `tcpdump -ddd` or
+        `tcpdump -dd`"""
+        insns = []
+        with open(filename) as fdesc:
+            for line in fdesc:
+                fields = line.replace("{", " ").replace("}", " ")
+                fields = fields.replace(",", " ").split()
+                if len(fields) == 4:
+                    insns.append(tuple(int(f, 0) for f in fields))
+                elif len(fields) > 1:
+                    raise Scapy_Exception("Invalid BPF instruction %r" %
+                                          line.strip())
+        return cls(insns)  # type: ignore
+
+    def save(self, filename):
+        # type: (str) -> None
+        """Saves the program in the format of `tcpdump -ddd`"""
+        with open(filename, "w") as fdesc:
+            fdesc.write("%d\n" % len(self.insns))
+            for insn in self.insns:
+                fdesc.write("%d %d %d %d\n" % insn)
+
+    def run(self, data, wirelen=None):
+        # type: (bytes, Optional[int]) -> int
+        """Runs the program on the bytes of a packet, which was wirelen
+        bytes long on the wire. Returns the number of bytes to keep."""
+        buflen = len(data)
+        if wirelen is None:
+            wirelen = buflen
+        code = self._code
+        a = x = 0
+        mem = [0] * BPF_MEMWORDS
+        pc = 0
+        while True:
+            cls, op, jt, jf, k = code[pc]
+            pc += 1
+            if cls == BPF_JMP:
+                if op == BPF_JA:
+                    pc += k
+                    continue
+                v = x if op & BPF_X else k
+                op &= 0xf0
+                if op == BPF_JEQ:
+                    cond = a == v
+                elif op == BPF_JGT:
+                    cond = a > v
+                elif op == BPF_JGE:
+                    cond = a >= v
+                else:
+                    cond = bool(a & v)
+                pc += jt if cond else jf
+            elif cls == BPF_LD:
+                mode = op & 0xe0
+                if mode == BPF_ABS or mode == BPF_IND:
+                    off = k if mode == BPF_ABS else x + k
+                    size = _SIZES[op & 0x18]
+                    if off + size > buflen:
+                        return 0
+                    a = _LOADERS[size].unpack_from(data, off)[0]
+                elif mode == BPF_IMM:
+                    a = k
+                elif mode == BPF_LEN:
+                    a = wirelen
+                else:
+                    a = mem[k]
+            elif cls == BPF_RET:
+                return a if op == BPF_A else k
+            elif cls == BPF_ALU:
+                v = x if op & BPF_X else k
+                op &= 0xf0
+                if op == BPF_ADD:
+                    a = (a + v) & 0xffffffff
+                elif op == BPF_SUB:
+                    a = (a - v) & 0xffffffff
+                elif op == BPF_MUL:
+                    a = (a * v) & 0xffffffff
+                elif op == BPF_DIV or op == BPF_MOD:
+                    if v == 0:
+                        return 0
+                    a = a // v if op == BPF_DIV else a % v
+                elif op == BPF_OR:
+                    a |= v
+                elif op == BPF_AND:
+                    a &= v
+                elif op == BPF_XOR:
+                    a ^= v
+                elif op == BPF_LSH:
+                    a = (a << v) & 0xffffffff if v < 32 else 0
+                elif op == BPF_RSH:
+                    a = a >> v if v < 32 else 0
+                else:
+                    a = -a & 0xffffffff
+            elif cls == BPF_LDX:
+                mode = op & 0xe0
+                if mode == BPF_MSH:
+                    if k >= buflen:
+                        return 0
+                    x = (_LOADERS[1].unpack_from(data, k)[0] & 0xf) << 2
+                elif mode == BPF_IMM:
+                    x = k
+                elif mode == BPF_LEN:
+                    x = wirelen
+                else:
+                    x = mem[k]
+            elif cls == BPF_ST:
+                mem[k] = a
+            elif cls == BPF_STX:
+                mem[k] = x
+            elif op == BPF_TXA:
+                a = x
+            else:
+                x = a
+
+    def run_batch(self, buffers, wirelens=None):
+        # type: (Sequence[bytes], Optional[Sequence[int]]) -> List[int]
+        """Runs the program on many packets at once, and returns the list of
+        the results of run()
+
+        NumPy is used, when available, to run each instruction on all the
+        packets that reach it.
+        """
+        if numpy is None or not buffers:
+            if wirelens is None:
+                return [self.run(buf) for buf in buffers]
+            return [self.run(buf, wlen)
+                    for buf, wlen in zip(buffers, wirelens)]
+        n = len(buffers)
+        int64 = numpy.int64
+        lengths = numpy.fromiter((len(buf) for buf in buffers), dtype=int64,
+                                 count=n)
+        starts = numpy.zeros(n, dtype=int64)
+        numpy.cumsum(lengths[:-1], out=starts[1:])
+        data = numpy.frombuffer(b"".join(itertools.chain(buffers, [b"\0"])),
+                                dtype=numpy.uint8)
+        if wirelens is None:
+            wlens = lengths
+        else:
+            wlens = numpy.array(wirelens, dtype=int64)
+        a = numpy.zeros(n, dtype=int64)
+        x = numpy.zeros(n, dtype=int64)
+        mem = numpy.zeros((BPF_MEMWORDS, n), dtype=int64)
+        result = numpy.zeros(n, dtype=int64)
+        # The index of the next instruction of each packet, -1 once the
+        # program has returned. The jumps are forward, so each instruction
+        # only has to be run once, on all the packets that reach it.
+        pcs = numpy.zeros(n, dtype=int64)
+        for pc, (cls, op, jt, jf, k) in enumerate(self._code):
+            rows = numpy.flatnonzero(pcs == pc)
+            if not rows.size:
+                continue
+            pcs[rows] = pc + 1
+            if cls == BPF_JMP:
+                if op == BPF_JA:
+                    pcs[rows] += k
+                    continue
+                v = x[rows] if op & BPF_X else k
+                op &= 0xf0
+                if op == BPF_JEQ:
+                    cond = a[rows] == v
+                elif op == BPF_JGT:
+                    cond = a[rows] > v
+                elif op == BPF_JGE:
+                    cond = a[rows] >= v
+                else:
+                    cond = (a[rows] & v) != 0
+                pcs[rows] += numpy.where(cond, jt, jf)
+            elif cls == BPF_RET:
+                result[rows] = a[rows] if op == BPF_A else k
+                pcs[rows] = -1
+            elif cls in (BPF_LD, BPF_LDX):
+                mode = op & 0xe0
+                if mode in (BPF_ABS, BPF_IND, BPF_MSH):
+                    size = 1 if mode == BPF_MSH else _SIZES[op & 0x18]
+                    off = x[rows] + k if mode == BPF_IND else k
+                    inside = off + size <= lengths[rows]
+                    # The loads out of the packet reject it
+                    out = rows[~inside]
+                    result[out] = 0
+                    pcs[out] = -1
+                    rows = rows[inside]
+                    if mode == BPF_IND:
+                        off = off[inside]
+                    index = starts[rows] + off
+                    val = numpy.zeros(rows.size, dtype=int64)
+                    for i in range(size):
+                        val = (val << 8) | data[index + i]
+                    if mode == BPF_MSH:
+                        x[rows] = (val & 0xf) << 2
+                    else:
+                        a[rows] = val
+                    continue
+                if mode == BPF_IMM:
+                    val = k
+                elif mode == BPF_LEN:
+                    val = wlens[rows]
+                else:
+                    val = mem[k, rows]
+                if cls == BPF_LD:
+                    a[rows] = val
+                else:
+                    x[rows] = val
+            elif cls == BPF_ALU:
+                v = x[rows] if op & BPF_X else k
+                val = a[rows]
+                if op in (BPF_DIV | BPF_X, BPF_MOD | BPF_X):
+                    # The divisions by 0 reject the packet
+                    zero = v == 0
+                    result[rows[zero]] = 0
+                    pcs[rows[zero]] = -1
+                    rows, val, v = rows[~zero], val[~zero], v[~zero]
+                op &= 0xf0
+                if op in (BPF_DIV, BPF_MOD):
+                    val = val // v if op == BPF_DIV else val % v
+                elif op in (BPF_LSH, BPF_RSH):
+                    shift = numpy.minimum(v, 32)
+                    val = val << shift if op == BPF_LSH else val >> shift
+                elif op == BPF_ADD:
+                    val = val + v
+                elif op == BPF_SUB:
+                    val = val - v
+                elif op == BPF_MUL:
+                    # Multiply by 16-bit halves, not to overflow 64 bits
+                    val = val * (v & 0xffff) + \
+                        (((val * (v >> 16)) & 0xffff) << 16)
+                elif op == BPF_OR:
+                    val = val | v
+                elif op == BPF_AND:
+                    val = val & v
+                elif op == BPF_XOR:
+                    val = val ^ v
+                else:
+                    val = -val
+                a[rows] = val & 0xffffffff
+            elif cls == BPF_ST:
+                mem[k, rows] = a[rows]
+            elif cls == BPF_STX:
+                mem[k, rows] = x[rows]
+            elif op == BPF_TXA:
+                a[rows] = x[rows]
+            else:
+                x[rows] = a[rows]
+        return result.tolist()  # type: ignore
+
+    @staticmethod
+    def _format_insn(code, jt, jf, k):
+        # type: (int, int, int, int) -> str
+        return "{ 0x%02x, %d, %d, 0x%08x }" % (code, jt, jf, k)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.insns)
+
+    def __eq__(self, other):
+        # type: (Any) -> bool
+        return isinstance(other, BPFProgram) and self.insns == other.insns
+
+    def __ne__(self, other):
+        # type: (Any) -> bool
+        return not self == other
+
+    def __str__(self):
+        # type: () -> str
+        return "\n".join(self._format_insn(*insn) for insn in self.insns)
+
+    def __repr__(self):
+        # type: () -> str
+        return "<BPFProgram: %d instructions>" % len(self.insns)
+
+
+class BPFFilter(object):
+    """
+    A packet filter, run on the bytes of the packets: a filter expression,
+    compiled with libpcap for each link type, or a BPFProgram
+
+    :param flt: a filter expression, or a BPFProgram
+    """
+
+    def __init__(self, flt):
+        # type: (Union[str, BPFProgram]) -> None
+        self.filter = flt
+        self.programs = {}  # type: Dict[int, BPFProgram]
+
+    def program(self, linktype):
+        # type: (int) -> BPFProgram
+        """Returns the program for the packets of linktype"""
+        if isinstance(self.filter, BPFProgram):
+            return self.filter
+        prog = self.programs.get(linktype)
+        if prog is None:
+            prog = self.programs[linktype] = BPFProgram.compile(self.filter,
+                                                                linktype)
+        return prog
+
+    def __call__(self, data, wirelen, linktype):
+        # type: (bytes, Optional[int], int) -> bool
+        """Returns True when the packet matches the filter"""
+        return self.program(linktype).run(data, wirelen) != 0
+
+    def __repr__(self):
+        # type: () -> str
+        return "<BPFFilter %r>" % (self.filter,)
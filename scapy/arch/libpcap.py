@@ -454,6 +454,7 @@ if conf.use_pcap:
 
     class L3pcapSocket(L2pcapSocket):
         desc = "read/write packets at layer 3 using only libpcap"
+        raw_filter_support = True
 
         def recv(self, x=MTU):
             r = L2pcapSocket.recv(self, x)
@@ -12,7 +12,9 @@ from __future__ import absolute_import
 
 import array
 import ctypes
+import errno
 from fcntl import ioctl
+import mmap
 import os
 from select import select
 import socket
@@ -79,6 +81,8 @@ PACKET_DROP_MEMBERSHIP = 2
 PACKET_RECV_OUTPUT = 3
 PACKET_RX_RING = 5
 PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+PACKET_FANOUT = 18
 PACKET_MR_MULTICAST = 0
 PACKET_MR_PROMISC = 1
 PACKET_MR_ALLMULTI = 2
@@ -100,6 +104,20 @@ PACKET_AUXDATA = 8
 PACKET_FASTROUTE = 6  # Fastrouted frame
 # Unused, PACKET_FASTROUTE and PACKET_LOOPBACK are invisible to user space
 
+# From linux/if_packet.h, for the memory-mapped rings
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1 << 0
+TP_STATUS_VLAN_VALID = 1 << 4
+TP_STATUS_VLAN_TPID_VALID = 1 << 6
+ETH_P_8021Q = 0x8100
+
+# From linux/if_packet.h, for PACKET_FANOUT
+PACKET_FANOUT_HASH = 0
+PACKET_FANOUT_LB = 1
+PACKET_FANOUT_CPU = 2
+PACKET_FANOUT_FLAG_DEFRAG = 0x8000
+
 # Utils
 
 
@@ -167,6 +185,29 @@ def set_promisc(s, iff, val=1):
     s.setsockopt(SOL_PACKET, cmd, mreq)
 
 
+def set_fanout(s, group_id, mode="hash"):
+    """
+    Adds a bound PF_PACKET socket to a PACKET_FANOUT group. The packets
+    received by the group are spread between its sockets.
+
+    :param s: the python socket
+    :param group_id: the 16 bits identifier of the group
+    :param mode: "hash" (the packets of a flow are received by the same
+        socket, IP fragments are reassembled first), "lb" (round-robin) or
+        "cpu" (the socket depends on the CPU that received the packet)
+    """
+    try:
+        fanout = {
+            "hash": PACKET_FANOUT_HASH | PACKET_FANOUT_FLAG_DEFRAG,
+            "lb": PACKET_FANOUT_LB,
+            "cpu": PACKET_FANOUT_CPU,
+        }[mode]
+    except KeyError:
+        raise Scapy_Exception("Unknown fanout mode [%s]" % mode)
+    s.setsockopt(SOL_PACKET, PACKET_FANOUT,
+                 struct.pack("I", (group_id & 0xffff) | (fanout << 16)))
+
+
 def get_alias_address(iface_name, ip_mask, gw_str, metric):
     """
     Get the correct source IP address of an interface alias
@@ -420,6 +461,165 @@ else:
         return s + us / 1000000.0
 
 
+# The symbols of the libc, e.g. sendmmsg()
+LIBC = ctypes.CDLL(None, use_errno=True)
+# The maximum number of messages of a sendmmsg() call
+UIO_MAXIOV = 1024
+# The native formats of struct iovec, and of struct mmsghdr (a struct msghdr
+# and its msg_len). They are packed with struct rather than built with
+# ctypes, which costs more than the system calls that are saved.
+_IOVEC_FMT = "PN"
+_MMSGHDR_FMT = "PIPNPNi0PI0P"
+
+
+def _sendmmsg(sock, datas, addrs=None):
+    """Sends the messages of datas, to the struct sockaddr of addrs if
+    set, with a single sendmmsg() system call.
+
+    :returns: the number of messages sent
+    :raises socket.error: if the first message could not be sent
+    """
+    n = min(len(datas), UIO_MAXIOV)
+    # The messages are copied to a single buffer
+    buf = b"".join(datas[:n])
+    addr = ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p).value
+    iovs = []
+    for data in datas[:n]:
+        iovs += (addr, len(data))
+        addr += len(data)
+    iovs = struct.pack("@" + _IOVEC_FMT * n, *iovs)
+    iov_addr = ctypes.cast(ctypes.c_char_p(iovs), ctypes.c_void_p).value
+    iov_size = struct.calcsize("@" + _IOVEC_FMT)
+    if addrs is None:
+        names = b""
+        name_addr = name_len = 0
+    else:
+        # The addresses have the same size
+        names = b"".join(addrs[:n])
+        name_addr = ctypes.cast(ctypes.c_char_p(names),
+                                ctypes.c_void_p).value
+        name_len = len(addrs[0])
+    msgs = []
+    for i in range(n):
+        msgs += (name_addr and name_addr + i * name_len, name_len,
+                 iov_addr + i * iov_size, 1, 0, 0, 0, 0)
+    msgs = ctypes.create_string_buffer(
+        struct.pack("@" + _MMSGHDR_FMT * n, *msgs)
+    )
+    ret = LIBC.sendmmsg(sock.fileno(), msgs, n, 0)
+    if ret < 0:
+        err = ctypes.get_errno()
+        raise socket.error(err, os.strerror(err))
+    return ret
+
+
+class _RecvmmsgBuffers(object):
+    """The buffers of the messages received by a recvmmsg() system call:
+    n packets of up to size bytes, their struct sockaddr_ll and their
+    ancillary data. They are allocated once, and reused by each call."""
+    name_size = 32
+    control_size = 256
+
+    def __init__(self, n, size=MTU):
+        self.n = n
+        self.size = size
+        self.datas = ctypes.create_string_buffer(n * size)
+        self.names = ctypes.create_string_buffer(n * self.name_size)
+        self.controls = ctypes.create_string_buffer(n * self.control_size)
+        data_addr = ctypes.addressof(self.datas)
+        iovs = []
+        for i in range(n):
+            iovs += (data_addr + i * size, size)
+        self.iovs = ctypes.create_string_buffer(
+            struct.pack("@" + _IOVEC_FMT * n, *iovs)
+        )
+        iov_addr = ctypes.addressof(self.iovs)
+        iov_size = struct.calcsize("@" + _IOVEC_FMT)
+        name_addr = ctypes.addressof(self.names)
+        control_addr = ctypes.addressof(self.controls)
+        # msg_namelen and msg_controllen are set by the kernel, so the
+        # headers are packed again before each call
+        self.values = []
+        for i in range(n):
+            self.values += (name_addr + i * self.name_size, self.name_size,
+                            iov_addr + i * iov_size, 1,
+                            control_addr + i * self.control_size,
+                            self.control_size, 0, 0)
+        self.hdrs = struct.Struct("@" + _MMSGHDR_FMT * n)
+        self.msgs = ctypes.create_string_buffer(self.hdrs.size)
+        self.cmsghdr = struct.Struct("@Nii")
+        self.cmsg_align = struct.calcsize("@N")
+
+    def recv(self, sock, n):
+        """Receives up to n messages without waiting, with a single
+        recvmmsg() system call.
+
+        :returns: a list of (data, sll_pkttype, ancdata)
+        :raises socket.error: on failure
+        """
+        n = min(n, self.n)
+        self.hdrs.pack_into(self.msgs, 0, *self.values)
+        ret = LIBC.recvmmsg(sock.fileno(), self.msgs, n, socket.MSG_DONTWAIT,
+                            None)
+        if ret < 0:
+            err = ctypes.get_errno()
+            if err in [errno.EAGAIN, errno.EWOULDBLOCK]:
+                return []
+            raise socket.error(err, os.strerror(err))
+        values = self.hdrs.unpack_from(self.msgs)
+        datas = memoryview(self.datas).cast("B")
+        names = memoryview(self.names).cast("B")
+        controls = memoryview(self.controls).cast("B")
+        unpack_cmsghdr = self.cmsghdr.unpack_from
+        hdr_len = socket.CMSG_LEN(0)
+        align = self.cmsg_align
+        msgs = []
+        for i in range(ret):
+            offset = i * self.size
+            length = min(values[i * 8 + 7], self.size)
+            # struct sockaddr_ll: sll_pkttype
+            pkttype = names[i * self.name_size + 10]
+            # The struct cmsghdr of the control buffer
+            ancdata = []
+            j = i * self.control_size
+            end = j + values[i * 8 + 5]
+            while j + hdr_len <= end:
+                cmsg_len, cmsg_lvl, cmsg_type = unpack_cmsghdr(controls, j)
+                if cmsg_len < hdr_len:
+                    break
+                ancdata.append((cmsg_lvl, cmsg_type,
+                                controls[j + hdr_len:j + cmsg_len].tobytes()))
+                j += -(-cmsg_len // align) * align
+            msgs.append((datas[offset:offset + length].tobytes(), pkttype,
+                         ancdata))
+        return msgs
+
+
+def _dissect_frames(cls, frames, raw_filter=None):
+    """Dissects the (data, time) of frames as cls packets, skipping the
+    ones that do not match raw_filter"""
+    if raw_filter is not None:
+        linktype = conf.l2types.layer2num.get(cls)
+        frames = [(data, ts) for data, ts in frames
+                  if raw_filter(data, len(data), linktype)]
+    pkts = []
+    for data, ts in frames:
+        try:
+            pkt = cls(data)
+        except KeyboardInterrupt:
+            raise
+        except Exception:
+            if conf.debug_dissector:
+                from scapy.sendrecv import debug
+                debug.crashed_on = (cls, data)
+                raise
+            pkt = conf.raw_layer(data)
+        if ts:
+            pkt.time = ts
+        pkts.append(pkt)
+    return pkts
+
+
 def _flush_fd(fd):
     if hasattr(fd, 'fileno'):
         fd = fd.fileno()
@@ -433,12 +633,16 @@ def _flush_fd(fd):
 
 class L2Socket(SuperSocket):
     desc = "read/write packets at layer 2 using Linux PF_PACKET sockets"
+    # The number of packets received by a recvmmsg() call of recv_many()
+    recv_batch = 64
+    _recv_buffers = None
 
     def __init__(self, iface=None, type=ETH_P_ALL, promisc=None, filter=None,
                  nofilter=0, monitor=None):
         self.iface = network_name(iface or conf.iface)
         self.type = type
         self.promisc = conf.sniff_promisc if promisc is None else promisc
+        self._stats = [0, 0]
         if monitor is not None:
             log_runtime.info(
                 "The 'monitor' argument has no effect on native linux sockets."
@@ -519,6 +723,33 @@ class L2Socket(SuperSocket):
             ts = get_last_packet_timestamp(self.ins)
         return self.LL, pkt, ts
 
+    def recv_many(self, max_count=None, timeout=None):
+        """Returns the packets available, up to max_count (by default, the
+        ones of a single system call), after waiting up to timeout s
+        (forever if None) for the first one. They are received with
+        recvmmsg() system calls."""
+        if not self.auxdata_available or not hasattr(LIBC, "recvmmsg"):
+            return SuperSocket.recv_many(self, max_count, timeout)
+        if not select([self.ins], [], [], timeout)[0]:
+            return []
+        if self._recv_buffers is None:
+            self._recv_buffers = _RecvmmsgBuffers(self.recv_batch)
+        frames = []
+        received = 0
+        while True:
+            n = self.recv_batch
+            if max_count is not None:
+                n = min(n, max_count - received)
+            msgs = self._recv_buffers.recv(self.ins, n)
+            received += len(msgs)
+            for data, pkttype, ancdata in msgs:
+                if self.outs and pkttype == socket.PACKET_OUTGOING:
+                    continue
+                frames.append(self._process_ancdata(data, ancdata))
+            if max_count is None or len(msgs) < n or received >= max_count:
+                break
+        return _dissect_frames(self.LL, frames, self.raw_filter)
+
     def send(self, x):
         try:
             return SuperSocket.send(self, x)
@@ -531,6 +762,38 @@ class L2Socket(SuperSocket):
                     return SuperSocket.send(self, raw(x) + padding)
             raise
 
+    def send_many(self, x):
+        """Sends the packets, or bytes, of x with sendmmsg() system calls.
+        Returns the number of packets sent."""
+        if not hasattr(LIBC, "sendmmsg"):
+            return SuperSocket.send_many(self, x)
+        pkts = list(x)
+        datas = [raw(p) for p in pkts]
+        now = time.time()
+        for p in pkts:
+            if isinstance(p, Packet):
+                p.sent_time = now
+        i = 0
+        while i < len(datas):
+            try:
+                i += _sendmmsg(self.outs, datas[i:i + UIO_MAXIOV])
+            except socket.error:
+                # Sent alone, to be handled as send() does, e.g. padded
+                self.send(pkts[i])
+                i += 1
+        return i
+
+    def get_stats(self):
+        """Get received / dropped statistics, since the socket was opened"""
+        # struct tpacket_stats, or the beginning of struct
+        # tpacket_stats_v3. The kernel resets them when read.
+        packets, drops = struct.unpack("2I", self.ins.getsockopt(
+            SOL_PACKET, PACKET_STATISTICS, 8
+        ))
+        self._stats[0] += packets
+        self._stats[1] += drops
+        return tuple(self._stats)
+
 
 class L2ListenSocket(L2Socket):
     desc = "read packets at layer 2 using Linux PF_PACKET sockets. Also receives the packets going OUT"  # noqa: E501
@@ -538,9 +801,138 @@ class L2ListenSocket(L2Socket):
     def send(self, x):
         raise Scapy_Exception("Can't send anything with L2ListenSocket")
 
+    def send_many(self, x):
+        raise Scapy_Exception("Can't send anything with L2ListenSocket")
+
+
+class L2RingSocket(L2ListenSocket):
+    """Reads packets at layer 2 from a TPACKET_V3 memory-mapped ring
+
+    The kernel writes the packets in the blocks of the ring, shared with
+    the process: the packets of a block are read without any system call,
+    and the block is handed back to the kernel once all of them have been
+    read. A block is handed to the process when it is full, or after
+    block_timeout ms. The ring is block_size * block_nr bytes long, and
+    block_size (a multiple of the page size) is the maximum size of a
+    frame.
+
+    It can be used as conf.L2listen, or passed to sniff()::
+
+        >>> sniff(iface="eth0", L2socket=L2RingSocket, count=10)
+    """
+    desc = "read packets at layer 2 using a Linux PF_PACKET socket with a TPACKET_V3 memory-mapped ring"  # noqa: E501
+    # struct tpacket3_hdr, up to tp_net, then hv1.tp_vlan_tci and
+    # hv1.tp_vlan_tpid
+    _frame_hdr = struct.Struct("IIIIIIHH")
+    _vlan_hdr = struct.Struct("IH")
+
+    def __init__(self, iface=None, type=ETH_P_ALL, promisc=None, filter=None,
+                 nofilter=0, monitor=None, block_size=1 << 20, block_nr=16,
+                 block_timeout=10):
+        self.ring = None
+        L2ListenSocket.__init__(self, iface=iface, type=type, promisc=promisc,
+                                filter=filter, nofilter=nofilter,
+                                monitor=monitor)
+        self.block_size = block_size
+        self.block_nr = block_nr
+        # The frame size only matters to the checks of the kernel
+        frame_size = 2048
+        try:
+            self.ins.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            # struct tpacket_req3
+            self.ins.setsockopt(SOL_PACKET, PACKET_RX_RING, struct.pack(
+                "7I", block_size, block_nr, frame_size,
+                block_size // frame_size * block_nr, block_timeout, 0, 0
+            ))
+            self.ring = mmap.mmap(self.ins.fileno(), block_size * block_nr,
+                                  mmap.MAP_SHARED,
+                                  mmap.PROT_READ | mmap.PROT_WRITE)
+        except (OSError, socket.error, ValueError) as ex:
+            self.close()
+            raise Scapy_Exception("Cannot set up the TPACKET_V3 ring: %s" %
+                                  ex)
+        # The current block, its remaining packets, and the next one
+        self._block = 0
+        self._remaining = 0
+        self._frame = 0
+
+    def _next_block(self):
+        """Hands the current block back to the kernel, then moves to the
+        next one if it was handed to the process. Returns False otherwise.
+        """
+        ring = self.ring
+        offset = self._block * self.block_size
+        if self._frame:
+            # struct tpacket_block_desc: hdr.bh1.block_status
+            struct.pack_into("I", ring, offset + 8, TP_STATUS_KERNEL)
+            self._block = (self._block + 1) % self.block_nr
+            offset = self._block * self.block_size
+            self._frame = 0
+        status, num_pkts, first = struct.unpack_from("III", ring, offset + 8)
+        if not status & TP_STATUS_USER:
+            return False
+        self._remaining = num_pkts
+        self._frame = offset + first
+        return True
+
+    def _available(self):
+        return bool(self._remaining) or self._next_block()
+
+    def _read_frames(self, max_count=None, timeout=None):
+        """Returns up to max_count (data, time) of the frames of the
+        ring, after waiting up to timeout s for the first one"""
+        frames = []
+        if not self._available():
+            if not select([self.ins], [], [], timeout)[0] or \
+                    not self._available():
+                return frames
+        ring = self.ring
+        unpack_hdr = self._frame_hdr.unpack_from
+        while max_count is None or len(frames) < max_count:
+            if not self._remaining and not self._next_block():
+                break
+            frame = self._frame
+            (next_offset, sec, nsec, snaplen, _, status, mac,
+             _) = unpack_hdr(ring, frame)
+            data = ring[frame + mac:frame + mac + snaplen]
+            if status & TP_STATUS_VLAN_VALID:
+                tci, tpid = self._vlan_hdr.unpack_from(ring, frame + 32)
+                if not status & TP_STATUS_VLAN_TPID_VALID:
+                    tpid = ETH_P_8021Q
+                data = data[:12] + struct.pack("!HH", tpid, tci) + data[12:]
+            frames.append((data, sec + nsec * 1e-9))
+            self._remaining -= 1
+            if self._remaining:
+                self._frame = frame + next_offset
+        return frames
+
+    def recv_raw(self, x=MTU):
+        """Receives a packet from the ring, then returns a tuple containing
+        (cls, pkt_data, time)"""
+        frames = self._read_frames(1)
+        if not frames:
+            return None, None, None
+        data, ts = frames[0]
+        return self.LL, data, ts
+
+    def recv_many(self, max_count=None, timeout=None):
+        """Returns the packets of the ring, up to max_count, after waiting
+        up to timeout s (forever if None) for the first one"""
+        return _dissect_frames(self.LL, self._read_frames(max_count, timeout),
+                               self.raw_filter)
+
+    def close(self):
+        if self.closed:
+            return
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        L2ListenSocket.close(self)
+
 
 class L3PacketSocket(L2Socket):
     desc = "read/write packets at layer 3 using Linux PF_PACKET sockets"
+    raw_filter_support = True
 
     def recv(self, x=MTU):
         pkt = SuperSocket.recv(self, x)
@@ -549,24 +941,43 @@ class L3PacketSocket(L2Socket):
             return pkt.payload
         return pkt
 
-    def send(self, x):
+    def recv_many(self, max_count=None, timeout=None):
+        pkts = L2Socket.recv_many(self, max_count, timeout)
+        if self.lvl == 2 and self.auxdata_available:
+            for pkt in pkts:
+                pkt.payload.time = pkt.time
+            return [pkt.payload for pkt in pkts]
+        return pkts
+
+    def _prepare(self, x, hatypes=None):
+        """Returns the bytes of x with its link layer, the address to send
+        it to, and the function that adds the link layer. The hardware
+        types of the interfaces are cached in hatypes if set."""
         iff = x.route()[0]
         if iff is None:
             iff = conf.iface
         sdto = (iff, self.type)
-        self.outs.bind(sdto)
-        sn = self.outs.getsockname()
+        if hatypes is not None and iff in hatypes:
+            hatype = hatypes[iff]
+        else:
+            self.outs.bind(sdto)
+            hatype = self.outs.getsockname()[3]
+            if hatypes is not None:
+                hatypes[iff] = hatype
         ll = lambda x: x
         type_x = type(x)
         if type_x in conf.l3types:
             sdto = (iff, conf.l3types[type_x])
-        if sn[3] in conf.l2types:
-            ll = lambda x: conf.l2types[sn[3]]() / x
+        if hatype in conf.l2types:
+            ll = lambda x: conf.l2types[hatype]() / x
         if self.lvl == 3 and type_x != self.LL:
             warning("Incompatible L3 types detected using %s instead of %s !",
                     type_x, self.LL)
             self.LL = type_x
-        sx = raw(ll(x))
+        return raw(ll(x)), sdto, ll
+
+    def send(self, x):
+        sx, sdto, ll = self._prepare(x)
         x.sent_time = time.time()
         try:
             self.outs.sendto(sx, sdto)
@@ -579,6 +990,45 @@ class L3PacketSocket(L2Socket):
             else:
                 raise
 
+    def send_many(self, x):
+        """Sends the packets of x with sendmmsg() system calls. Returns the
+        number of packets sent."""
+        if not hasattr(LIBC, "sendmmsg"):
+            return SuperSocket.send_many(self, x)
+        pkts = list(x)
+        hatypes = {}
+        sockaddrs = {}
+        datas = []
+        addrs = []
+        for p in pkts:
+            sx, sdto, _ = self._prepare(p, hatypes)
+            datas.append(sx)
+            if sdto not in sockaddrs:
+                iff, proto = sdto
+                # struct sockaddr_ll
+                sockaddrs[sdto] = struct.pack(
+                    "HHiHBB8s", socket.AF_PACKET, socket.htons(proto),
+                    get_if_index(iff), 0, 0, 0, b""
+                )
+            addrs.append(sockaddrs[sdto])
+        if len(hatypes) > 1:
+            # Bound to the interface of the last packet, as by send()
+            self.outs.bind((sdto[0], self.type))
+        now = time.time()
+        for p in pkts:
+            p.sent_time = now
+        i = 0
+        while i < len(datas):
+            try:
+                i += _sendmmsg(self.outs, datas[i:i + UIO_MAXIOV],
+                               addrs[i:i + UIO_MAXIOV])
+            except socket.error:
+                # Sent alone, to be handled as send() does, e.g. padded or
+                # fragmented
+                self.send(pkts[i])
+                i += 1
+        return i
+
 
 class VEthPair(object):
     """
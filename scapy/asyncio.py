@@ -0,0 +1,415 @@
+# This file is part of Scapy
+# See http://www.secdev.org/projects/scapy for more information
+# This program is published under a GPLv2 license
+
+"""
+asyncio versions of sniff(), send() and sr(), that read the sockets from an
+event loop with loop.add_reader(), without threads. Python 3.6+ only.
+
+    >>> from scapy.asyncio import asniff, asr
+    >>> async def main():
+    ...     async for pkt in asniff(iface="eth0", count=10):
+    ...         print(pkt.summary())
+    ...     ans, unans = await asr(IP(dst="192.0.2.1")/ICMP(), timeout=1)
+    >>> asyncio.get_event_loop().run_until_complete(main())
+
+Many concurrent sr() calls can share an AsyncSocket: each received packet is
+only matched with the sent packets that have the same hashret().
+"""
+
+from __future__ import absolute_import, print_function
+import asyncio
+import itertools
+
+from scapy.base_classes import Gen, SetGen
+from scapy.config import conf
+from scapy.data import ETH_P_ALL
+from scapy.error import log_runtime
+from scapy.interfaces import resolve_iface
+from scapy.plist import PacketList, SndRcvList
+from scapy.sendrecv import SndRcvHandler, _batches, _interface_selection
+from scapy.supersocket import StreamSocket
+
+# The maximum number of packets read from a socket, each time it is ready
+_RECV_BATCH = 256
+
+
+class _AsyncSndRcv(SndRcvHandler):
+    """The matching of the answers of SndRcvHandler, without its sending
+    and sniffing threads. It is fed by an AsyncSocket."""
+
+    def __init__(self, multi=False, verbose=0):
+        self.hsent = {}
+        self.ans = []
+        self.nbrecv = 0
+        self.notans = 0
+        self.multi = multi
+        self.verbose = verbose
+        self.done = asyncio.Event()
+
+    def _match(self, r, h=None):
+        SndRcvHandler._match(self, r, h)
+        if self.notans <= 0 and not self.multi:
+            self.done.set()
+
+
+class AsyncSocket(object):
+    """
+    Reads a SuperSocket from an asyncio event loop, with loop.add_reader().
+    The received packets are dispatched to the pending sr() calls and
+    sniff() iterators, so that they can share the socket.
+
+    The socket must have a file descriptor, e.g. L2Socket, L3PacketSocket
+    or StreamSocket. The packets are sent with blocking calls, between
+    which the other tasks run.
+
+    :param sock: the SuperSocket
+    :param loop: the event loop (by default, the current one)
+    """
+
+    def __init__(self, sock, loop=None):
+        self.sock = sock
+        self.loop = loop or asyncio.get_event_loop()
+        # The queues of the sniff() iterators
+        self.queues = set()
+        # {hashret: set of the _AsyncSndRcv that sent such packets}
+        self.handlers = {}
+        self.reading = False
+        self.closed = False
+        # The exception that stopped the reading of the socket, raised by
+        # the pending and next calls
+        self.error = None
+
+    def _update_reader(self):
+        """Only reads the socket when packets are expected"""
+        expected = bool(self.queues or self.handlers) and not self.closed
+        if expected and not self.reading:
+            self.loop.add_reader(self.sock.fileno(), self._on_readable)
+        elif not expected and self.reading:
+            self.loop.remove_reader(self.sock.fileno())
+        self.reading = expected
+
+    def _on_readable(self):
+        try:
+            pkts = self.sock.recv_many(max_count=_RECV_BATCH, timeout=0)
+            if not pkts and isinstance(self.sock, StreamSocket):
+                # The connection was closed
+                raise EOFError
+        except EOFError:
+            self.close()
+            return
+        except Exception as ex:
+            log_runtime.exception("Socket %s failed", self.sock)
+            self.error = ex
+            self.close()
+            return
+        for p in pkts:
+            for queue in self.queues:
+                queue.put_nowait(p)
+            if self.handlers:
+                h = p.hashret()
+                for handler in list(self.handlers.get(h, ())):
+                    handler._match(p, h)
+
+    async def send(self, x, inter=0, count=None, verbose=None):
+        """Sends the packets of x, like send(). Returns the number of packets
+        sent.
+
+        :param inter: time (in s) between two packets
+        :param count: number of times to send the packets
+        :param verbose: print the number of packets sent
+        """
+        if verbose is None:
+            verbose = conf.verb
+        if not isinstance(x, Gen):
+            x = SetGen(x)
+        if count is not None:
+            x = itertools.chain.from_iterable(itertools.repeat(x, count))
+        n = 0
+        if inter:
+            for p in x:
+                self.sock.send(p)
+                n += 1
+                await asyncio.sleep(inter)
+        else:
+            for batch in _batches(x):
+                n += self.sock.send_many(batch)
+                # Let the other tasks run
+                await asyncio.sleep(0)
+        if verbose:
+            print("\nSent %i packets." % n)
+        return n
+
+    async def sr(self, x, timeout=None, inter=0, multi=False, retry=0,
+                 verbose=None):
+        """Sends the packets of x and receives their answers, like sr().
+        Returns (answered, unanswered).
+
+        :param timeout: how much time to wait after the last packet has
+            been sent (forever if None)
+        :param inter: time (in s) between two packets
+        :param multi: whether to accept multiple answers for the same
+            stimulus
+        :param retry: if positive, how many times to resend unanswered
+            packets. if negative, how many times to retry when no more
+            packets are answered
+        :param verbose: set verbosity level
+        """
+        if self.error is not None:
+            raise self.error
+        if verbose is None:
+            verbose = conf.verb
+        handler = _AsyncSndRcv(multi=multi, verbose=verbose)
+        tobesent = list(x if isinstance(x, Gen) else SetGen(x))
+        handler.notans = len(tobesent)
+        if retry < 0:
+            autostop = retry = -retry
+        else:
+            autostop = 0
+        while retry >= 0:
+            handler.hsent = {}
+            try:
+                for batch in _batches(tobesent, 1 if inter else 256):
+                    # Populate the dispatching dictionary before sending,
+                    # not to miss an answer
+                    for p in batch:
+                        h = p.hashret()
+                        handler.hsent.setdefault(h, []).append(p)
+                        self.handlers.setdefault(h, set()).add(handler)
+                    self._update_reader()
+                    self.sock.send_many(batch)
+                    await asyncio.sleep(inter)
+                if handler.notans > 0 or multi:
+                    await asyncio.wait_for(handler.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                for h in handler.hsent:
+                    handlers = self.handlers.get(h)
+                    if handlers is not None:
+                        handlers.discard(handler)
+                        if not handlers:
+                            del self.handlers[h]
+                self._update_reader()
+            if multi:
+                remain = [
+                    p for p in itertools.chain(*handler.hsent.values())
+                    if not hasattr(p, '_answered')
+                ]
+            else:
+                remain = list(itertools.chain(*handler.hsent.values()))
+            if autostop and len(remain) > 0 and \
+               len(remain) != len(tobesent):
+                retry = autostop
+            tobesent = remain
+            if self.error is not None:
+                raise self.error
+            if len(tobesent) == 0 or self.closed:
+                break
+            retry -= 1
+        if multi:
+            for snd, _ in handler.ans:
+                if hasattr(snd, '_answered'):
+                    del snd._answered
+        if verbose:
+            print(
+                "\nReceived %i packets, got %i answers, "
+                "remaining %i packets" % (
+                    handler.nbrecv + len(handler.ans), len(handler.ans),
+                    handler.notans
+                )
+            )
+        return SndRcvList(handler.ans), PacketList(remain, "Unanswered")
+
+    async def sniff(self, count=0, timeout=None, lfilter=None):
+        """Yields the received packets, like sniff().
+
+        :param count: number of packets to capture. 0 means infinity
+        :param timeout: stop sniffing after a given time
+        :param lfilter: python function applied to each packet to determine
+            if it is yielded
+        """
+        queue = asyncio.Queue()
+        self.queues.add(queue)
+        self._update_reader()
+        if timeout is not None:
+            stoptime = self.loop.time() + timeout
+        remain = None
+        n = 0
+        try:
+            while not self.closed and (not count or n < count):
+                if timeout is not None:
+                    remain = stoptime - self.loop.time()
+                    if remain <= 0:
+                        break
+                try:
+                    p = await asyncio.wait_for(queue.get(), remain)
+                except asyncio.TimeoutError:
+                    break
+                if p is None:
+                    # The socket was closed
+                    break
+                if lfilter and not lfilter(p):
+                    continue
+                n += 1
+                yield p
+        finally:
+            self.queues.discard(queue)
+            self._update_reader()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """Stops reading the socket, then closes it. The pending sr() calls
+        and sniff() iterators end, or raise the error of the socket."""
+        if self.closed:
+            return
+        self.closed = True
+        self._update_reader()
+        for queue in self.queues:
+            queue.put_nowait(None)
+        for handlers in self.handlers.values():
+            for handler in handlers:
+                handler.done.set()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+async def asniff(iface=None, count=0, timeout=None, lfilter=None,
+                 opened_socket=None, L2socket=None, **kargs):
+    """Yields the packets received by an interface, like sniff()::
+
+        >>> async for pkt in asniff(iface="eth0", count=10):
+        ...     print(pkt.summary())
+
+    :param iface: interface to sniff on (default: conf.iface)
+    :param count: number of packets to capture. 0 means infinity
+    :param timeout: stop sniffing after a given time
+    :param lfilter: python function applied to each packet to determine
+        if it is yielded
+    :param opened_socket: an AsyncSocket, or a SuperSocket, to sniff on
+    :param L2socket: the socket class to use (default: conf.L2listen)
+
+    The other keyword arguments (e.g. filter) are passed to the socket.
+    """
+    sock = opened_socket
+    if sock is None:
+        iface = resolve_iface(iface or conf.iface)
+        L2socket = L2socket or iface.l2listen()
+        sock = L2socket(type=ETH_P_ALL, iface=iface, **kargs)
+    if not isinstance(sock, AsyncSocket):
+        sock = AsyncSocket(sock)
+    try:
+        async for p in sock.sniff(count=count, timeout=timeout,
+                                  lfilter=lfilter):
+            yield p
+    finally:
+        if opened_socket is None:
+            sock.close()
+
+
+async def _asend(x, sock, need_closing, inter=0, count=None, verbose=None):
+    if not isinstance(sock, AsyncSocket):
+        sock = AsyncSocket(sock)
+    try:
+        return await sock.send(x, inter=inter, count=count, verbose=verbose)
+    finally:
+        if need_closing:
+            sock.close()
+
+
+async def asend(x, iface=None, inter=0, count=None, verbose=None,
+                socket=None, **kargs):
+    """Sends packets at layer 3, like send(). Returns the number of packets
+    sent.
+
+    :param iface: the interface to send the packets on
+    :param inter: time (in s) between two packets
+    :param count: number of times to send the packets
+    :param socket: the AsyncSocket, or SuperSocket, to use
+    """
+    need_closing = socket is None
+    if need_closing:
+        iface = resolve_iface(_interface_selection(iface, x))
+        socket = iface.l3socket()(iface=iface, **kargs)
+    return await _asend(x, socket, need_closing, inter=inter, count=count,
+                        verbose=verbose)
+
+
+async def asendp(x, iface=None, inter=0, count=None, verbose=None,
+                 socket=None, **kargs):
+    """Sends packets at layer 2, like sendp(). Returns the number of packets
+    sent.
+
+    :param iface: the interface to send the packets on
+    :param inter: time (in s) between two packets
+    :param count: number of times to send the packets
+    :param socket: the AsyncSocket, or SuperSocket, to use
+    """
+    need_closing = socket is None
+    if need_closing:
+        iface = resolve_iface(iface or conf.iface)
+        socket = iface.l2socket()(iface=iface, **kargs)
+    return await _asend(x, socket, need_closing, inter=inter, count=count,
+                        verbose=verbose)
+
+
+async def asr(x, iface=None, timeout=None, socket=None, filter=None,
+              promisc=None, nofilter=0, **kargs):
+    """Sends packets at layer 3 and receives their answers, like sr().
+    Returns (answered, unanswered)::
+
+        >>> ans, unans = await asr(IP(dst="192.0.2.1")/ICMP(), timeout=1)
+
+    :param socket: the AsyncSocket, or SuperSocket, to use. It can be
+        shared by concurrent calls.
+
+    The other arguments are the ones of AsyncSocket.sr().
+    """
+    sock = socket
+    if sock is None:
+        sock = conf.L3socket(promisc=promisc, filter=filter,
+                             iface=iface, nofilter=nofilter)
+    if not isinstance(sock, AsyncSocket):
+        sock = AsyncSocket(sock)
+    try:
+        return await sock.sr(x, timeout, **kargs)
+    finally:
+        if socket is None:
+            sock.close()
+
+
+async def asrp(x, iface=None, timeout=None, socket=None, filter=None,
+               promisc=None, nofilter=0, type=ETH_P_ALL, **kargs):
+    """Sends packets at layer 2 and receives their answers, like srp().
+    Returns (answered, unanswered).
+
+    :param socket: the AsyncSocket, or SuperSocket, to use. It can be
+        shared by concurrent calls.
+
+    The other arguments are the ones of AsyncSocket.sr().
+    """
+    sock = socket
+    if sock is None:
+        iface = resolve_iface(iface or conf.iface)
+        sock = iface.l2socket()(promisc=promisc, iface=iface,
+                                filter=filter, nofilter=nofilter, type=type)
+    if not isinstance(sock, AsyncSocket):
+        sock = AsyncSocket(sock)
+    try:
+        return await sock.sr(x, timeout, **kargs)
+    finally:
+        if socket is None:
+            sock.close()
+
+
+async def asr1(*args, **kargs):
+    """Sends packets at layer 3 and returns the first answer, like sr1()"""
+    ans, _ = await asr(*args, **kargs)
+    if len(ans) > 0:
+        return ans[0][1]
@@ -24,6 +24,12 @@ import types
 from select import select
 from collections import deque
 
+try:
+    import selectors
+except ImportError:
+    # Python 2
+    selectors = None
+
 from scapy.config import conf
 from scapy.utils import do_graph
 from scapy.error import log_runtime, warning
@@ -198,18 +204,115 @@ def select_objects(inputs, remain):
     :param inputs: objects to process
     :param remain: timeout. If 0, return [].
     """
+    if not WINDOWS:
+        return select(inputs, [], [], remain)[0]
     handler = SelectableSelector(inputs, remain)
     return handler.process()
 
 
+class Poller(object):
+    """
+    Select objects, as select_objects() does, but keep them registered in a
+    selector (epoll on Linux) from one call to the next. This avoids
+    building the list of file descriptors on each call::
+
+        >>> poller = Poller([sock, pipe])
+        >>> while True:
+        ...     for obj in poller.poll(timeout):
+        ...         obj.recv()
+
+    Objects that cannot be registered (no file descriptor, regular files),
+    and every object on Windows and Python 2, are selected with
+    select_objects().
+
+    :param inputs: objects to select
+    """
+
+    def __init__(self, inputs=()):
+        self.selector = None
+        if selectors is not None and not WINDOWS:
+            self.selector = selectors.DefaultSelector()
+        # object: registered file descriptor, or None
+        self.inputs = {}
+        self.fallback = set()
+        self.update(inputs)
+
+    def register(self, obj):
+        """Adds an object to select"""
+        if obj in self.inputs:
+            return
+        fd = None
+        if self.selector is not None:
+            try:
+                fd = obj.fileno()
+                key = self.selector.get_map().get(fd)
+                if key is not None:
+                    # A closed object, whose descriptor was reused
+                    self.selector.unregister(fd)
+                    del self.inputs[key.data]
+                self.selector.register(fd, selectors.EVENT_READ, obj)
+            except (AttributeError, TypeError, ValueError, OSError):
+                fd = None
+        self.inputs[obj] = fd
+        if fd is None:
+            self.fallback.add(obj)
+
+    def unregister(self, obj):
+        """Removes an object from the objects to select"""
+        fd = self.inputs.pop(obj, None)
+        self.fallback.discard(obj)
+        if fd is not None:
+            try:
+                self.selector.unregister(fd)
+            except KeyError:
+                pass
+
+    def update(self, inputs):
+        """Sets the objects to select, only (un)registering the changes"""
+        inputs = list(inputs)
+        for obj in set(self.inputs).difference(inputs):
+            self.unregister(obj)
+        for obj in inputs:
+            self.register(obj)
+
+    def poll(self, remain=None):
+        """Returns the objects that are ready to be read.
+
+        :param remain: timeout. If None, wait until an object is ready.
+        """
+        if self.fallback or self.selector is None:
+            return select_objects(list(self.inputs), remain)
+        return [key.data for key, _ in self.selector.select(remain)]
+
+    def close(self):
+        if self.selector is not None:
+            self.selector.close()
+        self.inputs.clear()
+        self.fallback.clear()
+
+
 class ObjectPipe(SelectableObject, io.BufferedIOBase):
+    """A queue of objects, that can be selected.
+
+    The file descriptor (an eventfd on Linux, a pipe otherwise) is readable
+    as long as the queue is not empty: it is only written to when an object
+    is added to an empty queue, and read from when the queue is emptied.
+    """
 
     def __init__(self):
         self._closed = False
-        self.rd, self.wr = os.pipe()
+        if hasattr(os, "eventfd"):
+            self.rd = self.wr = os.eventfd(0, os.EFD_CLOEXEC)
+        else:
+            self.rd, self.wr = os.pipe()
         self.queue = deque()
+        self.cond = threading.Condition(threading.Lock())
         SelectableObject.__init__(self)
 
+    @property
+    def closed(self):
+        return self._closed
+
     def fileno(self):
         return self.rd
 
@@ -217,8 +320,16 @@ class ObjectPipe(SelectableObject, io.BufferedIOBase):
         return len(self.queue) > 0
 
     def send(self, obj):
-        self.queue.append(obj)
-        os.write(self.wr, b"X")
+        with self.cond:
+            self.queue.append(obj)
+            if len(self.queue) > 1:
+                # Already readable
+                return
+            if self.rd == self.wr:
+                os.eventfd_write(self.wr, 1)
+            else:
+                os.write(self.wr, b"X")
+            self.cond.notify()
         self.call_release()
 
     def write(self, obj):
@@ -228,22 +339,31 @@ class ObjectPipe(SelectableObject, io.BufferedIOBase):
         pass
 
     def recv(self, n=0):
-        if self._closed:
-            if self.check_recv():
-                return self.queue.popleft()
-            return None
-        os.read(self.rd, 1)
-        return self.queue.popleft()
+        with self.cond:
+            while not self.queue:
+                if self._closed:
+                    return None
+                self.cond.wait()
+            obj = self.queue.popleft()
+            if not self.queue and not self._closed:
+                if self.rd == self.wr:
+                    os.eventfd_read(self.rd)
+                else:
+                    os.read(self.rd, 1)
+            return obj
 
     def read(self, n=0):
         return self.recv(n)
 
     def close(self):
-        if not self._closed:
-            self._closed = True
-            os.close(self.rd)
-            os.close(self.wr)
-            self.queue.clear()
+        with self.cond:
+            if not self._closed:
+                self._closed = True
+                os.close(self.rd)
+                if self.wr != self.rd:
+                    os.close(self.wr)
+                self.queue.clear()
+                self.cond.notify_all()
 
     def __del__(self):
         self.close()
@@ -836,6 +956,7 @@ class Automaton(six.with_metaclass(Automaton_metaclass)):
             self.state = self.initial_states[0](self)
             self.send_sock = self.send_sock_class(**self.socket_kargs)
             self.listen_sock = self.recv_sock_class(**self.socket_kargs)
+            self.poller = Poller()
             self.packets = PacketList(name="session[%s]" % self.__class__.__name__)  # noqa: E501
 
             singlestep = True
@@ -885,6 +1006,7 @@ class Automaton(six.with_metaclass(Automaton_metaclass)):
                 m = Message(type=_ATMT_Command.EXCEPTION, exception=e, exc_info=exc_info)  # noqa: E501
                 self.cmdout.send(m)
             self.debug(3, "Stopping control thread (tid=%i)" % self.threadid)
+            self.poller.close()
             self.threadid = None
 
     def _do_iter(self):
@@ -913,7 +1035,7 @@ class Automaton(six.with_metaclass(Automaton_metaclass)):
 
                 # If there are commandMessage, we should skip immediate
                 # conditions.
-                if not select_objects([self.cmdin], 0):
+                if not self.cmdin.check_recv():
                     # Then check immediate conditions
                     for cond in self.conditions[self.state.state]:
                         self._run_condition(cond, *state_output)
@@ -936,6 +1058,7 @@ class Automaton(six.with_metaclass(Automaton_metaclass)):
                     fds.append(self.listen_sock)
                 for ioev in self.ioevents[self.state.state]:
                     fds.append(self.ioin[ioev.atmt_ioname])
+                self.poller.update(fds)
                 while True:
                     t = time.time() - t0
                     if next_timeout is not None:
@@ -948,7 +1071,7 @@ class Automaton(six.with_metaclass(Automaton_metaclass)):
                         remain = next_timeout - t
 
                     self.debug(5, "Select on %r" % fds)
-                    r = select_objects(fds, remain)
+                    r = self.poller.poll(remain)
                     self.debug(5, "Selected %r" % r)
                     for fd in r:
                         self.debug(5, "Looking at %r" % fd)
@@ -356,6 +356,15 @@ class Field_metaclass(_Generic_metaclass):
         # type: (...) -> Type['scapy.fields.Field'[Any, Any]]
         dct.setdefault("__slots__", [])
         newcls = super(Field_metaclass, cls).__new__(cls, name, bases, dct)
+        # Fields that only override getfield() can't be dissected using
+        # their parent's getfield_at(): mark them so that the dissection
+        # falls back on the bytes-slicing getfield() API.
+        for base in newcls.__mro__:
+            if "getfield_at" in base.__dict__:
+                break
+            if "getfield" in base.__dict__:
+                setattr(newcls, "getfield_at", None)
+                break
         return newcls
 
 
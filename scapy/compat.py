@@ -25,6 +25,7 @@ __all__ = [
     'AnyStr',
     'Callable',
     'DefaultDict',
+    'Deque',
     'Dict',
     'Generic',
     'Iterator',
@@ -117,6 +118,7 @@ if not FAKE_TYPING:
         AnyStr,
         Callable,
         DefaultDict,
+        Deque,
         Dict,
         Generic,
         Iterator,
@@ -144,6 +146,7 @@ else:
     Callable = _FakeType("Callable")
     DefaultDict = _FakeType("DefaultDict",  # type: ignore
                             collections.defaultdict)
+    Deque = _FakeType("Deque", collections.deque)  # type: ignore
     Dict = _FakeType("Dict", dict)  # type: ignore
     Generic = _FakeType("Generic")
     Iterator = _FakeType("Iterator")  # type: ignore
@@ -741,6 +741,13 @@ class Conf(ConfClass):
                                       ".scapy_history"))
     #: includes padding in disassembled packets
     padding = 1
+    #: when True, the payload of a dissected layer is only dissected when
+    #: it is accessed. Can be set for a single packet using ``lazy=True``
+    lazy_dissection = False
+    #: when True, modifying a field of a layer updates incrementally the
+    #: IP, TCP, UDP, ICMP and ICMPv6 checksums covering it, instead of
+    #: keeping the values they had when the packet was dissected
+    incremental_checksums = False
     #: BPF filter for packets to ignore
     except_filter = ""
     #: bpf filter added to every sniffing socket to exclude traffic
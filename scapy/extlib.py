@@ -62,3 +62,13 @@ try:
 except ImportError:
     log_loading.info("Can't import PyX. Won't be able to use psdump() or pdfdump().")  # noqa: E501
     PYX = 0
+
+# NUMPY
+
+try:
+    import numpy
+    NUMPY = 1
+except ImportError:
+    numpy = None
+    NUMPY = 0
+    log_loading.info("Can't import numpy. Columns will be array.array objects, and checksums won't be computed in batch.")  # noqa: E501
@@ -101,6 +101,20 @@ class ObservableDict(Dict[int, str]):
 #  Fields  #
 ############
 
+def _slice_at(s, offset, length):
+    # type: (bytes, int, Optional[int]) -> Tuple[int, bytes]
+    """Offset-based equivalent of (s[length:], s[:length]), to be used by
+    getfield_at() implementations: returns the offset following the
+    extracted bytes, and the extracted bytes."""
+    if length is None:
+        return offset, s[offset:]
+    if length < 0:
+        end = max(offset, len(s) + length)
+    else:
+        end = min(offset + length, len(s))
+    return end, s[offset:end]
+
+
 I = TypeVar('I')  # Internal storage  # noqa: E741
 M = TypeVar('M')  # Machine storage
 
@@ -212,6 +226,24 @@ class Field(Generic[I, M]):
         """
         return s[self.sz:], self.m2i(pkt, self.struct.unpack(s[:self.sz])[0])
 
+    def getfield_at(self, pkt, s, offset):
+        # type: (Packet, bytes, int) -> Tuple[int, I]
+        """Extract an internal value from a buffer, at a given offset
+
+        Offset-based variant of `getfield`, used by `Packet.do_dissect` to
+        avoid copying the remaining buffer for every field: `s` is the whole
+        layer buffer, that is left untouched.
+
+        Returns a two-element list,
+        first the offset of the next field in `s`,
+        second the extracted field itself in internal representation.
+
+        Fields that only override `getfield` have this attribute set to None
+        by their metaclass, and are dissected using `getfield`.
+        """
+        return (offset + self.sz,
+                self.m2i(pkt, self.struct.unpack_from(s, offset)[0]))
+
     def do_copy(self, x):
         # type: (I) -> I
         if hasattr(x, "copy"):
@@ -250,6 +282,121 @@ class Field(Generic[I, M]):
             warning("no random class for [%s] (fmt=%s).", self.name, self.fmt)
 
 
+def _defined_in(cls, attr):
+    # type: (type, str) -> Optional[type]
+    """Return the class of cls' MRO defining attr"""
+    for klass in cls.__mro__:
+        if attr in klass.__dict__:
+            return klass
+    return None
+
+
+class _FieldsStruct(object):
+    """
+    A run of consecutive fixed-size fields, packed and unpacked with a single
+    struct.Struct. Used by Packet.do_dissect() and Packet.self_build().
+
+    Only fields relying on Field's own getfield(), getfield_at() and
+    addfield() can be merged: their m2i() and i2m() are still called.
+    """
+    __slots__ = ["fields", "names", "struct", "sz", "m2i", "i2m"]
+    _byteorders = {"!": ">", ">": ">", "<": "<", "=": "="}
+
+    def __init__(self, fields):
+        # type: (List[Field[Any, Any]]) -> None
+        self.fields = fields
+        self.names = [f.name for f in fields]
+        self.struct = struct.Struct(
+            self._byteorders[fields[0].fmt[0]] +
+            "".join(f.fmt[1:] for f in fields)
+        )
+        self.sz = self.struct.size
+        # (field name, m2i) for the fields that convert the values
+        self.m2i = [(f.name, f.m2i) for f in fields
+                    if _defined_in(type(f), "m2i") is not Field]
+        self.i2m = [f.i2m for f in fields]
+
+    @classmethod
+    def can_merge(cls, fld):
+        # type: (Any) -> bool
+        """Whether fld can be part of a _FieldsStruct"""
+        if not isinstance(fld, Field) or \
+           fld.islist or fld.holds_packets or fld.ismutable:
+            return False
+        # Look at the class: proxy objects forwarding their attributes
+        # to another field should not be merged.
+        if any(_defined_in(type(fld), attr) is not Field
+               for attr in ["getfield", "getfield_at", "addfield"]):
+            return False
+        return (fld.fmt[0] in cls._byteorders and
+                len(fld.struct.unpack(b"\x00" * fld.sz)) == 1)
+
+    @classmethod
+    def merge(cls, flist):
+        # type: (List[Any]) -> List[Any]
+        """Replace the runs of fields of flist that can be merged by
+        _FieldsStruct objects"""
+        result = []  # type: List[Any]
+        run = []  # type: List[Any]
+        for fld in flist + [None]:
+            # Emph only matters when displaying the packet
+            mfld = fld.fld if isinstance(fld, Emph) else fld
+            if mfld is None or not cls.can_merge(mfld):
+                mfld = None
+            elif run and (cls._byteorders[mfld.fmt[0]] !=
+                          cls._byteorders[run[0][1].fmt[0]]):
+                result.append(cls([f for _, f in run])
+                              if len(run) > 1 else run[0][0])
+                run = []
+            if mfld is not None:
+                run.append((fld, mfld))
+                continue
+            if run:
+                result.append(cls([f for _, f in run])
+                              if len(run) > 1 else run[0][0])
+                run = []
+            if fld is not None:
+                result.append(fld)
+        return result
+
+    def getfields_at(self, pkt, s, offset):
+        # type: (Packet, Any, Any) -> Tuple[Any, Any, bool]
+        """Extract the values of the fields from `s` at `offset`, and store
+        them in pkt.fields.
+
+        Returns a three-element tuple: the buffer and the offset of the next
+        field, and True when the buffer was exhausted before the end of the
+        run.
+        """
+        fields = pkt.fields
+        if not isinstance(s, tuple) and not isinstance(offset, tuple) and \
+           offset + self.sz <= len(s):
+            fields.update(zip(self.names,
+                              self.struct.unpack_from(s, offset)))
+            for name, m2i in self.m2i:
+                fields[name] = m2i(pkt, fields[name])
+            return s, offset + self.sz, False
+        # Not enough data: dissect the fields one by one
+        for fld in self.fields:
+            if isinstance(s, tuple):
+                # The bit fields of the getfield() API pass their
+                # (bytes, bits done) state along, in place of the bytes
+                state = s  # type: Any
+                s, fields[fld.name] = fld.getfield(pkt, state)
+                continue
+            if not isinstance(offset, tuple) and offset >= len(s):
+                return s, offset, True
+            offset, fields[fld.name] = fld.getfield_at(pkt, s, offset)
+        return s, offset, False
+
+    def addfields(self, pkt, s, vals):
+        # type: (Packet, bytes, List[Any]) -> bytes
+        """Add the internal values of the fields to a string"""
+        return s + self.struct.pack(*[
+            i2m(pkt, val) for i2m, val in zip(self.i2m, vals)
+        ])
+
+
 class Emph(object):
     """Empathize sub-layer for display"""
     __slots__ = ["fld"]
@@ -258,6 +405,11 @@ class Emph(object):
         # type: (Any) -> None
         self.fld = fld
 
+    @property
+    def getfield_at(self):
+        # type: () -> Any
+        return self.fld.getfield_at
+
     def __getattr__(self, attr):
         # type: (str) -> Any
         return getattr(self.fld, attr)
@@ -289,6 +441,11 @@ class ActionField(object):
         getattr(pkt, self._action_method)(val, self._fld, **self._privdata)
         return getattr(self._fld, "any2i")(pkt, val)
 
+    @property
+    def getfield_at(self):
+        # type: () -> Any
+        return self._fld.getfield_at
+
     def __getattr__(self, attr):
         # type: (str) -> Any
         return getattr(self._fld, attr)
@@ -316,6 +473,20 @@ class ConditionalField(object):
         else:
             return s, None
 
+    @property
+    def getfield_at(self):
+        # type: () -> Optional[Callable[[Packet, bytes, int], Tuple[int, Any]]]  # noqa: E501
+        if self.fld.getfield_at is None:
+            return None
+        return self._getfield_at
+
+    def _getfield_at(self, pkt, s, offset):
+        # type: (Packet, bytes, int) -> Tuple[int, Any]
+        if self._evalcond(pkt):
+            return self.fld.getfield_at(pkt, s, offset)
+        else:
+            return offset, None
+
     def addfield(self, pkt, s, val):
         # type: (Packet, bytes, Any) -> bytes
         if self._evalcond(pkt):
@@ -357,6 +528,7 @@ use.
     """
 
     __slots__ = ["flds", "dflt", "name", "default"]
+    getfield_at = None
 
     def __init__(self,
                  flds,  # type: List[Tuple[Field[Any, Any], Any]]
@@ -499,6 +671,7 @@ class PadField(object):
     """Add bytes after the proxified field so that it ends at the specified
        alignment from its beginning"""
     __slots__ = ["_fld", "_align", "_padwith"]
+    getfield_at = None
 
     def __init__(self, fld, align, padwith=None):
         # type: (Field[Any, Any], int, Optional[bytes]) -> None
@@ -906,6 +1079,11 @@ class ThreeBytesField(Field[int, int]):
         # type: (Packet, bytes) -> Tuple[bytes, int]
         return s[3:], self.m2i(pkt, struct.unpack(self.fmt, b"\x00" + s[:3])[0])  # noqa: E501
 
+    def getfield_at(self, pkt, s, offset):
+        # type: (Packet, bytes, int) -> Tuple[int, int]
+        hi, lo = struct.unpack_from("!BH", s, offset)
+        return offset + 3, self.m2i(pkt, (hi << 16) | lo)
+
 
 class X3BytesField(ThreeBytesField, XByteField):
     def i2repr(self, pkt, x):
@@ -926,6 +1104,11 @@ class LEThreeBytesField(ByteField):
         # type: (Optional[Packet], bytes) -> Tuple[bytes, int]
         return s[3:], self.m2i(pkt, struct.unpack(self.fmt, s[:3] + b"\x00")[0])  # noqa: E501
 
+    def getfield_at(self, pkt, s, offset):
+        # type: (Optional[Packet], bytes, int) -> Tuple[int, int]
+        lo, hi = struct.unpack_from("<HB", s, offset)
+        return offset + 3, self.m2i(pkt, (hi << 16) | lo)
+
 
 class LEX3BytesField(LEThreeBytesField, XByteField):
     def i2repr(self, pkt, x):
@@ -972,6 +1155,11 @@ class NBytesField(Field[int, List[int]]):
         return (s[self.sz:],
                 self.m2i(pkt, self.struct.unpack(s[:self.sz])))  # type: ignore
 
+    def getfield_at(self, pkt, s, offset):
+        # type: (Optional[Packet], bytes, int) -> Tuple[int, int]
+        return (offset + self.sz,
+                self.m2i(pkt, self.struct.unpack_from(s, offset)))  # type: ignore  # noqa: E501
+
 
 class XNBytesField(NBytesField):
     def i2repr(self, pkt, x):
@@ -1276,6 +1464,11 @@ class _StrField(Field[I, bytes]):
         else:
             return s[-self.remain:], self.m2i(pkt, s[:-self.remain])
 
+    def getfield_at(self, pkt, s, offset):
+        # type: (Packet, bytes, int) -> Tuple[int, I]
+        end = max(offset, len(s) - self.remain)
+        return end, self.m2i(pkt, s[offset:end])
+
     def randval(self):
         # type: () -> RandBin
         return RandBin(RandNum(0, 1200))
@@ -1540,22 +1733,33 @@ class PacketListField(_PacketField[List[BasePacket]]):
 
     def getfield(self, pkt, s):
         # type: (Packet, bytes) -> Tuple[bytes, List[BasePacket]]
+        # getfield_at is None in the subclasses that override getfield(),
+        # that may call this one
+        offset, lst = self._getfield_at(pkt, s, 0)
+        return s[offset:], lst
+
+    def getfield_at(self, pkt, s, offset):
+        # type: (Packet, bytes, int) -> Tuple[int, List[BasePacket]]
+        return self._getfield_at(pkt, s, offset)
+
+    def _getfield_at(self, pkt, s, offset):
+        # type: (Packet, bytes, int) -> Tuple[int, List[BasePacket]]
         c = len_pkt = cls = None
         if self.length_from is not None:
             len_pkt = self.length_from(pkt)
         elif self.count_from is not None:
             c = self.count_from(pkt)
         if self.next_cls_cb is not None:
-            cls = self.next_cls_cb(pkt, [], None, s)
+            cls = self.next_cls_cb(pkt, [], None, s[offset:])
             c = 1
             if cls is None:
                 c = 0
 
         lst = []  # type: List[BasePacket]
-        ret = b""
-        remain = s
         if len_pkt is not None:
-            remain, ret = s[:len_pkt], s[len_pkt:]
+            end, remain = _slice_at(s, offset, len_pkt)
+        else:
+            end, remain = len(s), s[offset:]
         while remain:
             if c is not None:
                 if c <= 0:
@@ -1584,7 +1788,8 @@ class PacketListField(_PacketField[List[BasePacket]]):
                 else:
                     remain = b""
             lst.append(p)
-        return remain + ret, lst
+        # The bytes that were not consumed are handed back to the next field
+        return end - len(remain), lst
 
     def addfield(self, pkt, s, val):
         # type: (Packet, bytes, Any) -> bytes
@@ -1621,6 +1826,11 @@ class StrFixedLenField(StrField):
         len_pkt = self.length_from(pkt)
         return s[len_pkt:], self.m2i(pkt, s[:len_pkt])
 
+    def getfield_at(self, pkt, s, offset):
+        # type: (Packet, bytes, int) -> Tuple[int, bytes]
+        offset, val = _slice_at(s, offset, self.length_from(pkt))
+        return offset, self.m2i(pkt, val)
+
     def addfield(self, pkt, s, val):
         # type: (Packet, bytes, Optional[bytes]) -> bytes
         len_pkt = self.length_from(pkt)
@@ -1717,6 +1927,12 @@ class StrLenField(StrField):
         len_pkt = (self.length_from or (lambda x: 0))(pkt)
         return s[len_pkt:], self.m2i(pkt, s[:len_pkt])
 
+    def getfield_at(self, pkt, s, offset):
+        # type: (Any, bytes, int) -> Tuple[int, bytes]
+        len_pkt = (self.length_from or (lambda x: 0))(pkt)
+        offset, val = _slice_at(s, offset, len_pkt)
+        return offset, self.m2i(pkt, val)
+
     def randval(self):
         # type: () -> RandBin
         return RandBin(RandNum(0, self.max_length or 1200))
@@ -2141,6 +2357,48 @@ class _BitField(Field[I, int]):
         else:
             return s, b2
 
+    @property
+    def getfield_at(self):  # type: ignore
+        # type: () -> Optional[Callable[[Packet, bytes, Union[Tuple[int, int], int]], Tuple[Union[Tuple[int, int], int], I]]]  # noqa: E501
+        # Low endian groups of bits are reversed in the buffer itself
+        if self.rev:
+            return None
+        return self._getfield_at
+
+    def _getfield_at(self,
+                     pkt,  # type: Packet
+                     s,  # type: bytes
+                     offset,  # type: Union[Tuple[int, int], int]
+                     ):
+        # type: (...) -> Tuple[Union[Tuple[int, int], int], I]
+        if isinstance(offset, tuple):
+            offset, bn = offset
+        else:
+            bn = 0
+
+        # we don't want to process all the string
+        nb_bytes = (self.size + bn - 1) // 8 + 1
+        _bytes = struct.unpack_from('!%dB' % nb_bytes, s, offset)
+
+        b = 0
+        for c in range(nb_bytes):
+            b |= int(_bytes[c]) << (nb_bytes - c - 1) * 8
+
+        # get rid of high order bits
+        b &= (1 << (nb_bytes * 8 - bn)) - 1
+
+        # remove low order bits
+        b = b >> (nb_bytes * 8 - self.size - bn)
+
+        bn += self.size
+        offset += bn // 8
+        bn = bn % 8
+        b2 = self.m2i(pkt, b)
+        if bn:
+            return (offset, bn), b2
+        else:
+            return offset, b2
+
     def randval(self):
         # type: () -> RandNum
         return RandNum(0, 2**self.size - 1)
@@ -17,8 +17,8 @@ import select
 import socket
 from collections import defaultdict
 
-from scapy.utils import checksum, do_graph, incremental_label, \
-    linehexdump, strxor, whois, colgen
+from scapy.utils import checksum, checksum_update, do_graph, \
+    incremental_label, linehexdump, strxor, whois, colgen
 from scapy.base_classes import Gen, Net
 from scapy.data import ETH_P_IP, ETH_P_ALL, DLT_RAW, DLT_RAW_ALT, DLT_IPV4, \
     IP_PROTOS, TCP_SERVICES, UDP_SERVICES
@@ -515,6 +515,7 @@ class IP(Packet, IPTools):
                    Emph(SourceIPField("src", "dst")),
                    Emph(DestIPField("dst", "127.0.0.1")),
                    PacketListField("options", [], IPOption, length_from=lambda p:p.ihl * 4 - 20)]  # noqa: E501
+    checksum_field = "chksum"
 
     def post_build(self, p, pay):
         ihl = self.ihl
@@ -530,6 +531,11 @@ class IP(Packet, IPTools):
             p = p[:10] + chb(ck >> 8) + chb(ck & 0xff) + p[12:]
         return p + pay
 
+    def pseudo_header_checksums(self, attr):
+        if attr in ["src", "dst"] and isinstance(self.payload, (TCP, UDP)):
+            return [self.payload]
+        return []
+
     def extract_padding(self, s):
         tmp_len = self.len - (self.ihl << 2)
         if tmp_len < 0:
@@ -631,6 +637,31 @@ class IP(Packet, IPTools):
         return lst
 
 
+def in4_pseudoheader(proto, u, plen):
+    """
+    Build an IPv4 pseudo header, as used by the upper layer checksums
+
+    :param proto: value of upper layer protocol
+    :param u: IP layer instance
+    :param plen: the length of the upper layer and payload, used when the
+        length of the IP layer is not set
+    """
+    if u.len is not None:
+        if u.ihl is None:
+            olen = sum(len(x) for x in u.options)
+            ihl = 5 + olen // 4 + (1 if olen % 4 else 0)
+        else:
+            ihl = u.ihl
+        ln = max(u.len - 4 * ihl, 0)
+    else:
+        ln = plen
+    return struct.pack("!4s4sHH",
+                       inet_pton(socket.AF_INET, u.src),
+                       inet_pton(socket.AF_INET, u.dst),
+                       proto,
+                       ln)
+
+
 def in4_chksum(proto, u, p):
     """
     As Specified in RFC 2460 - 8.1 Upper-Layer Checksums
@@ -643,21 +674,22 @@ def in4_chksum(proto, u, p):
     if not isinstance(u, IP):
         warning("No IP underlayer to compute checksum. Leaving null.")
         return 0
-    if u.len is not None:
-        if u.ihl is None:
-            olen = sum(len(x) for x in u.options)
-            ihl = 5 + olen // 4 + (1 if olen % 4 else 0)
-        else:
-            ihl = u.ihl
-        ln = max(u.len - 4 * ihl, 0)
-    else:
-        ln = len(p)
-    psdhdr = struct.pack("!4s4sHH",
-                         inet_pton(socket.AF_INET, u.src),
-                         inet_pton(socket.AF_INET, u.dst),
-                         proto,
-                         ln)
-    return checksum(psdhdr + p)
+    return checksum(in4_pseudoheader(proto, u, len(p)) + p)
+
+
+def _upper_pseudo_header(proto, u, plen):
+    """
+    Returns the pseudo header of a TCP or UDP layer above u, or None if
+    there is no IP or IPv6 underlayer
+    """
+    if isinstance(u, IP):
+        return in4_pseudoheader(proto, u, plen)
+    if conf.ipv6_enabled and isinstance(u, (scapy.layers.inet6.IPv6,
+                                            scapy.layers.inet6._IPv6ExtHdr)):
+        ph6 = scapy.layers.inet6.in6_pseudoheader(proto, u, plen)
+        if ph6 is not None:
+            return raw(ph6)
+    return None
 
 
 class TCP(Packet):
@@ -673,6 +705,12 @@ class TCP(Packet):
                    XShortField("chksum", None),
                    ShortField("urgptr", 0),
                    TCPOptionsField("options", "")]
+    checksum_field = "chksum"
+    checksum_payload = True
+
+    def checksum_pseudo_header(self, length):
+        return _upper_pseudo_header(socket.IPPROTO_TCP, self.underlayer,
+                                    length)
 
     def post_build(self, p, pay):
         p += pay
@@ -747,6 +785,8 @@ class UDP(Packet):
                    ShortEnumField("dport", 53, UDP_SERVICES),
                    ShortField("len", None),
                    XShortField("chksum", None), ]
+    checksum_field = "chksum"
+    checksum_payload = True
 
     def post_build(self, p, pay):
         p += pay
@@ -773,6 +813,23 @@ class UDP(Packet):
                 )
         return p
 
+    def update_checksum(self, old, new, odd=False):
+        if not self.chksum:
+            # None, or no checksum (RFC768)
+            return
+        ck = checksum_update(self.chksum, old, new, odd)
+        self.chksum = ck or 0xFFFF
+
+    def checksum_pseudo_header(self, length):
+        return _upper_pseudo_header(socket.IPPROTO_UDP, self.underlayer,
+                                    length)
+
+    def checksum_data(self):
+        if self.chksum == 0:
+            # No checksum (RFC768)
+            return None
+        return super(UDP, self).checksum_data()
+
     def extract_padding(self, s):
         tmp_len = self.len - 8
         return s[:tmp_len], s[tmp_len:]
@@ -882,6 +939,8 @@ class ICMP(Packet):
                                                            18])
                        ], StrFixedLenField("unused", "", length=0)),
                    ]
+    checksum_field = "chksum"
+    checksum_payload = True
 
     def post_build(self, p, pay):
         p += pay
@@ -966,6 +1025,10 @@ class TCPerror(TCP):
     def mysummary(self):
         return Packet.mysummary(self)
 
+    def checksum_data(self):
+        # The quoted layer is usually truncated
+        return None
+
 
 class UDPerror(UDP):
     name = "UDP in ICMP"
@@ -982,6 +1045,10 @@ class UDPerror(UDP):
     def mysummary(self):
         return Packet.mysummary(self)
 
+    def checksum_data(self):
+        # The quoted layer is usually truncated
+        return None
+
 
 class ICMPerror(ICMP):
     name = "ICMP in ICMP"
@@ -1004,6 +1071,10 @@ class ICMPerror(ICMP):
     def mysummary(self):
         return Packet.mysummary(self)
 
+    def checksum_data(self):
+        # The quoted layer is usually truncated
+        return None
+
 
 bind_layers(Ether, IP, type=2048)
 bind_layers(CookedLinux, IP, proto=2048)
@@ -294,6 +294,27 @@ class IPv6(_IPv6GuessPayload, Packet, IPTools):
             p = p[:4] + struct.pack("!H", tmp_len) + p[6:]
         return p
 
+    def pseudo_header_checksums(self, attr):
+        if attr not in ["src", "dst"]:
+            return []
+        # See in6_chksum()
+        u = self.payload
+        while isinstance(u, _IPv6ExtHdr):
+            if attr == "dst" and \
+                    isinstance(u, (IPv6ExtHdrRouting,
+                                   IPv6ExtHdrSegmentRouting)) and \
+                    u.segleft != 0 and len(u.addresses) != 0:
+                # The final destination is used instead
+                return []
+            if attr == "src" and isinstance(u, IPv6ExtHdrDestOpt) and \
+                    len(u.options) == 1 and isinstance(u.options[0], HAO):
+                # The home address is used instead
+                return []
+            u = u.payload
+        if isinstance(u, (TCP, UDP, _ICMPv6)):
+            return [u]
+        return []
+
     def extract_padding(self, data):
         """Extract the IPv6 payload"""
 
@@ -558,11 +579,9 @@ class PseudoIPv6(Packet):  # IPv6 Pseudo-header for checksum computation
                    ByteField("nh", 0)]
 
 
-def in6_chksum(nh, u, p):
+def in6_pseudoheader(nh, u, plen):
     """
-    As Specified in RFC 2460 - 8.1 Upper-Layer Checksums
-
-    Performs IPv6 Upper Layer checksum computation.
+    Build a PseudoIPv6 instance as specified in RFC 2460 8.1
 
     This function operates by filling a pseudo header class instance
     (PseudoIPv6) with:
@@ -579,9 +598,9 @@ def in6_chksum(nh, u, p):
     :param u: upper layer instance (TCP, UDP, ICMPv6*, ). Instance must be
         provided with all under layers (IPv6 and all extension headers,
         for example)
-    :param p: the payload of the upper layer provided as a string
+    :param plen: the length of the upper layer and payload
+    :return: the PseudoIPv6 instance, or None if there is no IPv6 underlayer
     """
-
     ph6 = PseudoIPv6()
     ph6.nh = nh
     rthdr = 0
@@ -603,8 +622,7 @@ def in6_chksum(nh, u, p):
             hahdr = u.options[0].hoa
         u = u.underlayer
     if u is None:
-        warning("No IPv6 underlayer to compute checksum. Leaving null.")
-        return 0
+        return None
     if hahdr:
         ph6.src = hahdr
     else:
@@ -613,7 +631,28 @@ def in6_chksum(nh, u, p):
         ph6.dst = rthdr
     else:
         ph6.dst = u.dst
-    ph6.uplen = len(p)
+    ph6.uplen = plen
+    return ph6
+
+
+def in6_chksum(nh, u, p):
+    """
+    As Specified in RFC 2460 - 8.1 Upper-Layer Checksums
+
+    Performs IPv6 Upper Layer checksum computation.
+
+    See in6_pseudoheader() for the pseudo header.
+
+    :param nh: value of upper layer protocol
+    :param u: upper layer instance (TCP, UDP, ICMPv6*, ). Instance must be
+        provided with all under layers (IPv6 and all extension headers,
+        for example)
+    :param p: the payload of the upper layer provided as a string
+    """
+    ph6 = in6_pseudoheader(nh, u, len(p))
+    if ph6 is None:
+        warning("No IPv6 underlayer to compute checksum. Leaving null.")
+        return 0
     ph6s = raw(ph6)
     return checksum(ph6s + p)
 
@@ -1294,6 +1333,12 @@ icmp6types = {1: "Destination unreachable",
 class _ICMPv6(Packet):
     name = "ICMPv6 dummy class"
     overload_fields = {IPv6: {"nh": 58}}
+    checksum_field = "cksum"
+    checksum_payload = True
+
+    def checksum_pseudo_header(self, length):
+        ph6 = in6_pseudoheader(58, self.underlayer, length)
+        return None if ph6 is None else raw(ph6)
 
     def post_build(self, p, pay):
         p += pay
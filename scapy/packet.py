@@ -24,14 +24,15 @@ import types
 import warnings
 
 from scapy.fields import StrField, ConditionalField, Emph, PacketListField, \
-    BitField, MultiEnumField, EnumField, FlagsField, MultipleTypeField, Field
+    BitField, MultiEnumField, EnumField, FlagsField, MultipleTypeField, \
+    Field, _FieldsStruct
 from scapy.config import conf, _version_checker
 from scapy.compat import raw, orb, bytes_encode
 from scapy.base_classes import BasePacket, Gen, SetGen, Packet_metaclass, \
     _CanvasDumpExtended
 from scapy.volatile import RandField, VolatileValue
 from scapy.utils import import_hexcap, tex_escape, colgen, issubtype, \
-    pretty_list, EDecimal
+    pretty_list, EDecimal, checksum_update
 from scapy.error import Scapy_Exception, log_runtime, warning
 from scapy.extlib import PYX
 import scapy.modules.six as six
@@ -45,6 +46,7 @@ from scapy.compat import (
     List,
     NoReturn,
     Optional,
+    Sequence,
     Set,
     Tuple,
     Type,
@@ -58,6 +60,13 @@ except ImportError:
     pass
 
 
+# Types of the field values that can be looked up in the payload_guess index
+_PAYLOAD_GUESS_TYPES = set(six.integer_types) | {bool, bytes, six.text_type}
+
+# Shared by the layers without overloaded fields. Never modified.
+_NO_FIELDS = {}  # type: Dict[str, Any]
+
+
 class RawVal:
     def __init__(self, val=""):
         # type: (str) -> None
@@ -98,6 +107,10 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         "direction", "sniffed_on",
         # handle snaplen Vs real length
         "wirelen",
+        # comment stored in pcapng files
+        "pkt_comment",
+        # payload that has not been dissected yet (lazy dissection)
+        "_lazy_payload",
     ]
     name = None
     fields_desc = []  # type: List[Field[Any, Any]]
@@ -112,6 +125,13 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
     class_default_fields = {}  # type: Dict[Type[Packet], Dict[str, Any]]
     class_default_fields_ref = {}  # type: Dict[Type[Packet], List[str]]
     class_fieldtype = {}  # type: Dict[Type[Packet], Dict[str, Field[Any, Any]]]  # noqa: E501
+    class_dissect_fields = {}  # type: Dict[Type[Packet], List[Tuple[Any, Any]]]  # noqa: E501
+    class_build_fields = {}  # type: Dict[Type[Packet], List[Any]]
+    class_payload_guess_index = {}  # type: Dict[Type[Packet], Tuple[Any, ...]]  # noqa: E501
+    # The field holding the Internet checksum of the layer, and whether
+    # the checksum covers the payload too
+    checksum_field = None  # type: Optional[str]
+    checksum_payload = False
 
     @classmethod
     def from_hexcap(cls):
@@ -135,17 +155,26 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
                  post_transform=None,  # type: Any
                  _internal=0,  # type: int
                  _underlayer=None,  # type: Optional[Packet]
+                 lazy=None,  # type: Optional[bool]
                  **fields  # type: Any
                  ):
         # type: (...) -> None
-        self.time = time.time()  # type: Union[EDecimal, float]
+        # None when the payload is dissected at once. Otherwise, the
+        # payload kept aside, its paddings, and the packet passed to
+        # dissection_done(), or () once it is dissected.
+        self._lazy_payload = None  # type: Optional[Union[Tuple[()], Tuple[bytes, List[bytes], Optional[Packet]]]]  # noqa: E501
+        if _underlayer is None:
+            # The payload layers share the time of the outermost one,
+            # see __getattr__()
+            self.time = time.time()  # type: Union[EDecimal, float]
         self.sent_time = None  # type: Union[EDecimal, float, None]
         self.name = (self.__class__.__name__
                      if self._name is None else
                      self._name)
         self.default_fields = {}  # type: Dict[str, Any]
         self.overload_fields = self._overload_fields
-        self.overloaded_fields = {}  # type: Dict[str, Any]
+        # Read-only, shared with the class or the payload class
+        self.overloaded_fields = _NO_FIELDS  # type: Dict[str, Any]
         self.fields = {}  # type: Dict[str, Any]
         self.fieldtype = {}  # type: Dict[str, Field[Any, Any]]
         self.packetfields = []  # type: List[Field[Any, Any]]
@@ -159,7 +188,16 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         self.wirelen = None  # type: Optional[int]
         self.direction = None  # type: Optional[int]
         self.sniffed_on = None  # type: Optional[str]
+        self.pkt_comment = None  # type: Optional[bytes]
         if _pkt:
+            if lazy is None:
+                # The payloads of a lazily dissected layer are lazy too
+                lazy = conf.lazy_dissection or (
+                    _underlayer is not None and
+                    _underlayer._lazy_payload is not None
+                )
+            if lazy:
+                self._lazy_payload = ()
             self.dissect(_pkt)
             if not _internal:
                 self.dissection_done(self)
@@ -183,9 +221,9 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
                 continue
             raise AttributeError(fname)
         if isinstance(post_transform, list):
-            self.post_transforms = post_transform
+            self.post_transforms = post_transform  # type: Sequence[Any]
         elif post_transform is None:
-            self.post_transforms = []
+            self.post_transforms = ()
         else:
             self.post_transforms = [post_transform]
 
@@ -195,7 +233,8 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         Optional[Union[EDecimal, float, None]],
         Optional[int],
         Optional[str],
-        Optional[int]
+        Optional[int],
+        Optional[bytes],
     ]
 
     def __reduce__(self):
@@ -208,6 +247,7 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
             self.direction,
             self.sniffed_on,
             self.wirelen,
+            self.pkt_comment,
         ))
 
     def __getstate__(self):
@@ -224,6 +264,8 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         self.direction = state[3]
         self.sniffed_on = state[4]
         self.wirelen = state[5]
+        # The comment is missing from the pickles of the older versions
+        self.pkt_comment = state[6] if len(state) > 6 else None
         return self
 
     def __deepcopy__(self,
@@ -335,7 +377,12 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         # type: (Packet) -> None
         """DEV: will be called after a dissection is completed"""
         self.post_dissection(pkt)
-        self.payload.dissection_done(pkt)
+        if self._lazy_payload:
+            # Will be called once the payload is dissected
+            payl, pads, _ = self._lazy_payload
+            self._lazy_payload = (payl, pads, pkt)
+        else:
+            self.payload.dissection_done(pkt)
 
     def post_dissection(self, pkt):
         # type: (Packet) -> None
@@ -370,7 +417,7 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         # type: () -> None
         self.payload.remove_underlayer(self)
         self.payload = NoPayload()
-        self.overloaded_fields = {}
+        self.overloaded_fields = _NO_FIELDS
 
     def add_underlayer(self, underlayer):
         # type: (Packet) -> None
@@ -385,8 +432,8 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         """Returns a deep copy of the instance."""
         clone = self.__class__()
         clone.fields = self.copy_fields_dict(self.fields)
-        clone.default_fields = self.copy_fields_dict(self.default_fields)
-        clone.overloaded_fields = self.overloaded_fields.copy()
+        clone.default_fields = self.copy_default_fields()
+        clone.overloaded_fields = self.overloaded_fields
         clone.underlayer = self.underlayer
         clone.explicit = self.explicit
         clone.raw_packet_cache = self.raw_packet_cache
@@ -394,6 +441,9 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
             self.raw_packet_cache_fields
         )
         clone.wirelen = self.wirelen
+        clone.pkt_comment = self.pkt_comment
+        clone.direction = self.direction
+        clone.sniffed_on = self.sniffed_on
         clone.post_transforms = self.post_transforms[:]
         clone.payload = self.payload.copy()
         clone.payload.add_underlayer(clone)
@@ -436,6 +486,15 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
 
     def __getattr__(self, attr):
         # type: (str) -> Any
+        if attr == "payload" and self._lazy_payload:
+            return self.do_dissect_lazy_payload()
+        if attr == "time":
+            # The payload layers created by the dissection do not have
+            # their own time
+            if self.underlayer is not None:
+                return self.underlayer.time
+            self.time = time.time()
+            return self.time
         try:
             fld, v = self.getfield_and_val(attr)
         except ValueError:
@@ -454,17 +513,143 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
                 any2i = lambda x, y: y  # type: Callable[..., Any]
             else:
                 any2i = fld.any2i
+            chksums = None
+            if conf.incremental_checksums:
+                chksums = self.checksums_covering(attr)
+                if chksums[0] or chksums[1]:
+                    old = self.self_build()
+                else:
+                    chksums = None
             self.fields[attr] = any2i(self, val)
             self.explicit = 0
             self.raw_packet_cache = None
             self.raw_packet_cache_fields = None
             self.wirelen = None
+            if chksums is not None:
+                self.update_checksums(chksums, old, self.self_build())
         elif attr == "payload":
             self.remove_payload()
             self.add_payload(val)
         else:
             self.payload.setfieldval(attr, val)
 
+    def checksums_covering(self, attr):
+        # type: (str) -> Tuple[List[Packet], List[Packet]]
+        """
+        Returns the layers whose checksums cover the field `attr` of the
+        layer: the layer itself and the underlayers whose checksums cover
+        their payload, and the layers using the field in a pseudo-header.
+        """
+        layers = []  # type: List[Packet]
+        if self.checksum_field is not None and attr != self.checksum_field:
+            layers.append(self)
+        layer = self.underlayer
+        while layer is not None:
+            if layer.checksum_field is not None and layer.checksum_payload:
+                layers.append(layer)
+            layer = layer.underlayer
+        return layers, self.pseudo_header_checksums(attr)
+
+    def update_checksums(self,
+                         chksums,  # type: Tuple[List[Packet], List[Packet]]
+                         old,  # type: bytes
+                         new,  # type: bytes
+                         ):
+        # type: (...) -> None
+        """
+        Update the checksums returned by checksums_covering(), after the
+        layer changed from `old` to `new`. Called by setfieldval() when
+        conf.incremental_checksums is set.
+
+        The checksums are updated incrementally (RFC 1624) when the layer
+        keeps its length, and set to None, i.e. computed again when the
+        packet is built, otherwise.
+        """
+        targets, pseudo = chksums
+        if len(old) != len(new):
+            # Outermost first, so that the changes are not propagated
+            for layer in reversed(targets + pseudo):
+                layer.setfieldval(cast(str, layer.checksum_field), None)
+            return
+        start, end = 0, len(old)
+        while start < end and old[start] == new[start]:
+            start += 1
+        while end > start and old[end - 1] == new[end - 1]:
+            end -= 1
+        if start == end:
+            return
+        old, new = old[start:end], new[start:end]
+        for layer in targets:
+            if layer is not self:
+                # The offset of the layer in the data covered by the
+                # checksum of the underlayer
+                offset = len(layer.do_build()) - len(self.do_build())
+            else:
+                offset = 0
+            layer.update_checksum(old, new, odd=bool((offset + start) % 2))
+        # The fields of the pseudo-headers are 16-bit aligned, as in the
+        # layer
+        for layer in pseudo:
+            layer.update_checksum(old, new, odd=bool(start % 2))
+
+    def update_checksum(self, old, new, odd=False):
+        # type: (bytes, bytes, bool) -> None
+        """
+        Update the checksum of the layer, after the `old` bytes it covers
+        were replaced by `new`
+
+        :param odd: True if the bytes start at an odd offset in the data
+            covered by the checksum
+        """
+        fname = cast(str, self.checksum_field)
+        chksum = self.getfieldval(fname)
+        if chksum is not None:
+            self.setfieldval(fname, checksum_update(chksum, old, new, odd))
+
+    def pseudo_header_checksums(self, attr):
+        # type: (str) -> List[Packet]
+        """
+        Returns the layers whose checksums cover the field `attr` of the
+        layer in a pseudo-header
+        """
+        return []
+
+    def checksum_pseudo_header(self, length):
+        # type: (int) -> Optional[bytes]
+        """
+        Returns the pseudo-header covered by the checksum of the layer, or
+        None if it cannot be built
+
+        :param length: the length of the data covered by the checksum
+        """
+        return b""
+
+    def checksum_data(self):
+        # type: () -> Optional[bytes]
+        """
+        Returns the bytes covered by the checksum of the layer, as built,
+        including the pseudo-header and the checksum itself: their Internet
+        checksum is 0 when the checksum is valid. Used by verify_checksums().
+
+        Returns None when the layer has no checksum to verify.
+        """
+        fname = self.checksum_field
+        if fname is None or self.getfieldval(fname) is None:
+            return None
+        data = raw(self)
+        if self.checksum_payload:
+            # The padding of the lower layers is added to the last layer
+            pad = sum(len(layer.load) for layer in self.iterpayloads()
+                      if isinstance(layer, conf.padding_layer))
+        else:
+            pad = len(raw(self.payload))
+        if pad:
+            data = data[:-pad]
+        pseudo = self.checksum_pseudo_header(len(data))
+        if pseudo is None:
+            return None
+        return pseudo + data
+
     def __setattr__(self, attr, val):
         # type: (str, Any) -> None
         if attr in self.__all_slots__:
@@ -627,6 +812,19 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         return {fname: self.copy_field_value(fname, fval)
                 for fname, fval in six.iteritems(fields)}
 
+    def copy_default_fields(self):
+        # type: () -> Dict[str, Any]
+        """
+        Returns the default values of the fields for a copy of the
+        instance. The values cached for the class are shared, as they are
+        not modified: a layer that needs its own default values must copy
+        them first.
+        """
+        if self.default_fields is Packet.class_default_fields.get(
+                self.__class__):
+            return self.default_fields
+        return self.copy_fields_dict(self.default_fields)
+
     def clear_cache(self):
         # type: () -> None
         """Clear the raw packet cache for the field and all its subfields"""
@@ -648,7 +846,7 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
 
         :param field_pos_list:
         """
-        if self.raw_packet_cache is not None:
+        if self.raw_packet_cache is not None and self.raw_packet_cache_fields:
             for fname, fval in six.iteritems(self.raw_packet_cache_fields):
                 if self.getfieldval(fname) != fval:
                     self.raw_packet_cache = None
@@ -657,18 +855,41 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
                     break
             if self.raw_packet_cache is not None:
                 return self.raw_packet_cache
+        build_fields = Packet.class_build_fields.get(self.__class__)
+        if build_fields is None:
+            build_fields = self.prepare_build_fields()
         p = b""
-        for f in self.fields_desc:
-            val = self.getfieldval(f.name)
-            if isinstance(val, RawVal):
-                sval = raw(val)
-                p += sval
-                if field_pos_list is not None:
-                    field_pos_list.append((f.name, sval, len(p), len(sval)))
+        for f in build_fields:
+            if f.__class__ is _FieldsStruct:
+                vals = [self.getfieldval(fname) for fname in f.names]
+                if not any(isinstance(val, RawVal) for val in vals):
+                    p = f.addfields(self, p, vals)
+                    continue
+                flist = f.fields
             else:
-                p = f.addfield(self, p, val)
+                flist = [f]
+            for fld in flist:
+                val = self.getfieldval(fld.name)
+                if isinstance(val, RawVal):
+                    sval = raw(val)
+                    p += sval
+                    if field_pos_list is not None:
+                        field_pos_list.append((fld.name, sval, len(p),
+                                               len(sval)))
+                else:
+                    p = fld.addfield(self, p, val)
         return p
 
+    def prepare_build_fields(self):
+        # type: () -> List[Any]
+        """
+        Prepare the cached list of fields used by self_build(), where the
+        runs of fixed-size fields are merged in _FieldsStruct objects.
+        """
+        build_fields = _FieldsStruct.merge(self.fields_desc)
+        Packet.class_build_fields[self.__class__] = build_fields
+        return build_fields
+
     def do_build_payload(self):
         # type: () -> bytes
         """
@@ -676,6 +897,8 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
 
         :return: a string of payload layer
         """
+        if self._lazy_payload:
+            return self._lazy_payload[0]
         return self.payload.do_build()
 
     def do_build(self):
@@ -698,6 +921,8 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
 
     def build_padding(self):
         # type: () -> bytes
+        if self._lazy_payload:
+            return b"".join(self._lazy_payload[1])
         return self.payload.build_padding()
 
     def build(self):
@@ -725,6 +950,8 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
 
     def build_done(self, p):
         # type: (bytes) -> bytes
+        if self._lazy_payload:
+            return p
         return self.payload.build_done(p)
 
     def do_build_ps(self):
@@ -956,19 +1183,72 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         """DEV: is called right before the current layer is dissected"""
         return s
 
+    def prepare_dissect_fields(self):
+        # type: () -> List[Tuple[Any, Any]]
+        """
+        Prepare the cached list of (field, getfield_at) couples used by
+        do_dissect(). getfield_at is None for the fields that must be
+        dissected using getfield(). The runs of fixed-size fields are
+        merged in _FieldsStruct objects, dissected at once.
+        """
+        cls_name = self.__class__
+        dissect_fields = []  # type: List[Tuple[Any, Any]]
+        for f in _FieldsStruct.merge(self.fields_desc):
+            if f.__class__ is _FieldsStruct:
+                dissect_fields.append((f, f.getfields_at))
+            # Look at the class: proxy objects forwarding their attributes
+            # to another field should not expose its getfield_at().
+            elif getattr(type(f), "getfield_at", None) is None:
+                dissect_fields.append((f, None))
+            else:
+                dissect_fields.append((f, f.getfield_at))
+        Packet.class_dissect_fields[cls_name] = dissect_fields
+        return dissect_fields
+
     def do_dissect(self, s):
         # type: (bytes) -> bytes
         _raw = s
-        self.raw_packet_cache_fields = {}
-        for f in self.fields_desc:
-            if not s:
-                break
-            s, fval = f.getfield(self, s)
+        # Only created when the layer has fields with mutable values
+        self.raw_packet_cache_fields = None
+        dissect_fields = Packet.class_dissect_fields.get(self.__class__)
+        if dissect_fields is None:
+            dissect_fields = self.prepare_dissect_fields()
+        # The fields are extracted from s at a given offset, which is a
+        # (offset, bits done) tuple while in the middle of a byte. s is
+        # only sliced for the fields that do not implement getfield_at().
+        offset = 0  # type: Any
+        for f, getfield_at in dissect_fields:
+            if f.__class__ is _FieldsStruct:
+                s, offset, stop = getfield_at(self, s, offset)
+                if stop:
+                    break
+                continue
+            if isinstance(s, tuple):
+                # getfield() stopped in the middle of a byte
+                s, fval = f.getfield(self, s)
+            elif getfield_at is not None:
+                if not isinstance(offset, tuple) and offset >= len(s):
+                    break
+                offset, fval = getfield_at(self, s, offset)
+            else:
+                if isinstance(offset, tuple):
+                    s, fval = f.getfield(self, (s[offset[0]:], offset[1]))
+                elif offset >= len(s):
+                    break
+                else:
+                    s, fval = f.getfield(self, s[offset:] if offset else s)
+                offset = 0
             # We need to track fields with mutable values to discard
             # .raw_packet_cache when needed.
             if f.islist or f.holds_packets or f.ismutable:
+                if self.raw_packet_cache_fields is None:
+                    self.raw_packet_cache_fields = {}
                 self.raw_packet_cache_fields[f.name] = f.do_copy(fval)
             self.fields[f.name] = fval
+        if isinstance(offset, tuple):
+            s = (s[offset[0]:], offset[1])  # type: ignore
+        elif offset and not isinstance(s, tuple):
+            s = s[offset:]
         self.raw_packet_cache = _raw[:-len(s)] if s else _raw
         self.explicit = 1
         return s
@@ -1008,9 +1288,59 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         s = self.post_dissect(s)
 
         payl, pad = self.extract_padding(s)
-        self.do_dissect_payload(payl)
+        if self._lazy_payload is None:
+            self.do_dissect_payload(payl)
+            if pad and conf.padding:
+                self.add_payload(conf.padding_layer(pad))
+            return
+        if payl:
+            # Keep the payload aside: it will be dissected by
+            # do_dissect_lazy_payload() when first accessed.
+            self._lazy_payload = (payl, [], None)
+            object.__delattr__(self, "payload")
+        else:
+            self.do_dissect_payload(payl)
         if pad and conf.padding:
-            self.add_payload(conf.padding_layer(pad))
+            self.add_lazy_padding(pad)
+
+    def add_lazy_padding(self, pad):
+        # type: (bytes) -> None
+        """
+        Add a padding layer after the last layer, without dissecting the
+        payloads that are kept aside by a lazy dissection.
+
+        :param pad: the padding bytes
+        """
+        layer = self
+        while True:
+            if layer._lazy_payload:
+                layer._lazy_payload[1].append(pad)
+                return
+            if isinstance(layer.payload, NoPayload):
+                layer.add_payload(conf.padding_layer(pad))
+                return
+            layer = layer.payload
+
+    def do_dissect_lazy_payload(self):
+        # type: () -> Packet
+        """
+        Perform the dissection of the payload that was kept aside by a lazy
+        dissection, and call dissection_done() on it if needed.
+
+        :return: the payload layer
+        """
+        if not self._lazy_payload:
+            return self.payload
+        payl, pads, pkt = self._lazy_payload
+        # Still a lazily dissected layer, without pending payload
+        self._lazy_payload = ()
+        self.payload = NoPayload()
+        self.do_dissect_payload(payl)
+        for pad in pads:
+            self.add_lazy_padding(pad)
+        if pkt is not None:
+            self.payload.dissection_done(pkt)
+        return self.payload
 
     def guess_payload_class(self, payload):
         # type: (bytes) -> Type[Packet]
@@ -1022,7 +1352,30 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         :return: the payload class
         """
         for t in self.aliastypes:
-            for fval, cls in t.payload_guess:
+            cached = Packet.class_payload_guess_index.get(t)
+            if cached is not None and cached[0] is t.payload_guess and \
+               cached[1] == len(t.payload_guess):
+                index = cached
+            else:
+                index = t.prepare_payload_guess_index()
+            payload_guess, _, by_field, candidates = index
+            # Only check the bindings indexed on the values of the layer
+            for fname, values in by_field:
+                try:
+                    val = self.getfieldval(fname)
+                except AttributeError:
+                    continue
+                if type(val) not in _PAYLOAD_GUESS_TYPES:
+                    # Values that may not hash like the bound ones
+                    candidates = range(len(payload_guess))
+                    break
+                found = values.get(val)
+                if found:
+                    candidates = candidates + found
+            else:
+                candidates = sorted(candidates)
+            for i in candidates:
+                fval, cls = payload_guess[i]
                 try:
                     if all(v == self.getfieldval(k)
                            for k, v in six.iteritems(fval)):
@@ -1031,6 +1384,32 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
                     pass
         return self.default_payload_class(payload)
 
+    @classmethod
+    def prepare_payload_guess_index(cls):
+        # type: () -> Tuple[Any, ...]
+        """
+        Prepare the cached index of payload_guess used by
+        guess_payload_class(). Each binding is indexed by the name and value
+        of one of its fields. The bindings that cannot be indexed are always
+        checked.
+        """
+        by_field = {}  # type: Dict[str, Dict[Any, List[int]]]
+        others = []  # type: List[int]
+        for i, (fval, _) in enumerate(cls.payload_guess):
+            for fname in sorted(fval):
+                value = fval[fname]
+                if type(value) in _PAYLOAD_GUESS_TYPES:
+                    by_field.setdefault(fname, {}).setdefault(
+                        value, []
+                    ).append(i)
+                    break
+            else:
+                others.append(i)
+        index = (cls.payload_guess, len(cls.payload_guess),
+                 list(six.iteritems(by_field)), others)
+        Packet.class_payload_guess_index[cls] = index
+        return index
+
     def default_payload_class(self, payload):
         # type: (bytes) -> Type[Packet]
         """
@@ -1063,8 +1442,8 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
         pkt = self.__class__()
         pkt.explicit = 1
         pkt.fields = kargs
-        pkt.default_fields = self.copy_fields_dict(self.default_fields)
-        pkt.overloaded_fields = self.overloaded_fields.copy()
+        pkt.default_fields = self.copy_default_fields()
+        pkt.overloaded_fields = self.overloaded_fields
         pkt.time = self.time
         pkt.underlayer = self.underlayer
         pkt.post_transforms = self.post_transforms
@@ -1073,6 +1452,9 @@ class Packet(six.with_metaclass(Packet_metaclass,  # type: ignore
             self.raw_packet_cache_fields
         )
         pkt.wirelen = self.wirelen
+        pkt.pkt_comment = self.pkt_comment
+        pkt.direction = self.direction
+        pkt.sniffed_on = self.sniffed_on
         if payload is not None:
             pkt.add_payload(payload)
         if share_time:
@@ -2001,6 +2383,7 @@ def bind_bottom_up(lower,  # type: Type[Packet]
         fval.update(__fval)
     lower.payload_guess = lower.payload_guess[:]
     lower.payload_guess.append((fval, upper))
+    Packet.class_payload_guess_index.pop(lower, None)
 
 
 def bind_top_down(lower,  # type: Type[Packet]
@@ -2068,6 +2451,7 @@ def split_bottom_up(lower,  # type: Type[Packet]
         )
         return cls != upper or params_is_invalid
     lower.payload_guess = [x for x in lower.payload_guess if do_filter(*x)]
+    Packet.class_payload_guess_index.pop(lower, None)
 
 
 def split_top_down(lower,  # type: Type[Packet]
@@ -2327,8 +2711,8 @@ def _pkt_ls(obj,  # type: Union[Packet, Type[Packet]]
         long_attrs = []  # type: List[str]
         while isinstance(cur_fld, (Emph, ConditionalField)):
             if isinstance(cur_fld, ConditionalField):
-                attrs.append(cur_fld.__class__.__name__[:4])  # type: ignore
-            cur_fld = cur_fld.fld  # type: ignore
+                attrs.append(cur_fld.__class__.__name__[:4])
+            cur_fld = cur_fld.fld
         if verbose and isinstance(cur_fld, EnumField) \
            and hasattr(cur_fld, "i2s"):
             if len(cur_fld.i2s or []) < 50:
@@ -2592,13 +2976,14 @@ def fuzz(p,  # type: Packet
                 key: (val._fix() if isinstance(val, VolatileValue) else val)
                 for key, val in six.iteritems(new_default_fields)
             }
-            q.default_fields.update(new_default_fields)
+            q.default_fields = dict(q.default_fields, **new_default_fields)
             # add the random values of the MultipleTypeFields
             for name in multiple_type_fields:
                 fld = cast(MultipleTypeField, q.get_field(name))
                 rnd = fld._find_fld_pkt(q).randval()
                 if rnd is not None:
                     new_default_fields[name] = rnd
-        q.default_fields.update(new_default_fields)
+        # The default values may be shared with the class
+        q.default_fields = dict(q.default_fields, **new_default_fields)
         q = q.payload
     return p
@@ -6,12 +6,11 @@
 from __future__ import print_function
 import os
 import subprocess
-import collections
 import time
 import scapy.modules.six as six
 from threading import Lock, Thread
 
-from scapy.automaton import Message, select_objects, SelectableObject
+from scapy.automaton import Message, ObjectPipe, Poller, SelectableObject
 from scapy.consts import WINDOWS
 from scapy.error import log_runtime, warning
 from scapy.config import conf
@@ -45,10 +44,10 @@ class PipeEngine(SelectableObject):
         self._add_pipes(*pipes)
         self.thread_lock = Lock()
         self.command_lock = Lock()
-        self.__fd_queue = collections.deque()
-        self.__fdr, self.__fdw = os.pipe()
         self.thread = None
         SelectableObject.__init__(self)
+        self.__cmd = ObjectPipe()
+        self.__cmd.register_hook(self.call_release)
 
     def __getattr__(self, attr):
         if attr.startswith("spawn_"):
@@ -65,19 +64,16 @@ class PipeEngine(SelectableObject):
     def check_recv(self):
         """As select.select is not available, we check if there
         is some data to read by using a list that stores pointers."""
-        return len(self.__fd_queue) > 0
+        return self.__cmd.check_recv()
 
     def fileno(self):
-        return self.__fdr
+        return self.__cmd.fileno()
 
     def _read_cmd(self):
-        os.read(self.__fdr, 1)
-        return self.__fd_queue.popleft()
+        return self.__cmd.recv()
 
     def _write_cmd(self, _cmd):
-        self.__fd_queue.append(_cmd)
-        os.write(self.__fdw, b"X")
-        self.call_release()
+        self.__cmd.send(_cmd)
 
     def add_one_pipe(self, pipe):
         self.active_pipes.add(pipe)
@@ -109,16 +105,18 @@ class PipeEngine(SelectableObject):
 
     def run(self):
         log_runtime.debug("Pipe engine thread started.")
+        poller = Poller()
         try:
             for p in self.active_pipes:
                 p.start()
             sources = self.active_sources
             sources.add(self)
             exhausted = set([])
+            poller.update(sources)
             RUN = True
             STOP_IF_EXHAUSTED = False
             while RUN and (not STOP_IF_EXHAUSTED or len(sources) > 1):
-                fds = select_objects(sources, 2)
+                fds = poller.poll(2)
                 for fd in fds:
                     if fd is self:
                         cmd = self._read_cmd()
@@ -130,6 +128,7 @@ class PipeEngine(SelectableObject):
                         elif cmd == "A":
                             sources = self.active_sources - exhausted
                             sources.add(self)
+                            poller.update(sources)
                         else:
                             warning("Unknown internal pipe engine command: %r."
                                     " Ignoring.", cmd)
@@ -143,10 +142,12 @@ class PipeEngine(SelectableObject):
                             if fd.exhausted():
                                 exhausted.add(fd)
                                 sources.remove(fd)
+                                poller.unregister(fd)
         except KeyboardInterrupt:
             pass
         finally:
             try:
+                poller.close()
                 for p in self.active_pipes:
                     p.stop()
             finally:
@@ -422,38 +423,33 @@ class AutoSource(Source, SelectableObject):
     def __init__(self, name=None):
         SelectableObject.__init__(self)
         Source.__init__(self, name=name)
-        self.__fdr, self.__fdw = os.pipe()
-        self._queue = collections.deque()
+        self._queue = ObjectPipe()
+        self._queue.register_hook(self.call_release)
 
     def fileno(self):
-        return self.__fdr
+        return self._queue.fileno()
 
     def check_recv(self):
-        return len(self._queue) > 0
+        return self._queue.check_recv()
 
     def _gen_data(self, msg):
-        self._queue.append((msg, False))
-        self._wake_up()
+        self._queue.send((msg, False))
 
     def _gen_high_data(self, msg):
-        self._queue.append((msg, True))
-        self._wake_up()
+        self._queue.send((msg, True))
 
     def _wake_up(self):
-        os.write(self.__fdw, b"X")
-        self.call_release()
+        self._queue.send(None)
 
     def deliver(self):
-        os.read(self.__fdr, 1)
-        try:
-            msg, high = self._queue.popleft()
-        except IndexError:  # empty queue. Exhausted source
-            pass
+        data = self._queue.recv()
+        if data is None:  # no message. Exhausted source
+            return
+        msg, high = data
+        if high:
+            self._high_send(msg)
         else:
-            if high:
-                self._high_send(msg)
-            else:
-                self._send(msg)
+            self._send(msg)
 
 
 class ThreadGenSource(AutoSource):
@@ -10,6 +10,7 @@ PacketList: holds several packets and allows to do operations on them.
 
 from __future__ import absolute_import
 from __future__ import print_function
+import array
 import os
 from collections import defaultdict
 
@@ -17,9 +18,11 @@ from scapy.compat import lambda_tuple_converter
 from scapy.config import conf
 from scapy.base_classes import BasePacket, BasePacketList, \
     _CanvasDumpExtended, PacketList_metaclass
+from scapy.fields import BitEnumField, BitField, ConditionalField, Emph, \
+    Field, FlagsField
 from scapy.utils import do_graph, hexdump, make_table, make_lined_table, \
-    make_tex_table, issubtype
-from scapy.extlib import plt, Line2D, \
+    make_tex_table, issubtype, verify_checksums
+from scapy.extlib import plt, Line2D, numpy, \
     MATPLOTLIB_INLINED, MATPLOTLIB_DEFAULT_PLOT_KARGS
 from functools import reduce
 import scapy.modules.six as six
@@ -39,6 +42,7 @@ from scapy.compat import (
     Type,
     TypeVar,
     Union,
+    cast,
 )
 from scapy.packet import Packet
 
@@ -228,6 +232,21 @@ class _PacketList(Generic[_Inner]):
         """Best way to display the packet list. Defaults to nsummary() method"""  # noqa: E501
         return self.nsummary(*args, **kargs)
 
+    def check_checksums(self):
+        # type: () -> None
+        """Prints the invalid IP, TCP, UDP, ICMP and ICMPv6 checksums of the
+        packets, with the packets' numbers. See verify_checksums()."""
+        pkts = [self._elt2pkt(r) for r in self.res]
+        for i, layer in verify_checksums(pkts):
+            fname = cast(str, layer.checksum_field)
+            chksum = layer.getfieldval(fname)
+            print(conf.color_theme.id(i, fmt="%04i"), end=' ')
+            print("%s %s=%s" % (
+                layer.name, fname,
+                conf.color_theme.fail(layer.get_field(fname).i2repr(layer,
+                                                                    chksum))
+            ))
+
     def filter(self, func):
         # type: (Callable[..., bool]) -> _PacketList[_Inner]
         """Returns a packet list filtered by a truth function. This truth
@@ -752,6 +771,124 @@ class _PacketList(Generic[_Inner]):
             name, stats
         )
 
+    def to_columns(self,
+                   columns,  # type: Dict[str, str]
+                   chunk_size=4096,  # type: int
+                   missing=-1,  # type: int
+                   ):
+        # type: (...) -> Dict[str, Any]
+        """Extracts some values of the packets into columns.
+
+        :param columns: a dict {column name: value}, where value is "time",
+            "len", "wirelen" or "Layer.field" (e.g. "IP.src")
+        :param chunk_size: number of values allocated at once in the columns
+        :param missing: value used in the integer columns when a packet does
+            not have the layer, or the field is None. Floating point columns
+            use NaN, the other ones None.
+        :return: a dict {column name: column}. The columns are NumPy arrays,
+            or array.array objects and lists when NumPy is not installed.
+
+        >>> pl.to_columns({"ts": "time", "src": "IP.src", "dport": "TCP.dport"})  # noqa: E501
+        """
+        return _to_columns((self._elt2pkt(p) for p in self.res), columns,
+                           chunk_size=chunk_size, missing=missing)
+
+
+def _column_getter(spec):
+    # type: (str) -> Tuple[Optional[str], Callable[[Packet], Any]]
+    """Returns the type code of the column described by spec ("d", "q", or
+    None for Python objects), and a function extracting its value from a
+    packet.
+    """
+    if spec == "time":
+        return "d", lambda pkt: pkt.time
+    if spec == "len":
+        return "q", len
+    if spec == "wirelen":
+        return "q", lambda pkt: len(pkt) if pkt.wirelen is None \
+            else pkt.wirelen
+    lname, _, fname = spec.partition(".")
+    for cls in conf.layers:
+        if cls.__name__ == lname:
+            break
+    else:
+        raise ValueError("Unknown layer [%s]" % lname)
+    for fld in cls.fields_desc:
+        if fld.name == fname:
+            break
+    else:
+        raise ValueError("Unknown field [%s] in layer [%s]" % (fname, lname))
+    # Look through ConditionalField and Emph
+    while isinstance(fld, (Emph, ConditionalField)):
+        fld = fld.fld
+    if isinstance(fld, (BitField, BitEnumField, FlagsField)) or \
+       (isinstance(fld, Field) and not fld.islist and
+            fld.fmt[-1] in "bBhHiIlLq"):
+        typecode = "q"  # type: Optional[str]
+    else:
+        typecode = None
+
+    def getter(pkt):
+        # type: (Packet) -> Any
+        layer = pkt.getlayer(lname)
+        return None if layer is None else layer.getfieldval(fname)
+    return typecode, getter
+
+
+def _to_columns(packets,  # type: Iterator[Packet]
+                columns,  # type: Dict[str, str]
+                chunk_size=4096,  # type: int
+                missing=-1,  # type: int
+                ):
+    # type: (...) -> Dict[str, Any]
+    """Fills the columns described by `columns` with the values extracted
+    from `packets`. See _PacketList.to_columns()."""
+    getters = [(name,) + _column_getter(spec)
+               for name, spec in six.iteritems(columns)]
+    missing_values = {"q": missing, "d": float("nan"), None: None}
+
+    def new_chunk(typecode):
+        # type: (Optional[str]) -> Any
+        if numpy is not None:
+            return numpy.empty(chunk_size, dtype={"q": numpy.int64,
+                                                  "d": numpy.float64,
+                                                  None: object}[typecode])
+        if typecode is None:
+            return [None] * chunk_size
+        return array.array(typecode, [0]) * chunk_size
+
+    chunks = {name: [] for name in columns}  # type: Dict[str, List[Any]]
+    current = {name: new_chunk(typecode) for name, typecode, _ in getters}
+    i = 0
+    for pkt in packets:
+        if i == chunk_size:
+            for name, typecode, _ in getters:
+                chunks[name].append(current[name])
+                current[name] = new_chunk(typecode)
+            i = 0
+        for name, typecode, getter in getters:
+            val = getter(pkt)
+            if val is None:
+                val = missing_values[typecode]
+            elif typecode == "q":
+                val = int(val)
+            elif typecode == "d":
+                val = float(val)
+            current[name][i] = val
+        i += 1
+    result = {}
+    for name, typecode, _ in getters:
+        chunks[name].append(current[name][:i])
+        if numpy is not None:
+            result[name] = numpy.concatenate(chunks[name])
+        elif typecode is None:
+            result[name] = [val for c in chunks[name] for val in c]
+        else:
+            result[name] = array.array(typecode)
+            for c in chunks[name]:
+                result[name].extend(c)
+    return result
+
 
 class PacketList(_PacketList[Packet],
                  BasePacketList[Packet],
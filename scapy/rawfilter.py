@@ -0,0 +1,253 @@
+# This file is part of Scapy
+# See http://www.secdev.org/projects/scapy for more information
+# This program is published under a GPLv2 license
+
+"""
+Filters run on the bytes of the packets, before they are dissected.
+
+A raw filter is called with the (data, wirelen, linktype) of each packet,
+and returns False for the packets to skip. This is the signature of the
+bpf_filter of the pcap readers, and of the raw_filter of the sockets and
+of sniff()::
+
+    >>> sniff(raw_filter=ip_proto_filter(17) & port_filter(53))
+    >>> sniff(offline="dump.pcap", raw_filter=ethertype_filter(0x86dd))
+
+The filters returned by the functions of this module only read a few bytes
+of the packets, at offsets that depend on the link type. They can be
+combined with &, | and ~, with each other or with other raw filters.
+"""
+
+import struct
+
+from scapy.data import DLT_EN10MB, DLT_IPV4, DLT_IPV6, DLT_LINUX_SLL, \
+    DLT_LOOP, DLT_NULL, DLT_RAW, DLT_RAW_ALT, ETH_P_IP, ETH_P_IPV6
+
+# Typing imports
+from scapy.compat import (
+    Any,
+    Callable,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+_RAW_LINKTYPES = frozenset([DLT_RAW, DLT_RAW_ALT, DLT_IPV4, DLT_IPV6])
+_VLAN_ETHERTYPES = frozenset([0x8100, 0x88a8, 0x9100])
+# Address families of IPv6, in the DLT_NULL header of the different OSes
+_AF_INET6 = frozenset([10, 24, 28, 30])
+# IPv6 extension headers: Hop-by-Hop, Routing, Fragment, Destination
+_IPV6_EXT_HEADERS = frozenset([0, 43, 44, 60])
+# Protocols with 16-bit source and destination ports: TCP, UDP, SCTP,
+# UDP-Lite
+_PORT_PROTOS = frozenset([6, 17, 132, 136])
+
+_unpack_H = struct.Struct("!H").unpack_from
+_unpack_I = struct.Struct("!I").unpack_from
+_unpack_B = struct.Struct("B").unpack_from
+
+
+class RawFilter(object):
+    """
+    A filter run on the bytes of the packets, that can be combined with
+    other raw filters with &, | and ~.
+
+    :param func: called with the (data, wirelen, linktype) of the packets
+    :param desc: a description of the filter
+    """
+
+    def __init__(self, func, desc):
+        # type: (Callable[[bytes, Optional[int], Optional[int]], bool], str) -> None  # noqa: E501
+        self.func = func
+        self.desc = desc
+
+    def __call__(self, data, wirelen, linktype):
+        # type: (bytes, Optional[int], Optional[int]) -> bool
+        return self.func(data, wirelen, linktype)
+
+    def __and__(self, other):
+        # type: (Callable[[bytes, Optional[int], Optional[int]], bool]) -> RawFilter  # noqa: E501
+        f, g = self.func, other
+
+        def func(data, wirelen, linktype):
+            # type: (bytes, Optional[int], Optional[int]) -> bool
+            return f(data, wirelen, linktype) and g(data, wirelen, linktype)
+        return RawFilter(func, "(%s and %s)" % (self.desc, _desc(other)))
+
+    def __or__(self, other):
+        # type: (Callable[[bytes, Optional[int], Optional[int]], bool]) -> RawFilter  # noqa: E501
+        f, g = self.func, other
+
+        def func(data, wirelen, linktype):
+            # type: (bytes, Optional[int], Optional[int]) -> bool
+            return f(data, wirelen, linktype) or g(data, wirelen, linktype)
+        return RawFilter(func, "(%s or %s)" % (self.desc, _desc(other)))
+
+    def __invert__(self):
+        # type: () -> RawFilter
+        f = self.func
+
+        def func(data, wirelen, linktype):
+            # type: (bytes, Optional[int], Optional[int]) -> bool
+            return not f(data, wirelen, linktype)
+        return RawFilter(func, "not %s" % self.desc)
+
+    def __repr__(self):
+        # type: () -> str
+        return "<RawFilter %s>" % self.desc
+
+
+def _desc(flt):
+    # type: (Any) -> str
+    if isinstance(flt, RawFilter):
+        return flt.desc
+    return repr(flt)
+
+
+def _network_layer(data, linktype):
+    # type: (bytes, Optional[int]) -> Tuple[Optional[int], int]
+    """Returns the (ethertype, offset) of the network layer of a packet,
+    skipping the VLAN tags. The ethertype is None when the link type is not
+    supported, or when the packet is too short.
+    """
+    try:
+        if linktype == DLT_EN10MB:
+            etype = _unpack_H(data, 12)[0]
+            offset = 14
+            while etype in _VLAN_ETHERTYPES:
+                etype = _unpack_H(data, offset + 2)[0]
+                offset += 4
+            return etype, offset
+        if linktype in _RAW_LINKTYPES:
+            version = _unpack_B(data, 0)[0] >> 4
+            if version == 4:
+                return ETH_P_IP, 0
+            if version == 6:
+                return ETH_P_IPV6, 0
+            return None, 0
+        if linktype == DLT_LINUX_SLL:
+            return _unpack_H(data, 14)[0], 16
+        if linktype in (DLT_NULL, DLT_LOOP):
+            # The address family is in the byte order of the host (NULL),
+            # or in network order (LOOP)
+            family = _unpack_I(data, 0)[0]
+            if family > 0xffff:
+                family = struct.unpack("<I", struct.pack(">I", family))[0]
+            if family == 2:
+                return ETH_P_IP, 4
+            if family in _AF_INET6:
+                return ETH_P_IPV6, 4
+    except struct.error:
+        pass
+    return None, 0
+
+
+def _transport_layer(data, linktype):
+    # type: (bytes, Optional[int]) -> Tuple[Optional[int], Optional[int]]
+    """Returns the (protocol, offset) of the transport layer of an IPv4 or
+    IPv6 packet, skipping the IPv6 extension headers. The offset is None
+    for the fragments that do not start the datagram, and the protocol is
+    None for the other packets.
+    """
+    etype, offset = _network_layer(data, linktype)
+    try:
+        if etype == ETH_P_IP:
+            ihl = (_unpack_B(data, offset)[0] & 0xf) * 4
+            if _unpack_H(data, offset + 6)[0] & 0x1fff:
+                return _unpack_B(data, offset + 9)[0], None
+            return _unpack_B(data, offset + 9)[0], offset + ihl
+        if etype == ETH_P_IPV6:
+            proto = _unpack_B(data, offset + 6)[0]
+            offset += 40
+            while proto in _IPV6_EXT_HEADERS:
+                if proto == 44:
+                    first = not _unpack_H(data, offset + 2)[0] & 0xfff8
+                    proto = _unpack_B(data, offset)[0]
+                    offset += 8
+                    if not first:
+                        return proto, None
+                    continue
+                proto, length = struct.unpack_from("BB", data, offset)
+                offset += (length + 1) * 8
+            return proto, offset
+    except struct.error:
+        pass
+    return None, None
+
+
+def ethertype_filter(*types):
+    # type: (*int) -> RawFilter
+    """Returns a raw filter that matches the packets whose network layer
+    has one of the ethertypes (e.g. 0x0800 for IPv4, 0x86dd for IPv6)"""
+    types_set = frozenset(types)
+
+    def func(data, wirelen, linktype):
+        # type: (bytes, Optional[int], Optional[int]) -> bool
+        return _network_layer(data, linktype)[0] in types_set
+    return RawFilter(func, "ethertype %s" % _format_values(types))
+
+
+def ip_proto_filter(*protos):
+    # type: (*int) -> RawFilter
+    """Returns a raw filter that matches the IPv4 and IPv6 packets of one of
+    the protocols (e.g. 6 for TCP, 17 for UDP)"""
+    protos_set = frozenset(protos)
+
+    def func(data, wirelen, linktype):
+        # type: (bytes, Optional[int], Optional[int]) -> bool
+        return _transport_layer(data, linktype)[0] in protos_set
+    return RawFilter(func, "ip proto %s" % _format_values(protos))
+
+
+def port_filter(ports, src=True, dst=True):
+    # type: (Union[int, Tuple[int, int], Sequence[Union[int, Tuple[int, int]]]], bool, bool) -> RawFilter  # noqa: E501
+    """Returns a raw filter that matches the TCP, UDP, SCTP and UDP-Lite
+    packets, over IPv4 or IPv6, from or to one of the ports.
+
+    :param ports: a port, a (low, high) range of ports, or a list of them
+    :param src: match the source port
+    :param dst: match the destination port
+    """
+    if isinstance(ports, (int, tuple)):
+        ports = [ports]
+    ranges = [(p, p) if isinstance(p, int) else (p[0], p[1]) for p in ports]
+    if sum(high - low + 1 for low, high in ranges) <= 4096:
+        ports_set = frozenset(port for low, high in ranges
+                              for port in range(low, high + 1))
+        match = ports_set.__contains__  # type: Callable[[int], bool]
+    else:
+        def match(port):
+            # type: (int) -> bool
+            for low, high in ranges:
+                if low <= port <= high:
+                    return True
+            return False
+    offsets = [off for off, enabled in ((0, src), (2, dst)) if enabled]
+
+    def func(data, wirelen, linktype):
+        # type: (bytes, Optional[int], Optional[int]) -> bool
+        proto, offset = _transport_layer(data, linktype)
+        if proto not in _PORT_PROTOS or offset is None:
+            return False
+        try:
+            for off in offsets:
+                if match(_unpack_H(data, offset + off)[0]):
+                    return True
+        except struct.error:
+            pass
+        return False
+    desc = " or ".join(str(low) if low == high else "%d-%d" % (low, high)
+                       for low, high in ranges)
+    if src and not dst:
+        desc = "src port %s" % desc
+    elif dst and not src:
+        desc = "dst port %s" % desc
+    else:
+        desc = "port %s" % desc
+    return RawFilter(func, desc)
+
+
+def _format_values(values):
+    # type: (Sequence[int]) -> str
+    return " or ".join("%#x" % v if v > 0xff else str(v) for v in values)
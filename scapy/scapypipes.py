@@ -11,7 +11,8 @@ from scapy.modules.six.moves.queue import Queue, Empty
 from scapy.pipetool import Source, Drain, Sink
 from scapy.config import conf
 from scapy.compat import raw
-from scapy.utils import ContextManagerSubprocess, PcapReader, PcapWriter
+from scapy.utils import ContextManagerSubprocess, PcapReader, PcapWriter, \
+    PcapNgWriter, RotatingPcapWriter
 
 
 class SniffSource(Source):
@@ -149,7 +150,8 @@ class WrpcapSink(Sink):
 
         Due to limitations of the ``pcap`` format, all packets **must** be of
         the same link type. This class will not mutate packets to conform with
-        the expected link type.
+        the expected link type. The ``pcapng`` format does not have this
+        limitation.
 
     .. code::
 
@@ -163,6 +165,14 @@ class WrpcapSink(Sink):
     :type fname: str
     :param linktype: See :py:attr:`linktype`.
     :type linktype: None or int
+    :param pcapng: write a ``pcapng`` file, that keeps the interface
+        (``sniffed_on``), the comment and the direction of the packets.
+    :type pcapng: bool
+    :param rotate: use a :py:class:`RotatingPcapWriter`, that writes the
+        packets in a background thread, and rotates the files.
+    :type rotate: bool
+    :param kargs: passed to the writer, e.g. ``compression``, or the
+        ``max_size`` and ``interval`` of a :py:class:`RotatingPcapWriter`.
 
     .. py:attribute:: linktype
 
@@ -178,14 +188,26 @@ class WrpcapSink(Sink):
         This attribute has no effect after calling :py:meth:`PipeEngine.start`.
     """
 
-    def __init__(self, fname, name=None, linktype=None):
+    def __init__(self, fname, name=None, linktype=None, pcapng=False,
+                 rotate=False, **kargs):
         Sink.__init__(self, name=name)
         self.fname = fname
         self.f = None
         self.linktype = linktype
+        self.pcapng = pcapng
+        self.rotate = rotate
+        self.kargs = kargs
 
     def start(self):
-        self.f = PcapWriter(self.fname, linktype=self.linktype)
+        if self.rotate:
+            self.f = RotatingPcapWriter(self.fname, linktype=self.linktype,
+                                        pcapng=self.pcapng, **self.kargs)
+        elif self.pcapng:
+            self.f = PcapNgWriter(self.fname, linktype=self.linktype,
+                                  **self.kargs)
+        else:
+            self.f = PcapWriter(self.fname, linktype=self.linktype,
+                                **self.kargs)
 
     def stop(self):
         if self.f:
@@ -16,20 +16,21 @@ import subprocess
 import time
 import types
 
-from scapy.compat import plain_str
+from scapy.compat import plain_str, raw
 from scapy.data import ETH_P_ALL
 from scapy.config import conf
 from scapy.error import warning
 from scapy.interfaces import network_name, resolve_iface
 from scapy.packet import Gen, Packet
-from scapy.utils import get_temp_file, tcpdump, wrpcap, \
-    ContextManagerSubprocess, PcapReader
+from scapy.utils import get_temp_file, wrpcap, \
+    ContextManagerSubprocess, PcapReader, RawPcapReader
 from scapy.plist import PacketList, SndRcvList
 from scapy.error import log_runtime, log_interactive, Scapy_Exception
 from scapy.base_classes import SetGen
 from scapy.modules import six
 from scapy.modules.six.moves import map
 from scapy.sessions import DefaultSession
+from scapy.rawfilter import RawFilter
 from scapy.supersocket import SuperSocket
 
 if conf.route is None:
@@ -207,17 +208,24 @@ class SndRcvHandler(object):
             if self.verbose:
                 print("Begin emission:")
             i = 0
-            for p in self.tobesent:
-                # Populate the dictionary of _sndrcv_rcv
-                # _sndrcv_rcv won't miss the answer of a packet that
-                # has not been sent
-                self.hsent.setdefault(p.hashret(), []).append(p)
-                # Send packet
-                self.pks.send(p)
-                time.sleep(self.inter)
-                i += 1
+            start = time.time()
+            if self.inter:
+                for p in self.tobesent:
+                    # Populate the dictionary of _sndrcv_rcv
+                    # _sndrcv_rcv won't miss the answer of a packet that
+                    # has not been sent
+                    self.hsent.setdefault(p.hashret(), []).append(p)
+                    # Send packet
+                    self.pks.send(p)
+                    time.sleep(self.inter)
+                    i += 1
+            else:
+                for batch in _batches(self.tobesent):
+                    for p in batch:
+                        self.hsent.setdefault(p.hashret(), []).append(p)
+                    i += self.pks.send_many(batch)
             if self.verbose:
-                print("Finished sending %i packets." % i)
+                print("Finished sending %i packets%s." % (i, _pps(i, start)))
         except SystemExit:
             pass
         except Exception:
@@ -227,8 +235,16 @@ class SndRcvHandler(object):
         """Internal function used to process each packet."""
         if r is None:
             return
+        self._match(r)
+        if self.notans <= 0 and not self.multi:
+            self.sniffer.stop(join=False)
+
+    def _match(self, r, h=None):
+        """Matches a received packet with the sent packets, whose hashret()
+        is h if it is already known"""
         ok = False
-        h = r.hashret()
+        if h is None:
+            h = r.hashret()
         if h in self.hsent:
             hlst = self.hsent[h]
             for i, sentpkt in enumerate(hlst):
@@ -245,8 +261,6 @@ class SndRcvHandler(object):
                             self.notans -= 1
                         sentpkt._answered = 1
                     break
-        if self.notans <= 0 and not self.multi:
-            self.sniffer.stop(join=False)
         if not ok:
             if self.verbose > 1:
                 os.write(1, b".")
@@ -272,6 +286,14 @@ class SndRcvHandler(object):
                 raise
 
 
+def _pps(n, start):
+    """Returns the rate of n packets sent since start, to be printed"""
+    elapsed = time.time() - start
+    if n < 2 or not elapsed:
+        return ""
+    return " (%.1f pps)" % (n / elapsed)
+
+
 def sndrcv(*args, **kwargs):
     """Scapy raw function to send a packet and receive its answer.
     WARNING: This is an internal function. Using sr/srp/sr1/srp is
@@ -281,7 +303,168 @@ def sndrcv(*args, **kwargs):
     return sndrcver.results()
 
 
-def __gen_send(s, x, inter=0, loop=0, count=None, verbose=None, realtime=None, return_packets=False, *args, **kargs):  # noqa: E501
+class SendStats(object):
+    """Timing statistics of the packets sent by send() or sendp()
+
+    The jitter of a packet is the delay between the time it was scheduled
+    at and the time it was sent.
+    """
+    # Upper bounds of the buckets of the jitter histogram, in seconds
+    buckets = [1e-6, 1e-5, 1e-4, 1e-3, 1e-2, float("inf")]
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.start = None
+        self.end = None
+        self.max_jitter = 0.
+        self.total_jitter = 0.
+        self.histogram = [0] * len(self.buckets)
+
+    def add(self, now, size, jitter):
+        """Records a packet of size bytes, sent at now"""
+        if self.start is None:
+            self.start = now
+        self.end = now
+        self.count += 1
+        self.bytes += size
+        self.total_jitter += jitter
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+        for i, bound in enumerate(self.buckets):
+            if jitter < bound:
+                self.histogram[i] += 1
+                break
+
+    @property
+    def duration(self):
+        """The time between the first and the last packet, in s"""
+        if self.start is None:
+            return 0.
+        return self.end - self.start
+
+    @property
+    def pps(self):
+        """The achieved rate, in packets per second"""
+        if self.count < 2 or not self.duration:
+            return 0.
+        return (self.count - 1) / self.duration
+
+    @property
+    def mbps(self):
+        """The achieved rate, in MBits per second"""
+        if self.count < 2 or not self.duration:
+            return 0.
+        return self.bytes * 8 * (self.count - 1) / self.count / \
+            self.duration / 1e6
+
+    @property
+    def mean_jitter(self):
+        if not self.count:
+            return 0.
+        return self.total_jitter / self.count
+
+    @staticmethod
+    def _fmt_time(t):
+        if t < 1e-3:
+            return "%gus" % round(t * 1e6, 3)
+        return "%gms" % round(t * 1e3, 3)
+
+    def show(self):
+        """Prints the statistics and the jitter histogram"""
+        print(self)
+        low = "0"
+        for bound, n in zip(self.buckets, self.histogram):
+            if bound == float("inf"):
+                label = ">= %s" % low
+            else:
+                label = "%s - %s" % (low, self._fmt_time(bound))
+                low = self._fmt_time(bound)
+            print("  %-15s %8d" % (label, n))
+
+    def __repr__(self):
+        return "<SendStats: %d packets, %d bytes in %.6fs, %.1f pps, " \
+            "%.3f Mbps, jitter mean %s max %s>" % (
+                self.count, self.bytes, self.duration, self.pps, self.mbps,
+                self._fmt_time(self.mean_jitter),
+                self._fmt_time(self.max_jitter),
+            )
+
+
+class _PacedSender(object):
+    """Sends packets at a rate, or at the relative times of the packets,
+    and records SendStats. With both, the packets are sent at their times,
+    but not faster than the rate (inter, pps or mbps).
+
+    The waits end with a busy-wait, as time.sleep() is only precise to
+    the scheduling granularity of the OS. When a packet is late, the
+    following ones are sent without waiting until the schedule is caught up
+    with, like tcpreplay does.
+
+    When raw_images is set, the bytes of the packets are sent: they are
+    built before waiting for their time, and only once when the packets
+    are sent several times.
+    """
+    # The last part of the waits, in s, that is busy-waited
+    spin = 0.002
+    clock = getattr(time, "perf_counter", time.time)
+
+    def __init__(self, s, inter=0, pps=None, mbps=None, realtime=None,
+                 raw_images=False):
+        self.s = s
+        self.gap = max(inter, 1. / pps if pps else 0)
+        self.byte_time = 8. / (mbps * 1e6) if mbps else 0
+        self.realtime = 1. if realtime is True else float(realtime or 0)
+        self.raw_images = raw_images
+        self.stats = SendStats()
+        self.due = None
+        self.cache = None
+
+    def _wait(self, due):
+        now = self.clock()
+        if due - now > self.spin:
+            time.sleep(due - now - self.spin)
+        while now < due:
+            now = self.clock()
+        return now
+
+    def _items(self, x):
+        for p in x:
+            data = raw(p) if self.raw_images else p
+            yield (p, data, len(data),
+                   float(p.time) if self.realtime else 0.)
+
+    def run(self, x, cache=False):
+        """Sends the packets of x, and yields them once sent. The images
+        are kept for the next calls when cache is set."""
+        if self.cache is not None:
+            items = self.cache
+        else:
+            items = self._items(x)
+            if cache and self.raw_images:
+                items = self.cache = list(items)
+        base = None
+        for p, data, size, ptime in items:
+            if self.realtime:
+                if base is None:
+                    base = self.clock() - ptime / self.realtime
+                due = base + ptime / self.realtime
+                if self.due is not None and (self.gap or self.byte_time):
+                    due = max(due, self.due)
+            elif self.due is None or not (self.gap or self.byte_time):
+                due = self.clock()
+            else:
+                due = self.due
+            now = self._wait(due)
+            self.s.send(data)
+            if data is not p:
+                p.sent_time = time.time()
+            self.stats.add(now, size, now - due)
+            self.due = due + max(self.gap, size * self.byte_time)
+            yield p
+
+
+def __gen_send(s, x, inter=0, loop=0, count=None, verbose=None, realtime=None, return_packets=False, pps=None, mbps=None, return_stats=False, raw_images=False, *args, **kargs):  # noqa: E501
     if isinstance(x, str):
         x = conf.raw_layer(load=x)
     if not isinstance(x, Gen):
@@ -295,45 +478,76 @@ def __gen_send(s, x, inter=0, loop=0, count=None, verbose=None, realtime=None, r
         loop = -1
     if return_packets:
         sent_packets = PacketList()
+    start = time.time()
+    pacer = None
+    if pps or mbps or realtime or return_stats:
+        pacer = _PacedSender(s, inter=inter, pps=pps, mbps=mbps,
+                             realtime=realtime, raw_images=raw_images)
     try:
         while loop:
-            dt0 = None
-            for p in x:
-                if realtime:
-                    ct = time.time()
-                    if dt0:
-                        st = dt0 + float(p.time) - ct
-                        if st > 0:
-                            time.sleep(st)
-                    else:
-                        dt0 = ct - float(p.time)
-                s.send(p)
+            if pacer is None:
+                sent = _gen_send_all(s, x, inter)
+            else:
+                sent = pacer.run(x, cache=loop != -1)
+            for p in sent:
                 if return_packets:
                     sent_packets.append(p)
                 n += 1
                 if verbose:
                     os.write(1, b".")
-                time.sleep(inter)
             if loop < 0:
                 loop += 1
     except KeyboardInterrupt:
         pass
     if verbose:
-        print("\nSent %i packets." % n)
+        print("\nSent %i packets%s." % (n, _pps(n, start)))
+        if pacer is not None:
+            print(pacer.stats)
+    if return_stats:
+        if return_packets:
+            return sent_packets, pacer.stats
+        return pacer.stats
     if return_packets:
         return sent_packets
 
 
+def _gen_send_all(s, x, inter):
+    if inter:
+        for p in x:
+            s.send(p)
+            yield p
+            time.sleep(inter)
+        return
+    for batch in _batches(x):
+        s.send_many(batch)
+        for p in batch:
+            yield p
+
+
+def _batches(x, size=256):
+    """Yields the items of x in lists of up to size items, to be sent
+    with SuperSocket.send_many()"""
+    x = iter(x)
+    while True:
+        batch = list(itertools.islice(x, size))
+        if not batch:
+            return
+        yield batch
+
+
 def _send(x, _func, inter=0, loop=0, iface=None, count=None,
           verbose=None, realtime=None,
-          return_packets=False, socket=None, **kargs):
+          return_packets=False, socket=None, pps=None, mbps=None,
+          return_stats=False, raw_images=False, **kargs):
     """Internal function used by send and sendp"""
     need_closing = socket is None
     iface = resolve_iface(iface or conf.iface)
     socket = socket or _func(iface)(iface=iface, **kargs)
     results = __gen_send(socket, x, inter=inter, loop=loop,
                          count=count, verbose=verbose,
-                         realtime=realtime, return_packets=return_packets)
+                         realtime=realtime, return_packets=return_packets,
+                         pps=pps, mbps=mbps, return_stats=return_stats,
+                         raw_images=raw_images)
     if need_closing:
         socket.close()
     return results
@@ -349,8 +563,13 @@ def send(x, iface=None, *args, **kargs):
     :param loop: send packet indefinetly (default 0)
     :param count: number of packets to send (default None=1)
     :param verbose: verbose mode (default None=conf.verbose)
-    :param realtime: check that a packet was sent before sending the next one
+    :param realtime: send the packets at their relative times (packet.time),
+        sped up by a factor of realtime if it is a number. inter, pps and
+        mbps then set the maximum rate
+    :param pps: send the packets at this rate, in packets per second
+    :param mbps: send the packets at this rate, in MBits per second
     :param return_packets: return the sent packets
+    :param return_stats: return the SendStats of the timing of the packets
     :param socket: the socket to use (default is conf.L3socket(kargs))
     :param iface: the interface to send the packets on
     :param monitor: (not on linux) send in monitor mode
@@ -374,8 +593,13 @@ def sendp(x, iface=None, iface_hint=None, socket=None, *args, **kargs):
     :param loop: send packet indefinetly (default 0)
     :param count: number of packets to send (default None=1)
     :param verbose: verbose mode (default None=conf.verbose)
-    :param realtime: check that a packet was sent before sending the next one
+    :param realtime: send the packets at their relative times (packet.time),
+        sped up by a factor of realtime if it is a number. inter, pps and
+        mbps then set the maximum rate
+    :param pps: send the packets at this rate, in packets per second
+    :param mbps: send the packets at this rate, in MBits per second
     :param return_packets: return the sent packets
+    :param return_stats: return the SendStats of the timing of the packets
     :param socket: the socket to use (default is conf.L3socket(kargs))
     :param iface: the interface to send the packets on
     :param monitor: (not on linux) send in monitor mode
@@ -389,6 +613,7 @@ def sendp(x, iface=None, iface_hint=None, socket=None, *args, **kargs):
         *args,
         iface=iface,
         socket=socket,
+        raw_images=True,
         **kargs
     )
 
@@ -398,6 +623,9 @@ def sendpfast(x, pps=None, mbps=None, realtime=None, loop=0, file_cache=False, i
               parse_results=False):
     """Send packets at layer 2 using tcpreplay for performance
 
+    sendp() can also send the packets at a given rate, without tcpreplay,
+    with its pps, mbps and realtime arguments.
+
     :param pps:  packets per second
     :param mpbs: MBits per second
     :param realtime: use packet's timestamp, bending time with real-time value
@@ -757,6 +985,11 @@ def srp1flood(x, promisc=None, filter=None, iface=None, nofilter=0, *args, **kar
 # SNIFF METHODS
 
 
+# The maximum number of packets read from a socket by sniff(), each time it
+# is ready
+_SNIFF_BATCH = 256
+
+
 class AsyncSniffer(object):
     """
     Sniff packets and return a list of packets.
@@ -770,10 +1003,18 @@ class AsyncSniffer(object):
         session: a session = a flow decoder used to handle stream of packets.
                  --Ex: session=TCPSession
                  See below for more details.
-        filter: BPF filter to apply.
+        filter: BPF filter to apply. With offline, it is run in-process on
+                the records of the files, and may also be a BPFProgram.
         lfilter: Python function applied to each packet to determine if
                  further action may be done.
                  --Ex: lfilter = lambda x: x.haslayer(Padding)
+        raw_filter: function called with the (data, wirelen, linktype) of
+                    each packet before it is dissected: the packets for
+                    which it returns False are skipped. It may also be a
+                    BPF filter expression or a BPFProgram, run in-process.
+                    The sockets that do not support it (raw_filter_support
+                    is False) run it on the bytes of the dissected packets.
+                    --Ex: raw_filter = port_filter(53)
         offline: PCAP file (or list of PCAP files) to read packets from,
                  instead of sniffing them
         quiet:   when set to True, the process stderr is discarded
@@ -790,6 +1031,10 @@ class AsyncSniffer(object):
         monitor: use monitor mode. May not be available on all OS
         started_callback: called as soon as the sniffer starts sniffing
                           (default: None).
+        writer: an object whose write() method is called with each
+                packet, before prn, e.g. a PcapWriter or a
+                RotatingPcapWriter. It is flushed, but not closed, when
+                the sniffer stops (default: None).
 
     The iface, offline and opened_socket parameters can be either an
     element, a list of elements, or a dict object mapping an element to a
@@ -839,11 +1084,11 @@ class AsyncSniffer(object):
 
     def _run(self,
              count=0, store=True, offline=None,
-             quiet=False, prn=None, lfilter=None,
+             quiet=False, prn=None, lfilter=None, raw_filter=None,
              L2socket=None, timeout=None, opened_socket=None,
              stop_filter=None, iface=None, started_callback=None,
              session=None, session_args=[], session_kwargs={},
-             *arg, **karg):
+             writer=None, *arg, **karg):
         self.running = True
         # Start main thread
         # instantiate session
@@ -874,15 +1119,12 @@ class AsyncSniffer(object):
 
             if isinstance(offline, list) and \
                     all(isinstance(elt, str) for elt in offline):
-                sniff_sockets.update((PcapReader(
-                    fname if flt is None else
-                    tcpdump(fname, args=["-w", "-"], flt=flt, getfd=True)
-                ), fname) for fname in offline)
+                sniff_sockets.update((PcapReader(fname, filter=flt), fname)
+                                     for fname in offline)
             elif isinstance(offline, dict):
-                sniff_sockets.update((PcapReader(
-                    fname if flt is None else
-                    tcpdump(fname, args=["-w", "-"], flt=flt, getfd=True)
-                ), label) for fname, label in six.iteritems(offline))
+                sniff_sockets.update((PcapReader(fname, filter=flt), label)
+                                     for fname, label in
+                                     six.iteritems(offline))
             else:
                 # Write Scapy Packet objects to a pcap file
                 def _write_to_pcap(packets_list):
@@ -896,14 +1138,8 @@ class AsyncSniffer(object):
                         all(isinstance(elt, Packet) for elt in offline):
                     tempfile_written, offline = _write_to_pcap(offline)
 
-                sniff_sockets[PcapReader(
-                    offline if flt is None else
-                    tcpdump(offline,
-                            args=["-w", "-"],
-                            flt=flt,
-                            getfd=True,
-                            quiet=quiet)
-                )] = offline
+                # The filter is run in-process, on the bytes of the records
+                sniff_sockets[PcapReader(offline, filter=flt)] = offline
         if not sniff_sockets or iface is not None:
             iface = resolve_iface(iface or conf.iface)
             if L2socket is None:
@@ -924,6 +1160,31 @@ class AsyncSniffer(object):
                 sniff_sockets[L2socket(type=ETH_P_ALL, iface=iface,
                                        *arg, **karg)] = iface
 
+        # The raw filter is run by the sockets, or by the bpf_filter of the
+        # pcap readers. Their previous filters are restored at the end.
+        # It is run here, on the bytes of the dissected packets, for the
+        # sockets that do not support it.
+        raw_filters = {}
+        post_filters = {}
+        if raw_filter is not None:
+            if not callable(raw_filter):
+                from scapy.arch.bpf_vm import BPFFilter
+                raw_filter = BPFFilter(raw_filter)
+            for s in sniff_sockets:
+                if isinstance(s, RawPcapReader):
+                    attr = "bpf_filter"
+                elif getattr(s, "raw_filter_support", False):
+                    attr = "raw_filter"
+                else:
+                    post_filters[s] = raw_filter
+                    continue
+                old = getattr(s, attr, None)
+                raw_filters[s] = (attr, old)
+                if old is None:
+                    setattr(s, attr, raw_filter)
+                else:
+                    setattr(s, attr, RawFilter(old, repr(old)) & raw_filter)
+
         # Get select information from the sockets
         _main_socket = next(iter(sniff_sockets))
         select_func = _main_socket.select
@@ -935,6 +1196,7 @@ class AsyncSniffer(object):
                     "The used select function "
                     "will be the one of the first socket")
 
+        from scapy.automaton import ObjectPipe, Poller
         if nonblocking_socket:
             # select is non blocking
             def stop_cb():
@@ -943,7 +1205,6 @@ class AsyncSniffer(object):
             close_pipe = None
         else:
             # select is blocking: Add special control socket
-            from scapy.automaton import ObjectPipe
             close_pipe = ObjectPipe()
             sniff_sockets[close_pipe] = "control_socket"
 
@@ -953,6 +1214,12 @@ class AsyncSniffer(object):
                 self.continue_sniff = False
             self.stop_cb = stop_cb
 
+        # The sockets that use the default select() are kept registered
+        # in a poller (epoll on Linux)
+        poller = None
+        if select_func is SuperSocket.select:
+            poller = Poller(sniff_sockets)
+
         try:
             if started_callback:
                 started_callback()
@@ -968,14 +1235,26 @@ class AsyncSniffer(object):
                     remain = stoptime - time.time()
                     if remain <= 0:
                         break
-                sockets, read_func = select_func(sniff_sockets, remain)
+                if poller is None:
+                    sockets, read_func = select_func(sniff_sockets, remain)
+                else:
+                    sockets, read_func = poller.poll(remain), None
+                # Drain the packets received by each socket
+                read_many = read_func is None and not nonblocking_socket
                 read_func = read_func or _backup_read_func
                 dead_sockets = []
                 for s in sockets:
                     if s is close_pipe:
                         break
                     try:
-                        p = read_func(s)
+                        if read_many and hasattr(s, "recv_many"):
+                            pkts = s.recv_many(
+                                max_count=count - session.count if count
+                                else _SNIFF_BATCH,
+                                timeout=0
+                            )
+                        else:
+                            pkts = [read_func(s)]
                     except EOFError:
                         # End of stream
                         try:
@@ -998,29 +1277,49 @@ class AsyncSniffer(object):
                         if conf.debug_dissector >= 2:
                             raise
                         continue
-                    if p is None:
-                        continue
-                    if lfilter and not lfilter(p):
-                        continue
-                    p.sniffed_on = sniff_sockets[s]
-                    # on_packet_received handles the prn/storage
-                    session.on_packet_received(p)
-                    # check
-                    if (stop_filter and stop_filter(p)) or \
-                            (0 < count <= session.count):
-                        self.continue_sniff = False
+                    post_filter = post_filters.get(s)
+                    for p in pkts:
+                        if p is None:
+                            continue
+                        if post_filter is not None:
+                            data = raw(p)
+                            if not post_filter(
+                                    data, len(data),
+                                    conf.l2types.layer2num.get(p.__class__)):
+                                continue
+                        if lfilter and not lfilter(p):
+                            continue
+                        p.sniffed_on = sniff_sockets[s]
+                        if writer is not None:
+                            writer.write(p)
+                        # on_packet_received handles the prn/storage
+                        session.on_packet_received(p)
+                        # check
+                        if (stop_filter and stop_filter(p)) or \
+                                (0 < count <= session.count):
+                            self.continue_sniff = False
+                            break
+                    if not self.continue_sniff:
                         break
                 # Removed dead sockets
                 for s in dead_sockets:
                     del sniff_sockets[s]
+                    if poller is not None:
+                        poller.unregister(s)
         except KeyboardInterrupt:
             pass
         self.running = False
+        if poller is not None:
+            poller.close()
         if opened_socket is None:
             for s in sniff_sockets:
                 s.close()
         elif close_pipe:
             close_pipe.close()
+        for s, (attr, old) in six.iteritems(raw_filters):
+            setattr(s, attr, old)
+        if writer is not None:
+            writer.flush()
         self.results = session.toPacketList()
 
     def start(self):
@@ -1058,6 +1357,238 @@ def sniff(*args, **kwargs):
 sniff.__doc__ = AsyncSniffer.__doc__
 
 
+def _fanout_worker(index, iface, L2socket, fanout, group_id, count, sniff_args,
+                   socket_args, counter, stop_event, queue):
+    """Sniffs on a socket of a PACKET_FANOUT group, in a process of
+    FanoutSniffer, then sends its results to the parent process"""
+    from scapy.arch.linux import set_fanout
+    from scapy.utils import _packet_record
+    try:
+        sock = L2socket(type=ETH_P_ALL, iface=iface, **socket_args)
+    except Exception as ex:
+        queue.put((index, "error", str(ex)))
+        return
+    try:
+        set_fanout(sock.ins, group_id, fanout)
+    except Exception as ex:
+        sock.close()
+        queue.put((index, "error", str(ex)))
+        return
+    # Drop the packets received before joining the group, that may also
+    # have been received by the other workers
+    while sock.select([sock], 0)[0] and sock.recv_raw()[1] is not None:
+        pass
+    user_stop_filter = sniff_args.pop("stop_filter", None)
+    processed = [0]
+
+    def stop_filter(pkt):
+        processed[0] += 1
+        with counter.get_lock():
+            counter.value += 1
+            total = counter.value
+        if (user_stop_filter and user_stop_filter(pkt)) or \
+                0 < count <= total:
+            # Stop the other workers
+            stop_event.set()
+            return True
+        return False
+
+    sniffer = AsyncSniffer()
+
+    def wait_stop():
+        stop_event.wait()
+        if sniffer.running:
+            sniffer.stop_cb()
+
+    def started_callback():
+        watcher = Thread(target=wait_stop)
+        watcher.setDaemon(True)
+        watcher.start()
+        queue.put((index, "ready", None))
+
+    try:
+        sniffer._run(opened_socket={sock: network_name(iface)},
+                     stop_filter=stop_filter,
+                     started_callback=started_callback,
+                     **sniff_args)
+        stats = (processed[0],) + sock.get_stats()
+    finally:
+        sock.close()
+    queue.put((index, "done", (
+        [_packet_record(p) for p in sniffer.results or []],
+        stats,
+    )))
+
+
+class FanoutSniffer(object):
+    """
+    Sniffs packets with several processes, that share the packets received
+    by an interface through a PACKET_FANOUT group (Linux only). Each process
+    reads its own socket, and has its own session, so that the dissection
+    of the packets scales across the cores.
+
+    The packets of a TCP or UDP flow are received by the same process with
+    the "hash" mode (the default), so that sessions such as TCPSession see
+    all of them.
+
+    The processes are started by start(). The results are aggregated in the
+    parent process by stop() or join(), and the packets are sorted by time::
+
+        >>> t = FanoutSniffer(iface="eth0", workers=4, prn=lambda x: x.summary())  # noqa: E501
+        >>> t.start()
+        >>> time.sleep(1)
+        >>> t.stop()
+        >>> t.stats
+
+    :param iface: the interface to sniff on
+    :param workers: the number of processes (by default, the number of CPUs)
+    :param fanout: how the packets are spread between the processes: "hash"
+        (by flow), "lb" (round-robin) or "cpu" (by the CPU that received
+        the packet)
+    :param group_id: the 16 bits identifier of the PACKET_FANOUT group
+    :param L2socket: the socket class to use (by default, conf.L2listen).
+        L2RingSocket is the fastest.
+    :param count: the number of packets to capture, by all the processes.
+        A few more packets may be processed by prn before they stop.
+    :param store: whether to store the sniffed packets and return them
+    :param prn: function to apply to each packet, in the worker processes
+    :param lfilter: python function applied to each packet, in the worker
+        processes, to determine if further action may be done
+    :param stop_filter: python function applied to each packet, in the
+        worker processes, to determine if all of them have to stop
+    :param timeout: stop sniffing after a given time
+    :param session: a session class, instantiated in each process
+    :param session_args: the arguments of the session
+    :param session_kwargs: the keyword arguments of the session
+
+    The other keyword arguments (e.g. filter) are passed to the sockets.
+
+    After the processes are done, the ``stats`` attribute holds the
+    (processed packets, received packets, dropped packets) of each process,
+    the last two being the statistics of the kernel.
+    """
+    _groups = itertools.count()
+
+    def __init__(self, iface=None, workers=None, fanout="hash",
+                 group_id=None, L2socket=None, count=0, **kwargs):
+        import multiprocessing
+        from scapy.consts import LINUX
+        if not LINUX:
+            from scapy.error import ScapyInvalidPlatformException
+            raise ScapyInvalidPlatformException(
+                "PACKET_FANOUT is only available on Linux !"
+            )
+        if fanout not in ["hash", "lb", "cpu"]:
+            raise Scapy_Exception("Unknown fanout mode [%s]" % fanout)
+        self.iface = resolve_iface(iface or conf.iface)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.fanout = fanout
+        if group_id is None:
+            group_id = os.getpid() + next(self._groups)
+        self.group_id = group_id & 0xffff
+        self.L2socket = L2socket or self.iface.l2listen()
+        self.count = count
+        self.sniff_args = dict(
+            (k, kwargs.pop(k)) for k in ["store", "prn", "lfilter",
+                                         "raw_filter", "stop_filter",
+                                         "timeout", "session",
+                                         "session_args", "session_kwargs"]
+            if k in kwargs
+        )
+        self.socket_args = kwargs
+        self.processes = []
+        self.running = False
+        self.results = None
+        self.stats = None
+
+    def _get(self, kind, timeout=None):
+        """Returns the messages of the given kind of all the processes.
+        Raises Scapy_Exception if one of them failed, or died."""
+        from scapy.modules.six.moves.queue import Empty
+        msgs = {}
+        if timeout is not None:
+            stoptime = time.time() + timeout
+        while len(msgs) < len(self.processes):
+            try:
+                index, msg_kind, msg = self.queue.get(timeout=0.1)
+            except Empty:
+                if timeout is not None and time.time() >= stoptime:
+                    return None
+                if any(not p.is_alive() and i not in msgs
+                       for i, p in enumerate(self.processes)) and \
+                        self.queue.empty():
+                    self._terminate()
+                    raise Scapy_Exception("A sniffing process died !")
+                continue
+            if msg_kind == "error":
+                self._terminate()
+                raise Scapy_Exception("Cannot sniff: %s" % msg)
+            if msg_kind == kind:
+                msgs[index] = msg
+        return [msgs[i] for i in range(len(self.processes))]
+
+    def _terminate(self):
+        self.running = False
+        for p in self.processes:
+            p.terminate()
+            p.join()
+
+    def start(self):
+        """Starts the sniffing processes, and waits until they are ready"""
+        from scapy.utils import _fork_context
+        # The processes are forked, so that the lfilter, prn and session
+        # of sniff() do not need to be picklable
+        ctx = _fork_context()
+        self.stop_event = ctx.Event()
+        self.counter = ctx.Value("L", 0)
+        self.queue = ctx.Queue()
+        self.processes = [
+            ctx.Process(
+                target=_fanout_worker,
+                args=(i, self.iface, self.L2socket, self.fanout,
+                      self.group_id, self.count, dict(self.sniff_args),
+                      self.socket_args, self.counter, self.stop_event,
+                      self.queue)
+            )
+            for i in range(self.workers)
+        ]
+        for p in self.processes:
+            p.daemon = True
+            p.start()
+        self.running = True
+        self._get("ready")
+
+    def stop(self, join=True):
+        """Stops the sniffing processes"""
+        if self.running:
+            self.stop_event.set()
+            if join:
+                self.join()
+                return self.results
+        else:
+            raise Scapy_Exception("Not started !")
+
+    def join(self, timeout=None):
+        """Waits until the processes are done, then aggregates their
+        results"""
+        if not self.running:
+            return
+        done = self._get("done", timeout)
+        if done is None:
+            return
+        for p in self.processes:
+            p.join()
+        self.running = False
+        from scapy.utils import _record_packet
+        pkts = sorted((_record_packet(rec)
+                       for records, _ in done for rec in records),
+                      key=lambda p: p.time)
+        if self.count:
+            pkts = pkts[:self.count]
+        self.results = PacketList(pkts, "Sniffed")
+        self.stats = [stats for _, stats in done]
+
+
 @conf.commands.register
 def bridge_and_sniff(if1, if2, xfrm12=None, xfrm21=None, prn=None, L2socket=None,  # noqa: E501
                      *args, **kargs):
@@ -18,8 +18,8 @@ import time
 
 from scapy.config import conf
 from scapy.consts import LINUX, DARWIN, WINDOWS
-from scapy.data import MTU, ETH_P_IP, SOL_PACKET, SO_TIMESTAMPNS
-from scapy.compat import raw, bytes_encode
+from scapy.data import MTU, ETH_P_IP, ETH_P_IPV6, SOL_PACKET, SO_TIMESTAMPNS
+from scapy.compat import orb, raw, bytes_encode
 from scapy.error import warning, log_runtime
 from scapy.interfaces import network_name
 import scapy.modules.six as six
@@ -30,6 +30,13 @@ from scapy.utils import PcapReader, tcpdump
 # Utils
 
 class _SuperSocket_metaclass(type):
+    def __init__(cls, name, bases, dct):
+        super(_SuperSocket_metaclass, cls).__init__(name, bases, dct)
+        # The raw_filter is run by SuperSocket.recv(): the sockets that
+        # override recv() must declare that they still run it
+        if "recv" in dct and "raw_filter_support" not in dct:
+            cls.raw_filter_support = False
+
     def __repr__(self):
         if self.desc is not None:
             return "<%s: %s>" % (self.__name__, self.desc)
@@ -62,6 +69,10 @@ class SuperSocket(six.with_metaclass(_SuperSocket_metaclass)):
     closed = 0
     nonblocking_socket = False
     auxdata_available = False
+    # Called with the (data, wirelen, linktype) of the received packets,
+    # that are not dissected when it returns False
+    raw_filter = None
+    raw_filter_support = True
 
     def __init__(self, family=socket.AF_INET, type=socket.SOCK_STREAM, proto=0):  # noqa: E501
         self.ins = socket.socket(family, type, proto)
@@ -76,6 +87,81 @@ class SuperSocket(six.with_metaclass(_SuperSocket_metaclass)):
             pass
         return self.outs.send(sx)
 
+    def send_many(self, x):
+        """Sends the packets, or bytes, of x. Returns the number of packets
+        sent.
+
+        The sockets that can send several packets with a single system call
+        override it."""
+        n = 0
+        for p in x:
+            self.send(p)
+            n += 1
+        return n
+
+    def recv_many(self, max_count=None, timeout=None):
+        """Returns the packets available, up to max_count, after waiting
+        up to timeout s (forever if None) for the first one.
+
+        The sockets that can receive several packets with a single system
+        call override it."""
+        pkts = []
+        remain = timeout
+        while max_count is None or len(pkts) < max_count:
+            if not self.select([self], remain)[0]:
+                break
+            remain = 0
+            try:
+                p = self.recv()
+            except EOFError:
+                if pkts:
+                    return pkts
+                raise
+            if p is not None:
+                pkts.append(p)
+            elif self.nonblocking_socket:
+                break
+        return pkts
+
+    @staticmethod
+    def _process_ancdata(pkt, ancdata):
+        """Processes the ancillary data of a packet: reinserts its VLAN tag,
+        and returns it with its timestamp"""
+        timestamp = None
+        for cmsg_lvl, cmsg_type, cmsg_data in ancdata:
+            # Check available ancillary data
+            if (cmsg_lvl == SOL_PACKET and cmsg_type == PACKET_AUXDATA):
+                # Parse AUXDATA
+                try:
+                    auxdata = tpacket_auxdata.from_buffer_copy(cmsg_data)
+                except ValueError:
+                    # Note: according to Python documentation, recvmsg()
+                    #       can return a truncated message. A ValueError
+                    #       exception likely indicates that Auxiliary
+                    #       Data is not supported by the Linux kernel.
+                    return pkt, timestamp
+                if auxdata.tp_vlan_tci != 0 or \
+                        auxdata.tp_status & TP_STATUS_VLAN_VALID:
+                    # Insert VLAN tag
+                    tag = struct.pack(
+                        "!HH",
+                        ETH_P_8021Q,
+                        auxdata.tp_vlan_tci
+                    )
+                    pkt = pkt[:12] + tag + pkt[12:]
+            elif cmsg_lvl == socket.SOL_SOCKET and \
+                    cmsg_type == SO_TIMESTAMPNS:
+                length = len(cmsg_data)
+                if length == 16:  # __kernel_timespec
+                    tmp = struct.unpack("ll", cmsg_data)
+                elif length == 8:  # timespec
+                    tmp = struct.unpack("ii", cmsg_data)
+                else:
+                    log_runtime.warning("Unknown timespec format.. ?!")
+                    continue
+                timestamp = tmp[0] + tmp[1] * 1e-9
+        return pkt, timestamp
+
     if six.PY2:
         def _recv_raw(self, sock, x):
             """Internal function to receive a Packet"""
@@ -86,46 +172,14 @@ class SuperSocket(six.with_metaclass(_SuperSocket_metaclass)):
             """Internal function to receive a Packet,
             and process ancillary data.
             """
-            timestamp = None
             if not self.auxdata_available:
                 pkt, _, _, sa_ll = sock.recvmsg(x)
-                return pkt, sa_ll, timestamp
+                return pkt, sa_ll, None
             flags_len = socket.CMSG_LEN(4096)
             pkt, ancdata, flags, sa_ll = sock.recvmsg(x, flags_len)
             if not pkt:
-                return pkt, sa_ll, timestamp
-            for cmsg_lvl, cmsg_type, cmsg_data in ancdata:
-                # Check available ancillary data
-                if (cmsg_lvl == SOL_PACKET and cmsg_type == PACKET_AUXDATA):
-                    # Parse AUXDATA
-                    try:
-                        auxdata = tpacket_auxdata.from_buffer_copy(cmsg_data)
-                    except ValueError:
-                        # Note: according to Python documentation, recvmsg()
-                        #       can return a truncated message. A ValueError
-                        #       exception likely indicates that Auxiliary
-                        #       Data is not supported by the Linux kernel.
-                        return pkt, sa_ll, timestamp
-                    if auxdata.tp_vlan_tci != 0 or \
-                            auxdata.tp_status & TP_STATUS_VLAN_VALID:
-                        # Insert VLAN tag
-                        tag = struct.pack(
-                            "!HH",
-                            ETH_P_8021Q,
-                            auxdata.tp_vlan_tci
-                        )
-                        pkt = pkt[:12] + tag + pkt[12:]
-                elif cmsg_lvl == socket.SOL_SOCKET and \
-                        cmsg_type == SO_TIMESTAMPNS:
-                    length = len(cmsg_data)
-                    if length == 16:  # __kernel_timespec
-                        tmp = struct.unpack("ll", cmsg_data)
-                    elif length == 8:  # timespec
-                        tmp = struct.unpack("ii", cmsg_data)
-                    else:
-                        log_runtime.warning("Unknown timespec format.. ?!")
-                        continue
-                    timestamp = tmp[0] + tmp[1] * 1e-9
+                return pkt, sa_ll, None
+            pkt, timestamp = self._process_ancdata(pkt, ancdata)
             return pkt, sa_ll, timestamp
 
     def recv_raw(self, x=MTU):
@@ -136,6 +190,9 @@ class SuperSocket(six.with_metaclass(_SuperSocket_metaclass)):
         cls, val, ts = self.recv_raw(x)
         if not val or not cls:
             return
+        if self.raw_filter is not None and not self.raw_filter(
+                val, len(val), conf.l2types.layer2num.get(cls)):
+            return
         try:
             pkt = cls(val)
         except KeyboardInterrupt:
@@ -392,6 +449,13 @@ class L2ListenTcpdump(SuperSocket):
             return sockets, None
         return SuperSocket.select(sockets, remain=remain)
 
+    def recv_many(self, max_count=None, timeout=None):
+        if (WINDOWS or DARWIN):
+            # select() cannot tell whether a packet is available
+            p = self.recv()
+            return [] if p is None else [p]
+        return SuperSocket.recv_many(self, max_count, timeout)
+
 
 class TunTapInterface(SuperSocket):
     """A socket to act as the host's peer of a tun / tap interface.
@@ -445,8 +509,12 @@ conf.L2listen, conf.L2socket or conf.L3socket.
         sx = raw(x)
         if self.mode_tun:
             try:
-                proto = conf.l3types[type(x)]
-            except KeyError:
+                if isinstance(x, bytes):
+                    # The image of an IPv4 or IPv6 packet
+                    proto = {4: ETH_P_IP, 6: ETH_P_IPV6}[orb(x[0]) >> 4]
+                else:
+                    proto = conf.l3types[type(x)]
+            except (KeyError, IndexError):
                 log_runtime.warning(
                     "Cannot find layer 3 protocol value to send %s in "
                     "conf.l3types, using 0",
@@ -0,0 +1,240 @@
+# This file is part of Scapy
+# See http://www.secdev.org/projects/scapy for more information
+# This program is published under a GPLv2 license
+
+"""
+PacketTemplate: generate packets that only differ by a few fields, without
+building each of them.
+"""
+
+import itertools
+import struct
+
+from scapy.base_classes import Gen, SetGen
+from scapy.compat import orb, raw
+from scapy.error import Scapy_Exception
+from scapy.packet import NoPayload, Packet
+from scapy.utils import checksum_update
+from scapy.modules.six.moves import zip
+
+# Typing imports
+from scapy.compat import (
+    Any,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+class PacketTemplate(Gen[Packet]):
+    """
+    A packet built once, used to generate packets that only differ by the
+    values of a few fields.
+
+    The packets are produced by patching the bytes of the `variable` fields
+    in the pre-built packet, and by updating the IP, TCP, UDP, ICMP and
+    ICMPv6 checksums incrementally (RFC 1624).
+
+    The values of the variable fields are taken from `pkt`, and may be
+    generators. Iterating over the template yields the packets (dissected
+    lazily), so it can be used with sendp(), sr() or wrpcap()::
+
+        >>> t = PacketTemplate(Ether(dst="00:11:22:33:44:55")/
+        ...                    IP(dst="10.0.0.0/24")/TCP(sport=(1024, 1027)),
+        ...                    variable=["IP.dst", "TCP.sport"])
+        >>> sendp(t)
+        >>> t.build("10.0.0.1", 1234)
+
+    The other fields keep the values of the first packet, including the ones
+    computed from the variable fields when the packet is built (e.g. Ether.dst
+    or IP.src). The checksums that were set explicitly are not updated.
+
+    :param pkt: the packet
+    :param variable: the variable fields, as "Layer.field" strings
+    """
+
+    def __init__(self, pkt, variable):
+        # type: (Packet, List[str]) -> None
+        self.variable = list(variable)
+        self.generators = []  # type: List[Any]
+        base = pkt.copy()
+        for spec in self.variable:
+            layer, fld = self._get_field(base, spec)
+            value = layer.getfieldval(fld.name)
+            if not isinstance(value, Gen):
+                value = SetGen([value] if fld.islist else value)
+            self.generators.append(value)
+            layer.setfieldval(fld.name, next(iter(value)))
+        # The packet, with the values of the fields fixed
+        self.base = next(iter(base))
+        self.image = raw(self.base)
+        layers = []  # type: List[Packet]
+        offsets = []  # type: List[int]
+        layer = self.base  # type: Packet
+        while not isinstance(layer, NoPayload):
+            layers.append(layer)
+            offsets.append(len(self.image) - len(raw(layer)))
+            layer = layer.payload
+        # (layer, field, offset, size) for each variable field
+        self.fields = []  # type: List[Tuple[Packet, Any, int, int]]
+        for spec in self.variable:
+            layer, fld = self._get_field(self.base, spec)
+            offset = self._field_offset(layer, fld)
+            value = fld.addfield(layer, b"", layer.getfieldval(fld.name))
+            if offset is not None and isinstance(value, bytes) and value:
+                offset += next(lo for lyr, lo in zip(layers, offsets)
+                               if lyr is layer)
+                if self.image[offset:offset + len(value)] == value:
+                    self.fields.append((layer, fld, offset, len(value)))
+                    continue
+            raise Scapy_Exception(
+                "Cannot find the bytes of [%s] in the packet" % spec
+            )
+        self.checksums = _checksum_fields(layers, offsets, self.image)
+
+    @staticmethod
+    def _get_field(pkt, spec):
+        # type: (Packet, str) -> Tuple[Packet, Any]
+        lname, _, fname = spec.partition(".")
+        layer = pkt.getlayer(lname)
+        if layer is None or fname not in layer.fieldtype:
+            raise Scapy_Exception("Unknown field [%s]" % spec)
+        return layer, layer.get_field(fname)
+
+    @staticmethod
+    def _field_offset(layer, fld):
+        # type: (Packet, Any) -> Optional[int]
+        """Returns the offset of fld in layer, or None if it does not start
+        at a byte boundary"""
+        p = b""  # type: Any
+        for f in layer.fields_desc:
+            if f.name == fld.name:
+                break
+            p = f.addfield(layer, p, layer.getfieldval(f.name))
+        if isinstance(p, tuple):
+            return None
+        return len(p)
+
+    def build(self, *values):
+        # type: (*Any) -> bytes
+        """Returns the bytes of the packet, the variable fields being set to
+        `values`, in the same order"""
+        if len(values) != len(self.fields):
+            raise TypeError("%d values expected, got %d" % (len(self.fields),
+                                                            len(values)))
+        if self.checksums is None:
+            pkt = self.base.copy()
+            for spec, val in zip(self.variable, values):
+                layer, fld = self._get_field(pkt, spec)
+                layer.setfieldval(fld.name, val)
+            return raw(pkt)
+        image = self.image
+        buf = bytearray(image)
+        # (offset, old bytes, new bytes) for each modified field
+        changes = []  # type: List[Tuple[int, bytes, bytes]]
+        for (layer, fld, offset, size), val in zip(self.fields, values):
+            new = fld.addfield(layer, b"", fld.any2i(layer, val))
+            if len(new) != size:
+                raise Scapy_Exception(
+                    "Value %r of [%s] does not have the size of the template "
+                    "value" % (val, fld.name)
+                )
+            buf[offset:offset + size] = new
+            changes.append((offset, image[offset:offset + size], new))
+        for offset, ranges, udp in self.checksums:
+            old = image[offset:offset + 2]
+            chksum = struct.unpack("!H", old)[0]
+            for start, old_bytes, new_bytes in changes:
+                end = start + len(old_bytes)
+                for rstart, rend, rbase in ranges:
+                    a, b = max(start, rstart), min(end, rend)
+                    if a < b:
+                        chksum = checksum_update(
+                            chksum,
+                            old_bytes[a - start:b - start],
+                            new_bytes[a - start:b - start],
+                            odd=bool((a - rbase) % 2),
+                        )
+            if udp and chksum == 0:
+                chksum = 0xffff
+            new = struct.pack("!H", chksum)
+            buf[offset:offset + 2] = new
+            # The checksum may be covered by the checksum of a lower layer
+            changes.append((offset, old, new))
+        return bytes(buf)
+
+    def iterbytes(self):
+        # type: () -> Iterator[bytes]
+        """Iterates through the bytes of all the packets of the template"""
+        for values in itertools.product(*self.generators):
+            yield self.build(*values)
+
+    def __iter__(self):
+        # type: () -> Iterator[Packet]
+        for data in self.iterbytes():
+            yield self.base.__class__(data, lazy=True)
+
+    def __iterlen__(self):
+        # type: () -> int
+        length = 1
+        for gen in self.generators:
+            length *= gen.__iterlen__()
+        return length
+
+    def __repr__(self):
+        # type: () -> str
+        return "<PacketTemplate %s variable=%r>" % (self.base.summary(),
+                                                    self.variable)
+
+
+def _checksum_fields(layers, offsets, image):
+    # type: (List[Packet], List[int], bytes) -> Optional[List[Tuple[int, List[Tuple[int, int, int]], bool]]]  # noqa: E501
+    """Returns the checksums computed when the packet was built, innermost
+    first, as (offset, ranges, is UDP) tuples. The checksum covers each
+    (start, end, base) range of the packet, base being the offset of its
+    first 16-bit word.
+
+    Returns None when the checksums cannot be updated incrementally.
+    """
+    from scapy.layers.inet import IP, ICMP, TCP, UDP
+    from scapy.layers.inet6 import IPv6, IPv6ExtHdrDestOpt, \
+        IPv6ExtHdrRouting, IPv6ExtHdrSegmentRouting, HAO, _ICMPv6
+    checksums = []
+    pseudo = None  # type: Optional[List[Tuple[int, int, int]]]
+    ipv6 = False
+    end = len(image)
+    for layer, lo in zip(layers, offsets):
+        cls = layer.__class__
+        if cls is IP:
+            ihl = (orb(image[lo]) & 0xf) * 4
+            if layer.chksum is None:
+                checksums.append((lo + 10, [(lo, lo + ihl, lo)], False))
+            pseudo, ipv6 = [(lo + 12, lo + 20, lo)], False
+            end = lo + struct.unpack("!H", image[lo + 2:lo + 4])[0]
+        elif cls is IPv6:
+            pseudo, ipv6 = [(lo + 8, lo + 40, lo)], True
+            end = lo + 40 + struct.unpack("!H", image[lo + 4:lo + 6])[0]
+        elif isinstance(layer, (IPv6ExtHdrRouting,
+                                IPv6ExtHdrSegmentRouting)) or \
+                (cls is IPv6ExtHdrDestOpt and
+                 any(isinstance(opt, HAO) for opt in layer.options)):
+            # The pseudo-header does not use the addresses of IPv6
+            pseudo = None
+        elif cls in (TCP, UDP) or (cls is ICMP and not ipv6) or \
+                (isinstance(layer, _ICMPv6) and ipv6):
+            if isinstance(layer, _ICMPv6):
+                chksum = layer.cksum
+            else:
+                chksum = layer.chksum
+            if chksum is not None:
+                continue
+            if pseudo is None:
+                return None
+            ranges = [(lo, end, lo)]
+            if cls is not ICMP:
+                ranges += pseudo
+            checksums.append((lo + {TCP: 16, UDP: 6}.get(cls, 2), ranges,
+                              cls is UDP))
+    checksums.reverse()
+    return checksums
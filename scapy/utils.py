@@ -13,9 +13,12 @@ from __future__ import print_function
 from decimal import Decimal
 
 import array
+import bisect
 import collections
 import difflib
 import gzip
+import heapq
+import mmap
 import os
 import random
 import re
@@ -27,16 +30,19 @@ import tempfile
 import time
 import threading
 import warnings
+import zlib
 
 import scapy.modules.six as six
 from scapy.modules.six.moves import range, input, zip_longest
 
 from scapy.config import conf
 from scapy.consts import DARWIN, WINDOWS, WINDOWS_XP, OPENBSD
-from scapy.data import MTU, DLT_EN10MB
+from scapy.data import MTU, DLT_EN10MB, DLT_IPV4, DLT_IPV6, DLT_LINUX_SLL, \
+    DLT_LOOP, DLT_NULL, DLT_RAW, DLT_RAW_ALT
 from scapy.compat import orb, plain_str, chb, bytes_base64,\
-    base64_bytes, hex_bytes, lambda_tuple_converter, bytes_encode
+    base64_bytes, hex_bytes, lambda_tuple_converter, bytes_encode, raw
 from scapy.error import log_runtime, Scapy_Exception, warning
+from scapy.extlib import numpy
 from scapy.pton_ntop import inet_pton
 
 # Typing imports
@@ -45,12 +51,15 @@ from scapy.compat import (
     Any,
     AnyStr,
     Callable,
+    Deque,
     Dict,
     Iterator,
     IO,
     List,
     Literal,
     Optional,
+    Sequence,
+    Set,
     TYPE_CHECKING,
     Tuple,
     Type,
@@ -479,6 +488,87 @@ def checksum(pkt):
     return checksum_endian_transform(s) & 0xffff
 
 
+def checksum_update(chksum, old, new, odd=False):
+    # type: (int, bytes, bytes, bool) -> int
+    """Incrementally update an Internet checksum (RFC 1624, eqn. 3)
+
+    :param chksum: the checksum of the data, as returned by checksum()
+    :param old: the bytes being replaced in the data
+    :param new: the new bytes, of the same length
+    :param odd: True if the bytes start at an odd offset in the data
+    :return: the checksum of the updated data
+    """
+    if len(old) != len(new):
+        raise ValueError("old and new must have the same length")
+    if odd:
+        old = b"\0" + old
+        new = b"\0" + new
+    if len(old) % 2 == 1:
+        old += b"\0"
+        new += b"\0"
+    fmt = "!%dH" % (len(old) // 2)
+    s = (~chksum & 0xffff) + sum(struct.unpack(fmt, new)) + \
+        sum(~w & 0xffff for w in struct.unpack(fmt, old))
+    while s >> 16:
+        s = (s >> 16) + (s & 0xffff)
+    return ~s & 0xffff
+
+
+def checksum_batch(buffers):
+    # type: (Sequence[bytes]) -> List[int]
+    """Computes the checksum() of many buffers at once
+
+    NumPy is used, when available, to sum the 16-bit words of all the
+    buffers in one pass.
+
+    :param buffers: a list of bytes
+    :return: the list of their checksums
+    """
+    if numpy is None:
+        return [checksum(buf) for buf in buffers]
+    if not buffers:
+        return []
+    # Pad each buffer to an even length, and concatenate them
+    lengths = numpy.fromiter((len(buf) for buf in buffers), dtype=numpy.int64,
+                             count=len(buffers))
+    data = b"".join(buf + b"\0" if len(buf) % 2 else buf for buf in buffers)
+    words = numpy.frombuffer(data, dtype=">u2")
+    sums = numpy.zeros(len(words) + 1, dtype=numpy.uint64)
+    numpy.cumsum(words, dtype=numpy.uint64, out=sums[1:])
+    ends = numpy.cumsum((lengths + 1) // 2)
+    s = sums[ends] - sums[ends - (lengths + 1) // 2]
+    # Fold the carries
+    while (s >> 16).any():
+        s = (s >> 16) + (s & 0xffff)
+    return cast(List[int], (~s & 0xffff).tolist())
+
+
+def verify_checksums(pkts):
+    # type: (Union[List[Packet], PacketList]) -> List[Tuple[int, Packet]]
+    """Verifies the checksums of the IP, TCP, UDP, ICMP and ICMPv6 layers
+    of the packets (and of any layer implementing checksum_data())
+
+    The checksums of the packets truncated by the capture are not verified,
+    except the ones that only cover their header.
+
+    :param pkts: an iterable of packets, e.g. a PacketList
+    :return: the (index of the packet, layer) of the invalid checksums
+    """
+    layers = []  # type: List[Tuple[int, Packet]]
+    buffers = []  # type: List[bytes]
+    for i, pkt in enumerate(pkts):
+        truncated = pkt.wirelen is not None and pkt.wirelen > len(pkt)
+        for layer in pkt.iterpayloads():
+            if truncated and layer.checksum_payload:
+                continue
+            data = layer.checksum_data()
+            if data is not None:
+                layers.append((i, layer))
+                buffers.append(data)
+    return [layer for layer, chksum in zip(layers, checksum_batch(buffers))
+            if chksum != 0]
+
+
 def _fletcher16(charbuf):
     # type: (bytes) -> Tuple[int, int]
     # This is based on the GPLed C implementation in Zebra <http://www.zebra.org/>  # noqa: E501
@@ -1086,6 +1176,32 @@ def wrpcap(filename,  # type: Union[IO[bytes], str]
         fdesc.write(pkt)
 
 
+@conf.commands.register
+def wrpcapng(filename,  # type: Union[IO[bytes], str]
+             pkt,  # type: _UniPacketList
+             *args,  # type: Any
+             **kargs  # type: Any
+             ):
+    # type: (...) -> None
+    """Write a list of packets to a pcapng file
+
+    Unlike a pcap file, the packets may have different link types. The
+    interfaces they were sniffed on, their comments and their directions
+    are kept.
+
+    :param filename: the name of the file to write packets to, or an open,
+        writable file-like object. The file descriptor will be
+        closed at the end of the call.
+    :param gz: set to 1 to save a gzipped capture
+    :param linktype: force linktype value
+    :param endianness: "<" or ">", force endianness
+    :param sync: do not bufferize writes to the capture file
+    :param nano: use nanosecond-precision timestamps
+    """
+    with PcapNgWriter(filename, *args, **kargs) as fdesc:
+        fdesc.write(pkt)
+
+
 @conf.commands.register
 def rdpcap(filename, count=-1):
     # type: (Union[IO[bytes], str], int) -> PacketList
@@ -1101,6 +1217,30 @@ def rdpcap(filename, count=-1):
         return fdesc.read_all(count=count)
 
 
+def _open_compressed(filename,  # type: str
+                     mode,  # type: str
+                     compression,  # type: str
+                     compresslevel=9,  # type: int
+                     ):
+    # type: (...) -> _ByteStream
+    """Opens a file compressed with "gzip", "bz2" or "lzma"."""
+    if compression == "gzip":
+        return cast(_ByteStream, gzip.open(filename, mode, compresslevel))
+    if compression == "bz2":
+        import bz2
+        return cast(_ByteStream, bz2.BZ2File(filename, mode,
+                                             compresslevel=compresslevel))
+    if compression == "lzma":
+        try:
+            import lzma
+        except ImportError:
+            raise Scapy_Exception("lzma is not available (Python 3 only)")
+        return cast(_ByteStream, lzma.LZMAFile(
+            filename, mode, preset=None if mode == "rb" else compresslevel
+        ))
+    raise Scapy_Exception("Unknown compression %r" % compression)
+
+
 class PcapReader_metaclass(type):
     """Metaclass for (Raw)Pcap(Ng)Readers"""
 
@@ -1117,11 +1257,17 @@ class PcapReader_metaclass(type):
             dct['alternative'].alternative = newcls
         return newcls
 
-    def __call__(cls, filename):  # type: ignore
-        # type: (Union[IO[bytes], str]) -> Any
+    def __call__(cls, filename, index=None, filter=None):  # type: ignore
+        # type: (Union[IO[bytes], str], Optional[Union[PcapIndex, str]], Optional[Any]) -> Any  # noqa: E501
         """Creates a cls instance, use the `alternative` if that
         fails.
 
+        `index` is a PcapIndex, or the name of its file, used by flow() and
+        time_range().
+
+        `filter` is a BPF filter expression, or a BPFProgram, run on the
+        bytes of the records: only the matching ones are returned.
+
         """
         i = cls.__new__(cls, cls.__name__, cls.__bases__, cls.__dict__)
         filename, fdesc, magic = cls.open(filename)
@@ -1143,7 +1289,18 @@ class PcapReader_metaclass(type):
                     except Exception:
                         pass
                     raise Scapy_Exception("Not a supported capture file")
-
+        if index is not None:
+            if not isinstance(index, PcapIndex):
+                index = PcapIndex(i.filename, index)
+            i.index = index
+        if filter is not None:
+            from scapy.arch.bpf_vm import BPFFilter
+            if not isinstance(filter, BPFFilter):
+                filter = BPFFilter(filter)
+            i.bpf_filter = filter
+            if not isinstance(i, RawPcapNgReader):
+                # Compile the filter now, to report the errors early
+                filter.program(i.linktype)
         return i
 
     @staticmethod
@@ -1159,6 +1316,12 @@ class PcapReader_metaclass(type):
             except IOError:
                 fdesc = open(filename, "rb")
                 magic = fdesc.read(4)
+                compression = {b"BZh": "bz2",
+                               b"\xfd7z": "lzma"}.get(magic[:3])
+                if compression is not None:
+                    fdesc.close()
+                    fdesc = _open_compressed(filename, "rb", compression)
+                    magic = fdesc.read(4)
         else:
             fdesc = fname
             filename = getattr(fdesc, "name", "No name")
@@ -1171,6 +1334,10 @@ class RawPcapReader:
     """A stateful pcap reader. Each packet is returned as a string"""
 
     nonblocking_socket = True
+    index = None  # type: Optional[PcapIndex]
+    # Called with (data, wirelen, linktype) on each record, that is
+    # skipped when it returns False
+    bpf_filter = None  # type: Optional[Callable[[bytes, int, int], bool]]
     PacketMetadata = collections.namedtuple("PacketMetadata",
                                             ["sec", "usec", "wirelen", "caplen"])  # noqa: E501
 
@@ -1225,13 +1392,19 @@ class RawPcapReader:
 
         raise EOFError when no more packets are available
         """
-        hdr = self.f.read(16)
-        if len(hdr) < 16:
-            raise EOFError
-        sec, usec, caplen, wirelen = struct.unpack(self.endian + "IIII", hdr)
-        return (self.f.read(caplen)[:size],
-                RawPcapReader.PacketMetadata(sec=sec, usec=usec,
-                                             wirelen=wirelen, caplen=caplen))
+        while True:
+            hdr = self.f.read(16)
+            if len(hdr) < 16:
+                raise EOFError
+            sec, usec, caplen, wirelen = struct.unpack(self.endian + "IIII",
+                                                       hdr)
+            data = self.f.read(caplen)
+            if self.bpf_filter is None or \
+                    self.bpf_filter(data, wirelen, self.linktype):
+                return (data[:size],
+                        RawPcapReader.PacketMetadata(sec=sec, usec=usec,
+                                                     wirelen=wirelen,
+                                                     caplen=caplen))
 
     def read_packet(self, size=MTU):
         # type: (int) -> Packet
@@ -1240,6 +1413,70 @@ class RawPcapReader:
             self._read_packet()[0]
         )
 
+    def iter_raw_batches(self,
+                         batch_size=1024,  # type: int
+                         chunk_size=4194304,  # type: int
+                         ):
+        # type: (...) -> Iterator[List[Tuple[memoryview, int, int, int]]]
+        """Yields the remaining records in lists of batch_size (data, time
+        in ns, wirelen, linktype) tuples
+
+        The file is read in chunks of chunk_size bytes, and the data of the
+        records are memoryview objects on these chunks: they are not
+        copied. The bpf_filter of the reader is applied.
+        """
+        unpack = struct.Struct(self.endian + "IIII").unpack_from
+        tsmul = 1 if self.nano else 1000
+        linktype = self.linktype
+        records = []  # type: List[Tuple[memoryview, int, int, int]]
+        buf = b""
+        pos = 0
+        while True:
+            chunk = self.f.read(chunk_size)
+            if not chunk:
+                break
+            # Keep the beginning of the record cut by the previous chunk
+            buf = buf[pos:] + chunk
+            view = memoryview(buf)
+            end = len(buf) - 16
+            pos = 0
+            append = records.append
+            while pos <= end:
+                sec, usec, caplen, wirelen = unpack(buf, pos)
+                start = pos + 16
+                if start + caplen > end + 16:
+                    break
+                pos = start + caplen
+                append((view[start:pos], sec * 1000000000 + usec * tsmul,
+                        wirelen, linktype))
+            for batch in self._raw_batches(records, batch_size):
+                yield batch
+        for batch in self._raw_batches(records, batch_size, True):
+            yield batch
+
+    def _raw_batches(self,
+                     records,  # type: List[Tuple[memoryview, int, int, int]]
+                     batch_size,  # type: int
+                     last=False,  # type: bool
+                     ):
+        # type: (...) -> Iterator[List[Tuple[memoryview, int, int, int]]]
+        """Applies the bpf_filter to records, and yields them in lists of
+        batch_size records. The remaining ones are left in records, unless
+        it is the last call."""
+        if self.bpf_filter is not None:
+            flt = self.bpf_filter
+            records[:] = [rec for rec in records
+                          if flt(rec[0], rec[2], rec[3])]
+        i = 0
+        while len(records) - i >= batch_size:
+            yield records[i:i + batch_size]
+            i += batch_size
+        if last:
+            if i < len(records):
+                yield records[i:]
+        else:
+            del records[:i]
+
     def dispatch(self,
                  callback  # type: Callable[[Tuple[bytes, RawPcapReader.PacketMetadata]], Any]  # noqa: E501
                  ):
@@ -1304,6 +1541,16 @@ class RawPcapReader:
         return sockets, None
 
 
+def _read_lazily(reader):
+    # type: (Union[PcapReader, PcapNgReader]) -> Iterator[Packet]
+    """Yields the remaining packets of reader, dissected lazily"""
+    while True:
+        try:
+            yield reader.read_packet(lazy=True)
+        except EOFError:
+            return
+
+
 class PcapReader(RawPcapReader):
     def __init__(self, filename, fdesc, magic):
         # type: (str, IO[bytes], bytes) -> None
@@ -1319,15 +1566,15 @@ class PcapReader(RawPcapReader):
                 import scapy.packet  # noqa: F401
             self.LLcls = conf.raw_layer
 
-    def read_packet(self, size=MTU):
-        # type: (int) -> Packet
+    def read_packet(self, size=MTU, lazy=None):
+        # type: (int, Optional[bool]) -> Packet
         rp = super(PcapReader, self)._read_packet(size=size)
         if rp is None:
             raise EOFError
         s, pkt_info = rp
 
         try:
-            p = self.LLcls(s)  # type: Packet
+            p = self.LLcls(s, lazy=lazy)  # type: Packet
         except KeyboardInterrupt:
             raise
         except Exception:
@@ -1348,6 +1595,43 @@ class PcapReader(RawPcapReader):
         # type: (int) -> Packet
         return self.read_packet(size=size)
 
+    def to_columns(self, columns, **kargs):
+        # type: (Dict[str, str], **Any) -> Dict[str, Any]
+        """Reads the remaining packets into columns of values. Only the
+        layers needed are dissected. See PacketList.to_columns()."""
+        from scapy.plist import _to_columns
+        return _to_columns(_read_lazily(self), columns, **kargs)
+
+    def flow(self,
+             src,  # type: str
+             dst,  # type: str
+             sport,  # type: int
+             dport,  # type: int
+             proto=None,  # type: Optional[int]
+             start=None,  # type: Optional[Union[float, Decimal]]
+             stop=None,  # type: Optional[Union[float, Decimal]]
+             ):
+        # type: (...) -> Iterator[Packet]
+        """Yields the packets exchanged between src:sport and dst:dport, in
+        both directions, between start and stop. Only the matching records
+        are read, using the index. proto defaults to TCP, UDP and SCTP."""
+        return _read_indexed(self, start, stop,
+                             (src, dst, sport, dport, proto))
+
+    def time_range(self, start=None, stop=None):
+        # type: (Optional[Union[float, Decimal]], Optional[Union[float, Decimal]]) -> Iterator[Packet]  # noqa: E501
+        """Yields the packets captured between start (included) and stop
+        (excluded). Only the matching records are read, using the index."""
+        return _read_indexed(self, start, stop)
+
+    def imap(self, func, workers=None, chunksize=1000):
+        # type: (Callable[[Packet], Any], Optional[int], int) -> Iterator[Any]  # noqa: E501
+        """Applies func to the remaining packets, dissected by a pool of
+        `workers` processes (by default, one per CPU), and yields the
+        results in the order of the packets. The records are split in
+        chunks of `chunksize` records, with a pass on their headers only."""
+        return _imap(self, func, workers, chunksize)
+
 
 class RawPcapNgReader(RawPcapReader):
     """A stateful pcapng reader. Each packet is returned as
@@ -1359,7 +1643,9 @@ class RawPcapNgReader(RawPcapReader):
 
     PacketMetadata = collections.namedtuple("PacketMetadata",
                                             ["linktype", "tsresol",
-                                             "tshigh", "tslow", "wirelen"])
+                                             "tshigh", "tslow", "wirelen",
+                                             "comment", "ifname",
+                                             "direction"])
 
     def __init__(self, filename, fdesc, magic):
         # type: (str, IO[bytes], bytes) -> None
@@ -1367,10 +1653,13 @@ class RawPcapNgReader(RawPcapReader):
         self.f = fdesc
         # A list of (linktype, snaplen, tsresol); will be populated by IDBs.
         self.interfaces = []  # type: List[Tuple[int, int, int]]
+        # The names of the interfaces, by interface id
+        self.ifnames = {}  # type: Dict[int, str]
         self.default_options = {
             "tsresol": 1000000
         }
         self.blocktypes = {
+            0x0A0D0D0A: self.read_block_shb,
             1: self.read_block_idb,
             2: self.read_block_pkt,
             3: self.read_block_spb,
@@ -1389,7 +1678,7 @@ class RawPcapNgReader(RawPcapReader):
         else:
             raise Scapy_Exception("Not a pcapng capture file (bad magic)")
         self.f.read(12)
-        blocklen = struct.unpack("!I", blocklen_)[0]  # type: int
+        blocklen = struct.unpack(self.endian + "I", blocklen_)[0]  # type: int
         # Read default options
         self.default_options = self.read_options(
             self.f.read(blocklen - 24)
@@ -1426,9 +1715,89 @@ class RawPcapNgReader(RawPcapReader):
                 raise EOFError
             res = self.blocktypes.get(blocktype,
                                       lambda block, size: None)(block, size)
-            if res is not None:
+            if res is not None and (
+                    self.bpf_filter is None or
+                    self.bpf_filter(res[0], res[1].wirelen, res[1].linktype)
+            ):
                 return res
 
+    def iter_raw_batches(self,
+                         batch_size=1024,  # type: int
+                         chunk_size=4194304,  # type: int
+                         ):
+        # type: (...) -> Iterator[List[Tuple[memoryview, int, int, int]]]
+        """Yields the remaining packets in lists of batch_size (data, time
+        in ns, wirelen, linktype) tuples
+
+        The file is read in chunks of chunk_size bytes, and the data of the
+        packets are memoryview objects on these chunks: they are not
+        copied. The options of the packet blocks are not parsed, the other
+        blocks are handled as usual. The bpf_filter of the reader is
+        applied.
+        """
+        blockhdr = struct.Struct(self.endian + "2I")
+        epb = struct.Struct(self.endian + "5I")
+        pb = struct.Struct(self.endian + "HH4I")
+        spb = struct.Struct(self.endian + "I")
+        flt = self.bpf_filter
+        batch = []  # type: List[Tuple[memoryview, int, int, int]]
+        buf = b""
+        pos = 0
+        ts = 0
+        while True:
+            chunk = self.f.read(chunk_size)
+            if not chunk:
+                break
+            # Keep the beginning of the block cut by the previous chunk
+            buf = buf[pos:] + chunk
+            view = memoryview(buf)
+            end = len(buf)
+            pos = 0
+            while pos + 12 <= end:
+                blocktype, blocklen = blockhdr.unpack_from(buf, pos)
+                if blocklen < 12:
+                    warning("PcapNg: Invalid pcapng block (bad blocklen)")
+                    if batch:
+                        yield batch
+                    return
+                if pos + blocklen > end:
+                    break
+                if blocktype == 6:
+                    intid, tshigh, tslow, caplen, wirelen = epb.unpack_from(
+                        buf, pos + 8
+                    )
+                    linktype, _, tsresol = self.interfaces[intid]
+                    ts = ((tshigh << 32) + tslow) * 1000000000 // tsresol
+                    data = view[pos + 28:pos + 28 + caplen]
+                elif blocktype == 3:
+                    wirelen, = spb.unpack_from(buf, pos + 8)
+                    linktype, snaplen, _ = self.interfaces[0]
+                    # The time is the one of the previous packet
+                    data = view[pos + 12:pos + 12 + min(wirelen, snaplen)]
+                elif blocktype == 2:
+                    intid, _, tshigh, tslow, caplen, wirelen = pb.unpack_from(
+                        buf, pos + 8
+                    )
+                    linktype, _, tsresol = self.interfaces[intid]
+                    ts = ((tshigh << 32) + tslow) * 1000000000 // tsresol
+                    data = view[pos + 28:pos + 28 + caplen]
+                else:
+                    self.blocktypes.get(
+                        blocktype, lambda block, size: None
+                    )(buf[pos + 8:pos + blocklen - 4], MTU)
+                    pos += blocklen
+                    continue
+                pos += blocklen
+                if flt is not None and not flt(data, wirelen,
+                                               linktype):
+                    continue
+                batch.append((data, ts, wirelen, linktype))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
     def read_options(self, options):
         # type: (bytes) -> Dict[str, int]
         """Section Header Block"""
@@ -1452,14 +1821,50 @@ class RawPcapNgReader(RawPcapReader):
             options = options[4 + length:]
         return opts
 
+    def read_packet_options(self, options):
+        # type: (bytes) -> Tuple[Optional[bytes], Optional[int]]
+        """Returns the comment and the direction read from the options of a
+        packet block"""
+        comment = direction = None
+        while len(options) >= 4:
+            code, length = struct.unpack(self.endian + "HH", options[:4])
+            if code == 0:
+                break
+            if code == 1:
+                # opt_comment
+                comment = options[4:4 + length]
+            elif code == 2 and length == 4:
+                # epb_flags
+                direction = struct.unpack(self.endian + "I",
+                                          options[4:8])[0] & 0x3
+            options = options[4 + length + (-length) % 4:]
+        return comment, direction
+
+    def read_block_shb(self, block, _):
+        # type: (bytes, int) -> None
+        """Section Header Block: the interfaces are those of the new
+        section"""
+        self.interfaces = []
+        self.ifnames = {}
+
     def read_block_idb(self, block, _):
         # type: (bytes, int) -> None
         """Interface Description Block"""
-        options = self.read_options(block[16:])
+        options = block[8:]
         interface = struct.unpack(  # type: ignore
             self.endian + "HxxI",
             block[:8]
-        ) + (options["tsresol"],)  # type: Tuple[int, int, int]
+        ) + (self.read_options(options)["tsresol"],)  # type: Tuple[int, int, int]  # noqa: E501
+        while len(options) >= 4:
+            code, length = struct.unpack(self.endian + "HH", options[:4])
+            if code == 0:
+                break
+            if code == 2:
+                # if_name
+                self.ifnames[len(self.interfaces)] = plain_str(
+                    options[4:4 + length]
+                ).rstrip("\x00")
+            options = options[4 + length + (-length) % 4:]
         self.interfaces.append(interface)
 
     def read_block_epb(self, block, size):
@@ -1469,12 +1874,18 @@ class RawPcapNgReader(RawPcapReader):
             self.endian + "5I",
             block[:20],
         )
+        comment, direction = self.read_packet_options(
+            block[20 + caplen + (-caplen) % 4:]
+        )
         return (block[20:20 + caplen][:size],
                 RawPcapNgReader.PacketMetadata(linktype=self.interfaces[intid][0],  # noqa: E501
                                                tsresol=self.interfaces[intid][2],  # noqa: E501
                                                tshigh=tshigh,
                                                tslow=tslow,
-                                               wirelen=wirelen))
+                                               wirelen=wirelen,
+                                               comment=comment,
+                                               ifname=self.ifnames.get(intid),  # noqa: E501
+                                               direction=direction))
 
     def read_block_spb(self, block, size):
         # type: (bytes, int) -> Tuple[bytes, RawPcapNgReader.PacketMetadata]
@@ -1490,7 +1901,10 @@ class RawPcapNgReader(RawPcapReader):
                                                tsresol=self.interfaces[intid][2],  # noqa: E501
                                                tshigh=None,
                                                tslow=None,
-                                               wirelen=wirelen))
+                                               wirelen=wirelen,
+                                               comment=None,
+                                               ifname=self.ifnames.get(intid),  # noqa: E501
+                                               direction=None))
 
     def read_block_pkt(self, block, size):
         # type: (bytes, int) -> Tuple[bytes, RawPcapNgReader.PacketMetadata]
@@ -1499,12 +1913,18 @@ class RawPcapNgReader(RawPcapReader):
             self.endian + "HH4I",
             block[:20],
         )
+        comment, direction = self.read_packet_options(
+            block[20 + caplen + (-caplen) % 4:]
+        )
         return (block[20:20 + caplen][:size],
                 RawPcapNgReader.PacketMetadata(linktype=self.interfaces[intid][0],  # noqa: E501
                                                tsresol=self.interfaces[intid][2],  # noqa: E501
                                                tshigh=tshigh,
                                                tslow=tslow,
-                                               wirelen=wirelen))
+                                               wirelen=wirelen,
+                                               comment=comment,
+                                               ifname=self.ifnames.get(intid),  # noqa: E501
+                                               direction=direction))
 
 
 class PcapNgReader(RawPcapNgReader):
@@ -1515,15 +1935,16 @@ class PcapNgReader(RawPcapNgReader):
         # type: (str, IO[bytes], bytes) -> None
         RawPcapNgReader.__init__(self, filename, fdesc, magic)
 
-    def read_packet(self, size=MTU):
-        # type: (int) -> Packet
+    def read_packet(self, size=MTU, lazy=None):
+        # type: (int, Optional[bool]) -> Packet
         rp = super(PcapNgReader, self)._read_packet(size=size)
         if rp is None:
             raise EOFError
-        s, (linktype, tsresol, tshigh, tslow, wirelen) = rp
+        s, (linktype, tsresol, tshigh, tslow, wirelen, comment, ifname,
+            direction) = rp
         try:
             cls = conf.l2types.num2layer[linktype]  # type: Type[Packet]
-            p = cls(s)  # type: Packet
+            p = cls(s, lazy=lazy)  # type: Packet
         except KeyboardInterrupt:
             raise
         except Exception:
@@ -1536,16 +1957,824 @@ class PcapNgReader(RawPcapNgReader):
         if tshigh is not None:
             p.time = EDecimal((tshigh << 32) + tslow) / tsresol
         p.wirelen = wirelen
+        p.pkt_comment = comment
+        p.sniffed_on = ifname
+        p.direction = direction
         return p
 
     def recv(self, size=MTU):
         # type: (int) -> Packet
         return self.read_packet()
 
+    def to_columns(self, columns, **kargs):
+        # type: (Dict[str, str], **Any) -> Dict[str, Any]
+        """Reads the remaining packets into columns of values. Only the
+        layers needed are dissected. See PacketList.to_columns()."""
+        from scapy.plist import _to_columns
+        return _to_columns(_read_lazily(self), columns, **kargs)
+
+    def flow(self,
+             src,  # type: str
+             dst,  # type: str
+             sport,  # type: int
+             dport,  # type: int
+             proto=None,  # type: Optional[int]
+             start=None,  # type: Optional[Union[float, Decimal]]
+             stop=None,  # type: Optional[Union[float, Decimal]]
+             ):
+        # type: (...) -> Iterator[Packet]
+        """Yields the packets exchanged between src:sport and dst:dport, in
+        both directions, between start and stop. Only the matching records
+        are read, using the index. proto defaults to TCP, UDP and SCTP."""
+        return _read_indexed(self, start, stop,
+                             (src, dst, sport, dport, proto))
+
+    def time_range(self, start=None, stop=None):
+        # type: (Optional[Union[float, Decimal]], Optional[Union[float, Decimal]]) -> Iterator[Packet]  # noqa: E501
+        """Yields the packets captured between start (included) and stop
+        (excluded). Only the matching records are read, using the index."""
+        return _read_indexed(self, start, stop)
+
+    def imap(self, func, workers=None, chunksize=1000):
+        # type: (Callable[[Packet], Any], Optional[int], int) -> Iterator[Any]  # noqa: E501
+        """Applies func to the remaining packets, dissected by a pool of
+        `workers` processes (by default, one per CPU), and yields the
+        results in the order of the packets. The records are split in
+        chunks of `chunksize` records, with a pass on their headers only."""
+        return _imap(self, func, workers, chunksize)
+
+
+def _record_chunks(reader, chunksize):
+    # type: (Union[PcapReader, PcapNgReader], int) -> List[Tuple[int, int, Any]]  # noqa: E501
+    """Splits the remaining records of reader in chunks of `chunksize`
+    records, reading only the headers of the records. Returns the offset,
+    the number of records, and the state of the reader at the beginning of
+    each chunk."""
+    fdesc = reader.f
+    ngreader = None  # type: Optional[RawPcapNgReader]
+    if isinstance(reader, RawPcapNgReader):
+        ngreader = reader
+    chunks = []  # type: List[Tuple[int, int, Any]]
+    n = 0
+    while True:
+        pos = fdesc.tell()
+        if ngreader is None:
+            hdr = fdesc.read(16)
+            if len(hdr) < 16:
+                break
+            caplen, = struct.unpack(reader.endian + "I", hdr[8:12])
+            fdesc.seek(caplen, 1)
+        else:
+            hdr = fdesc.read(8)
+            if len(hdr) < 8:
+                break
+            blocktype, blocklen = struct.unpack(ngreader.endian + "2I", hdr)
+            if blocktype not in (2, 3, 6):
+                # The other blocks change the state of the reader
+                block = fdesc.read(blocklen - 8)
+                if len(block) < blocklen - 8:
+                    break
+                ngreader.blocktypes.get(
+                    blocktype, lambda block, size: None
+                )(block[:-4], MTU)
+                continue
+            fdesc.seek(blocklen - 8, 1)
+        if n % chunksize == 0:
+            state = None
+            if ngreader is not None:
+                state = (ngreader.endian, list(ngreader.interfaces),
+                         dict(ngreader.ifnames))
+            chunks.append((pos, 0, state))
+        chunks[-1] = (chunks[-1][0], chunks[-1][1] + 1, chunks[-1][2])
+        n += 1
+    return chunks
+
+
+# The function applied by the workers of PcapReader.imap(), and the BPF
+# filter of the reader
+_imap_func = None  # type: Optional[Callable[[Packet], Any]]
+_imap_filter = None  # type: Optional[Callable[[bytes, int, int], bool]]
+
+
+def _imap_init(func, flt=None):
+    # type: (Optional[Callable[[Packet], Any]], Optional[Callable[[bytes, int, int], bool]]) -> None  # noqa: E501
+    global _imap_func, _imap_filter
+    _imap_func, _imap_filter = func, flt
+
+
+def _imap_chunk(task):
+    # type: (Tuple[str, int, int, Any]) -> List[Any]
+    """Reads and dissects a chunk of records in a worker, and returns the
+    results of _imap_func"""
+    filename, offset, count, state = task
+    res = []
+    with PcapReader(filename) as reader:  # type: ignore
+        if state is not None:
+            # The state of the pcapng captures
+            ngreader = cast(RawPcapNgReader, reader)
+            ngreader.endian, ngreader.interfaces, ngreader.ifnames = state
+        reader.f.seek(offset)
+        remaining = [count]
+
+        def _in_chunk(data, wirelen, linktype):
+            # type: (bytes, int, int) -> bool
+            # Stop at the first record of the next chunk
+            if not remaining[0]:
+                raise EOFError
+            remaining[0] -= 1
+            return _imap_filter is None or \
+                _imap_filter(data, wirelen, linktype)
+        reader.bpf_filter = _in_chunk
+        while True:
+            try:
+                pkt = reader.read_packet()
+            except EOFError:
+                break
+            res.append(pkt if _imap_func is None else _imap_func(pkt))
+    return res
+
+
+def _fork_context():
+    # type: () -> Any
+    """Returns the multiprocessing context that forks the processes, so
+    that they inherit the state of Scapy and the functions they run do not
+    need to be picklable. The default one is returned where fork is not
+    available."""
+    import multiprocessing
+    try:
+        return multiprocessing.get_context("fork")
+    except AttributeError:
+        # Python 2 always forks, but on Windows
+        return multiprocessing
+    except ValueError:
+        # Windows
+        return multiprocessing
+
+
+def _imap(reader,  # type: Union[PcapReader, PcapNgReader]
+          func,  # type: Optional[Callable[[Packet], Any]]
+          workers=None,  # type: Optional[int]
+          chunksize=1000,  # type: int
+          ):
+    # type: (...) -> Iterator[Any]
+    """Applies func to the remaining packets of reader, in a process pool"""
+    if not os.path.isfile(reader.filename):
+        raise Scapy_Exception("The workers need the name of the file")
+    tasks = [(reader.filename, offset, n, state)
+             for offset, n, state in _record_chunks(reader, chunksize)]
+    # func is passed when the workers start, so that it does not need to be
+    # picklable with the fork start method
+    pool = _fork_context().Pool(workers, _imap_init,
+                                (func, reader.bpf_filter))
+    try:
+        for res in pool.imap(_imap_chunk, tasks):
+            for r in res:
+                yield r
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _packet_record(pkt):
+    # type: (Packet) -> Tuple[Type[Packet], bytes, Any, Optional[int], Optional[str], Optional[bytes], Optional[int]]  # noqa: E501
+    """Returns the raw bytes and the metadata of a packet read from a file,
+    that are cheaper to send to another process than the packet"""
+    return (pkt.__class__, raw(pkt), pkt.time, pkt.wirelen, pkt.sniffed_on,
+            pkt.pkt_comment, pkt.direction)
+
+
+def _record_packet(rec):
+    # type: (Tuple[Type[Packet], bytes, Any, Optional[int], Optional[str], Optional[bytes], Optional[int]]) -> Packet  # noqa: E501
+    """Rebuilds a packet, dissected lazily, from _packet_record()"""
+    cls, s, ptime, wirelen, sniffed_on, comment, direction = rec
+    pkt = cls(s, lazy=True)
+    pkt.time = ptime
+    pkt.wirelen = wirelen
+    pkt.sniffed_on = sniffed_on
+    pkt.pkt_comment = comment
+    pkt.direction = direction
+    return pkt
+
+
+def _time_ns(ts):
+    # type: (Union[float, Decimal, int]) -> int
+    """Converts a timestamp in seconds to ns"""
+    if isinstance(ts, float):
+        # Use the shortest representation, not the binary value
+        return int(Decimal(repr(ts)) * 1000000000)
+    return int(Decimal(ts) * 1000000000)
+
+
+try:
+    array.array("q")
+    _INT64 = "q"
+except ValueError:
+    # Python 2
+    _INT64 = "l"
+
+
+class MmapPcapReader(object):
+    """Random access to the packets of a pcap or pcapng file
+
+    The file is memory-mapped, and the offsets, lengths and timestamps of
+    its records are indexed once. The index can be saved to a file, and is
+    then loaded instead of being built again::
+
+        >>> pkts = MmapPcapReader("big.pcap", index="big.pcap.idx")
+        >>> len(pkts)
+        5000001
+        >>> pkts[5000000]
+        >>> pkts[-10:]
+        >>> pkts[pkts.seek_time(1600000000):pkts.seek_time(1600000060)]
+
+    record() returns the data of a record as a memoryview, without copying
+    it. The memoryviews must be released before closing the reader.
+
+    Compressed files are not supported.
+
+    :param filename: the pcap or pcapng file
+    :param index: the index file, loaded if it exists and matches the
+        capture file, written otherwise
+    """
+
+    def __init__(self, filename, index=None):
+        # type: (str, Optional[str]) -> None
+        self.filename = filename
+        self.f = open(filename, "rb")
+        try:
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self.f.close()
+            raise Scapy_Exception("No data could be read!")
+        self.view = None  # type: Optional[memoryview]
+        try:
+            self.view = memoryview(cast(bytes, self.mm))
+        except TypeError:
+            # Python 2
+            pass
+        magic = self.mm[:4]
+        if magic[:2] == b"\x1f\x8b":
+            self.close()
+            raise Scapy_Exception("Cannot memory-map a compressed file")
+        if magic in [b"\xa1\xb2\xc3\xd4", b"\xa1\xb2\x3c\x4d"]:
+            self.endian = ">"
+        elif magic in [b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1"]:
+            self.endian = "<"
+        elif magic != b"\x0a\x0d\x0d\x0a":
+            self.close()
+            raise Scapy_Exception("Not a supported capture file")
+        self.ng = magic == b"\x0a\x0d\x0d\x0a"
+        self.nano = magic in [b"\xa1\xb2\x3c\x4d", b"\x4d\x3c\xb2\xa1"]
+        # The index: for each record, the offset and length of its data,
+        # its wire length, its timestamp in ns and its link type
+        self.offsets = array.array(_INT64)
+        self.caplens = array.array("I")
+        self.wirelens = array.array("I")
+        self.times = array.array(_INT64)
+        self.linktypes = array.array("H")
+        if index is not None and os.path.exists(index) and \
+                self.load_index(index):
+            return
+        if self.ng:
+            self._index_pcapng()
+        else:
+            self._index_pcap()
+        if index is not None:
+            self.save_index(index)
+
+    def _add_record(self, offset, caplen, wirelen, ts, linktype):
+        # type: (int, int, int, int, int) -> None
+        self.offsets.append(offset)
+        self.caplens.append(caplen)
+        self.wirelens.append(wirelen)
+        self.times.append(ts)
+        self.linktypes.append(linktype)
+
+    def _index_pcap(self):
+        # type: () -> None
+        mm, size = self.mm, len(self.mm)
+        if size < 24:
+            raise Scapy_Exception("Invalid pcap file (too short)")
+        linktype, = struct.unpack_from(self.endian + "I", mm, 20)
+        fmt = struct.Struct(self.endian + "IIII")
+        mult = 1 if self.nano else 1000
+        offset = 24
+        while offset + 16 <= size:
+            sec, usec, caplen, wirelen = fmt.unpack_from(mm, offset)
+            offset += 16
+            if offset + caplen > size:
+                # Truncated record
+                break
+            self._add_record(offset, caplen, wirelen,
+                             sec * 1000000000 + usec * mult, linktype)
+            offset += caplen
+
+    def _index_pcapng(self):
+        # type: () -> None
+        mm, size = self.mm, len(self.mm)
+        endian = "<"
+        # (linktype, snaplen, tsresol) of the interfaces of the section
+        interfaces = []  # type: List[Tuple[int, int, int]]
+        ts = 0
+        offset = 0
+        while offset + 12 <= size:
+            blocktype, = struct.unpack_from(endian + "I", mm, offset)
+            if blocktype == 0x0A0D0D0A:
+                # Section Header Block: the byte order may change
+                endian = ">" if mm[offset + 8:offset + 12] == \
+                    b"\x1a\x2b\x3c\x4d" else "<"
+                interfaces = []
+            blocklen, = struct.unpack_from(endian + "I", mm, offset + 4)
+            if blocklen < 12 or offset + blocklen > size:
+                break
+            data = offset + 8
+            if blocktype == 1:
+                # Interface Description Block
+                linktype, snaplen = struct.unpack_from(endian + "HxxI", mm,
+                                                       data)
+                interfaces.append((linktype, snaplen, self._tsresol(
+                    endian, mm[data + 8:offset + blocklen - 4]
+                )))
+            elif blocktype in [2, 6] and interfaces:
+                # (Obsolete) Packet Block, Enhanced Packet Block
+                intid, tshigh, tslow, caplen, wirelen = struct.unpack_from(
+                    endian + ("HxxIIII" if blocktype == 2 else "5I"),
+                    mm, data
+                )
+                # Records of unknown interfaces are skipped
+                if intid < len(interfaces):
+                    linktype, _, tsresol = interfaces[intid]
+                    ts = (((tshigh << 32) + tslow) * 1000000000) // tsresol
+                    self._add_record(data + 20, caplen, wirelen, ts,
+                                     linktype)
+            elif blocktype == 3 and interfaces:
+                # Simple Packet Block: no timestamp, the previous one is
+                # used
+                wirelen, = struct.unpack_from(endian + "I", mm, data)
+                caplen = min(wirelen, blocklen - 16)
+                if interfaces[0][1]:
+                    caplen = min(caplen, interfaces[0][1])
+                self._add_record(data + 4, caplen, wirelen, ts,
+                                 interfaces[0][0])
+            offset += blocklen + (-blocklen) % 4
+
+    @staticmethod
+    def _tsresol(endian, options):
+        # type: (str, bytes) -> int
+        """Returns the timestamps resolution from the options of an IDB"""
+        while len(options) >= 4:
+            code, length = struct.unpack(endian + "HH", options[:4])
+            if code == 0:
+                break
+            if code == 9 and length == 1 and len(options) >= 5:
+                tsresol = orb(options[4])
+                return int((2 if tsresol & 128 else 10) ** (tsresol & 127))
+            options = options[4 + length + (-length) % 4:]
+        return 1000000
+
+    _INDEX_HEADER = struct.Struct("<4sIQQ")
+
+    def save_index(self, filename):
+        # type: (str) -> None
+        """Writes the index of the records to a file"""
+        with open(filename, "wb") as fdesc:
+            fdesc.write(self._INDEX_HEADER.pack(
+                b"SPIX", 1, len(self.mm), len(self)
+            ))
+            for arr in [self.offsets, self.caplens, self.wirelens,
+                        self.times, self.linktypes]:
+                if sys.byteorder == "big":
+                    arr = array.array(arr.typecode, arr)
+                    arr.byteswap()
+                arr.tofile(fdesc)
+
+    def load_index(self, filename):
+        # type: (str) -> bool
+        """Loads the index of the records from a file. Returns False if it
+        does not match the capture file."""
+        with open(filename, "rb") as fdesc:
+            hdr = fdesc.read(self._INDEX_HEADER.size)
+            if len(hdr) < self._INDEX_HEADER.size:
+                return False
+            magic, version, size, count = self._INDEX_HEADER.unpack(hdr)
+            if magic != b"SPIX" or version != 1 or size != len(self.mm):
+                return False
+            arrays = []
+            for typecode in [_INT64, "I", "I", _INT64, "H"]:
+                arr = array.array(typecode)
+                try:
+                    arr.fromfile(fdesc, count)
+                except EOFError:
+                    return False
+                if sys.byteorder == "big":
+                    arr.byteswap()
+                arrays.append(arr)
+        (self.offsets, self.caplens, self.wirelens, self.times,
+         self.linktypes) = arrays
+        return True
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.offsets)
+
+    def record(self, i):
+        # type: (int) -> Tuple[Union[memoryview, bytes], int, int, int]
+        """Returns the (data, timestamp in ns, wirelen, linktype) of the
+        record i. data is a memoryview of the file, except on Python 2."""
+        offset = self.offsets[i]
+        end = offset + self.caplens[i]
+        if self.view is None:
+            data = self.mm[offset:end]  # type: Union[memoryview, bytes]
+        else:
+            data = self.view[offset:end]
+        return data, self.times[i], self.wirelens[i], self.linktypes[i]
+
+    def read_packet(self, i, lazy=None):
+        # type: (int, Optional[bool]) -> Packet
+        """Returns the packet i, dissected"""
+        offset = self.offsets[i]
+        s = self.mm[offset:offset + self.caplens[i]]
+        cls = conf.l2types.num2layer.get(self.linktypes[i], conf.raw_layer)
+        try:
+            p = cls(s, lazy=lazy)  # type: Packet
+        except KeyboardInterrupt:
+            raise
+        except Exception:
+            if conf.debug_dissector:
+                raise
+            p = conf.raw_layer(s)
+        p.time = EDecimal(self.times[i]) / 1000000000
+        p.wirelen = self.wirelens[i]
+        return p
+
+    def __getitem__(self, item):
+        # type: (Union[int, slice]) -> Any
+        if isinstance(item, slice):
+            from scapy import plist
+            return plist.PacketList(
+                [self.read_packet(i) for i in range(*item.indices(len(self)))],
+                name=os.path.basename(self.filename)
+            )
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("packet index out of range")
+        return self.read_packet(item)
+
+    def __iter__(self):
+        # type: () -> Iterator[Packet]
+        for i in range(len(self)):
+            yield self.read_packet(i)
+
+    def seek_time(self, ts):
+        # type: (Union[float, Decimal]) -> int
+        """Returns the index of the first packet captured at or after ts,
+        by a binary search. The packets must be sorted by time."""
+        return bisect.bisect_left(self.times, _time_ns(ts))
+
+    def close(self):
+        # type: () -> None
+        if self.view is not None:
+            self.view.release()
+        self.mm.close()
+        self.f.close()
+
+    def __enter__(self):
+        # type: () -> MmapPcapReader
+        return self
+
+    def __exit__(self, exc_type, exc_value, tracback):
+        # type: (Optional[Any], Optional[Any], Optional[Any]) -> None
+        self.close()
+
+    def __repr__(self):
+        # type: () -> str
+        return "<MmapPcapReader %s: %d packets>" % (self.filename, len(self))
+
+
+# Offset of the IP header for the link types that do not carry an EtherType
+_FLOW_L3_OFFSETS = {
+    DLT_NULL: 4,
+    DLT_LOOP: 4,
+    DLT_LINUX_SLL: 16,
+    DLT_RAW: 0,
+    DLT_RAW_ALT: 0,
+    DLT_IPV4: 0,
+    DLT_IPV6: 0,
+}
+
+
+def _flow_key(linktype, data):
+    # type: (int, bytes) -> Optional[Tuple[int, int, bytes, bytes, int, int]]  # noqa: E501
+    """Returns the (IP version, L4 protocol, src, dst, sport, dport) of a
+    packet, parsed from its bytes without dissecting it, or None if it is
+    not an IPv4 or IPv6 packet. The ports are 0 when there are none."""
+    if linktype == DLT_EN10MB:
+        off = 12
+        ethertype = 0x8100
+        while ethertype in (0x8100, 0x88a8) and len(data) >= off + 2:
+            ethertype, = struct.unpack_from("!H", data, off)
+            off += 4
+        off -= 2
+        if ethertype not in (0x0800, 0x86dd):
+            return None
+    elif linktype in _FLOW_L3_OFFSETS:
+        off = _FLOW_L3_OFFSETS[linktype]
+    else:
+        return None
+    if len(data) < off + 20:
+        return None
+    version = orb(data[off]) >> 4
+    if version == 4:
+        proto = orb(data[off + 9])
+        src, dst = data[off + 12:off + 16], data[off + 16:off + 20]
+        frag = struct.unpack_from("!H", data, off + 6)[0] & 0x1fff
+        l4 = off + (orb(data[off]) & 0xf) * 4
+    elif version == 6 and len(data) >= off + 40:
+        proto = orb(data[off + 6])
+        src, dst = data[off + 8:off + 24], data[off + 24:off + 40]
+        frag = 0
+        l4 = off + 40
+        # Skip the extension headers
+        while proto in (0, 43, 44, 51, 60) and len(data) >= l4 + 8:
+            if proto == 44:
+                frag = struct.unpack_from("!H", data, l4 + 2)[0] & 0xfff8
+                size = 8
+            elif proto == 51:
+                size = (orb(data[l4 + 1]) + 2) * 4
+            else:
+                size = (orb(data[l4 + 1]) + 1) * 8
+            proto = orb(data[l4])
+            l4 += size
+    else:
+        return None
+    sport = dport = 0
+    if proto in (6, 17, 132) and not frag and len(data) >= l4 + 4:
+        sport, dport = struct.unpack_from("!HH", data, l4)
+    return version, proto, src, dst, sport, dport
+
+
+def _flow_id(proto, src, dst, sport, dport):
+    # type: (int, bytes, bytes, int, int) -> bytes
+    """Returns the same value for both directions of a flow"""
+    a = src + struct.pack("!H", sport)
+    b = dst + struct.pack("!H", dport)
+    if a > b:
+        a, b = b, a
+    return chb(proto) + a + b
+
+
+class PcapIndex(object):
+    """A sidecar index of the records of a pcap or pcapng file
+
+    The capture file is read once, and the offset, timestamp, 5-tuple hash
+    and L3/L4 protocols of each record are written to the `index` file (by
+    default, the name of the capture file followed by ``.pcapidx``). A
+    PcapReader given the index reads only the records of a flow or of a
+    time window::
+
+        >>> idx = PcapIndex("big.pcap")
+        >>> with PcapReader("big.pcap", index=idx) as rd:
+        ...     pkts = list(rd.flow("10.0.0.1", "10.0.0.2", 1234, 80))
+        ...     pkts = list(rd.time_range(1600000000, 1600000060))
+
+    The index is written as the capture is read, and update() only reads
+    the records added since the last update, so that the index of a growing
+    capture file can be kept up to date. Compressed files are not supported.
+
+    :param filename: the pcap or pcapng file
+    :param index: the index file, loaded and updated if it exists and
+        matches the capture file, written otherwise
+    """
+
+    # magic, version, offset of the capture file where the index stops,
+    # number of records, timestamp of the last record
+    _HEADER = struct.Struct("<4sHxxQQq")
+    # offset, timestamp (ns), flow hash, link type, IP version, L4 protocol
+    _RECORD = struct.Struct("<QqIHBB")
+    # linktype, snaplen, tsresol of the pcapng interfaces
+    _INTERFACE = struct.Struct("<HIQ")
+
+    def __init__(self, filename, index=None):
+        # type: (str, Optional[str]) -> None
+        self.filename = filename
+        self.index = index or filename + ".pcapidx"
+        self.offset = 0
+        self.count = 0
+        self.last_ts = 0
+        # The state of the pcapng reader, to resume the indexation
+        self.endian = "<"
+        self.interfaces = []  # type: List[Tuple[int, int, int]]
+        self.update()
+
+    def _load(self):
+        # type: () -> bool
+        """Loads the state of the index file. Returns False if it does not
+        exist or does not match the capture file."""
+        if not os.path.exists(self.index):
+            return False
+        with open(self.index, "rb") as fdesc:
+            hdr = fdesc.read(self._HEADER.size)
+            if len(hdr) < self._HEADER.size:
+                return False
+            magic, version, offset, count, last_ts = self._HEADER.unpack(hdr)
+            if magic != b"SPFI" or version != 1 or \
+                    offset > os.path.getsize(self.filename):
+                return False
+            fdesc.seek(self._HEADER.size + count * self._RECORD.size)
+            trailer = fdesc.read()
+        # The trailer is missing if an update was interrupted
+        if len(trailer) < 5:
+            return False
+        endian, nif = struct.unpack("<cI", trailer[:5])
+        if len(trailer) != 5 + nif * self._INTERFACE.size:
+            return False
+        self.interfaces = [
+            cast(Tuple[int, int, int], self._INTERFACE.unpack_from(
+                trailer, 5 + i * self._INTERFACE.size
+            ))
+            for i in range(nif)
+        ]
+        self.endian = plain_str(endian)
+        self.offset, self.count, self.last_ts = offset, count, last_ts
+        return True
+
+    def update(self):
+        # type: () -> int
+        """Indexes the records added to the capture file since the last
+        update, and returns their number"""
+        if not self._load():
+            self.offset = self.count = self.last_ts = 0
+            self.endian, self.interfaces = "<", []
+            open(self.index, "wb").close()
+        with RawPcapReader(self.filename) as reader:  # type: ignore
+            if isinstance(reader.f, gzip.GzipFile):
+                raise Scapy_Exception("Cannot index a compressed file")
+            ngreader = None
+            if isinstance(reader, RawPcapNgReader):
+                ngreader = reader
+            if self.offset:
+                reader.f.seek(self.offset)
+                if ngreader is not None:
+                    ngreader.endian = self.endian
+                    ngreader.interfaces = list(self.interfaces)
+            else:
+                self.offset = reader.f.tell()
+            with open(self.index, "r+b") as fdesc:
+                fdesc.seek(self._HEADER.size + self.count * self._RECORD.size)
+                fdesc.truncate()
+                count = self.count
+                if ngreader is None:
+                    self._index_pcap(reader, fdesc)
+                else:
+                    self._index_pcapng(ngreader, fdesc)
+                fdesc.write(struct.pack("<cI", self.endian.encode(),
+                                        len(self.interfaces)))
+                for interface in self.interfaces:
+                    fdesc.write(self._INTERFACE.pack(*interface))
+                fdesc.seek(0)
+                fdesc.write(self._HEADER.pack(b"SPFI", 1, self.offset,
+                                              self.count, self.last_ts))
+        return self.count - count
+
+    def _add_record(self, fdesc, offset, ts, linktype, data):
+        # type: (IO[bytes], int, int, int, bytes) -> None
+        key = _flow_key(linktype, data)
+        if key is None:
+            fhash, l3, l4 = 0, 0, 0
+        else:
+            l3, l4 = key[:2]
+            fhash = zlib.crc32(_flow_id(*key[1:])) & 0xffffffff
+        fdesc.write(self._RECORD.pack(offset, ts, fhash, linktype, l3, l4))
+        self.count += 1
+        self.last_ts = ts
+
+    def _index_pcap(self, reader, fdesc):
+        # type: (RawPcapReader, IO[bytes]) -> None
+        mult = 1 if reader.nano else 1000
+        while True:
+            try:
+                data, meta = reader._read_packet(size=0xffffffff)
+            except EOFError:
+                break
+            if len(data) < meta.caplen:
+                # The record is being written
+                break
+            self._add_record(fdesc, self.offset,
+                             meta.sec * 1000000000 + meta.usec * mult,
+                             reader.linktype, data)
+            self.offset = reader.f.tell()
+
+    def _index_pcapng(self, reader, fdesc):
+        # type: (RawPcapNgReader, IO[bytes]) -> None
+        nif = len(reader.interfaces)
+        while True:
+            try:
+                data, meta = reader._read_packet(size=0xffffffff)
+            except EOFError:
+                break
+            # Other blocks may have been read before the packet block: its
+            # offset is found from its length, at its end
+            end = reader.f.tell()
+            reader.f.seek(end - 4)
+            blocklen, = struct.unpack(reader.endian + "I", reader.f.read(4))
+            reader.f.seek(end)
+            if meta.tshigh is None:
+                # Simple Packet Block: the previous timestamp is used
+                ts = self.last_ts
+            else:
+                ts = ((meta.tshigh << 32) + meta.tslow) * 1000000000 // \
+                    meta.tsresol
+            self._add_record(fdesc, end - blocklen, ts, meta.linktype, data)
+            self.offset = end
+            nif = len(reader.interfaces)
+        # The interfaces read after the last record will be read again
+        self.endian = reader.endian
+        self.interfaces = reader.interfaces[:nif]
+
+    def __len__(self):
+        # type: () -> int
+        return self.count
+
+    def records(self,
+                start=None,  # type: Optional[int]
+                stop=None,  # type: Optional[int]
+                flows=None,  # type: Optional[Set[int]]
+                ):
+        # type: (...) -> Iterator[Tuple[int, int, int, int, int, int]]
+        """Yields the (offset, timestamp, flow hash, link type, IP version,
+        L4 protocol) of the records captured between the `start` (included)
+        and `stop` (excluded) timestamps, in ns, and whose flow hash is in
+        `flows`. The index file is read by chunks."""
+        size = self._RECORD.size
+        with open(self.index, "rb") as fdesc:
+            fdesc.seek(self._HEADER.size)
+            remain = self.count
+            while remain:
+                count = min(remain, 4096)
+                chunk = fdesc.read(count * size)
+                remain -= count
+                for i in range(0, count * size, size):
+                    rec = cast(Tuple[int, int, int, int, int, int],
+                               self._RECORD.unpack_from(chunk, i))
+                    if (start is None or rec[1] >= start) and \
+                       (stop is None or rec[1] < stop) and \
+                       (flows is None or rec[2] in flows):
+                        yield rec
+
+    def __repr__(self):
+        # type: () -> str
+        return "<PcapIndex %s: %d records>" % (self.filename, self.count)
+
+
+def _read_indexed(reader,  # type: Union[PcapReader, PcapNgReader]
+                  start=None,  # type: Optional[Union[float, Decimal]]
+                  stop=None,  # type: Optional[Union[float, Decimal]]
+                  flow=None,  # type: Optional[Tuple[str, str, int, int, Optional[int]]]  # noqa: E501
+                  ):
+    # type: (...) -> Iterator[Packet]
+    """Yields the packets of reader selected using its index"""
+    index = reader.index
+    if index is None:
+        raise Scapy_Exception("The reader has no index: use "
+                              "PcapReader(filename, index=...)")
+    flows = None  # type: Optional[Dict[int, bytes]]
+    if flow is not None:
+        src, dst, sport, dport, proto = flow
+        src_b, dst_b = (
+            inet_pton(socket.AF_INET6 if ":" in addr else socket.AF_INET,
+                      addr)
+            for addr in (src, dst)
+        )
+        flows = {}
+        for prt in ([6, 17, 132] if proto is None else [proto]):
+            fid = _flow_id(prt, src_b, dst_b, sport, dport)
+            flows[zlib.crc32(fid) & 0xffffffff] = fid
+    if isinstance(reader, RawPcapNgReader):
+        reader.endian = index.endian
+        reader.interfaces = list(index.interfaces)
+    for offset, _, fhash, linktype, _, _ in index.records(
+            start=None if start is None else _time_ns(start),
+            stop=None if stop is None else _time_ns(stop),
+            flows=None if flows is None else set(flows),
+    ):
+        reader.f.seek(offset)
+        pkt = reader.read_packet()
+        if flows is not None:
+            # Different flows may have the same hash
+            key = _flow_key(linktype, raw(pkt))
+            if key is None or _flow_id(*key[1:]) != flows[fhash]:
+                continue
+        yield pkt
+
 
 class RawPcapWriter:
     """A stream PCAP writer with more control than wrpcap()"""
 
+    # All the packets must have the same linktype
+    single_linktype = True
+
     def __init__(self,
                  filename,  # type: Union[IO[bytes], str]
                  linktype=None,  # type: Optional[int]
@@ -1555,6 +2784,8 @@ class RawPcapWriter:
                  sync=False,  # type: bool
                  nano=False,  # type: bool
                  snaplen=MTU,  # type: int
+                 compression=None,  # type: Optional[str]
+                 compresslevel=9,  # type: int
                  ):
         # type: (...) -> None
         """
@@ -1562,21 +2793,27 @@ class RawPcapWriter:
             writable file-like object.
         :param linktype: force linktype to a given value. If None, linktype is
             taken from the first writer packet
-        :param gz: compress the capture on the fly
+        :param gz: compress the capture on the fly, with gzip
         :param endianness: force an endianness (little:"<", big:">").
             Default is native
         :param append: append packets to the capture file instead of
             truncating it
         :param sync: do not bufferize writes to the capture file
         :param nano: use nanosecond-precision (requires libpcap >= 1.5.0)
+        :param compression: compress the capture on the fly, with "gzip",
+            "bz2" or "lzma"
+        :param compresslevel: the compression level, from 1 (fastest) to 9
 
         """
 
+        if gz and compression is None:
+            compression = "gzip"
         self.linktype = linktype
         self.snaplen = snaplen
         self.header_present = 0
         self.append = append
-        self.gz = gz
+        self.gz = bool(compression)
+        self.compression = compression
         self.endian = endianness
         self.sync = sync
         self.nano = nano
@@ -1586,10 +2823,9 @@ class RawPcapWriter:
 
         if isinstance(filename, str):
             self.filename = filename
-            if gz:
-                self.f = cast(_ByteStream, gzip.open(
-                    filename, append and "ab" or "wb", 9
-                ))
+            if compression:
+                self.f = _open_compressed(filename, append and "ab" or "wb",
+                                          compression, compresslevel)
             else:
                 self.f = open(filename, append and "ab" or "wb", bufsz)
         else:
@@ -1613,8 +2849,8 @@ class RawPcapWriter:
             # safest way to tell whether the header is already present
             # because we have to handle compressed streams that
             # are not as flexible as basic files
-            if self.gz:
-                g = gzip.open(self.filename, "rb")  # type: _ByteStream
+            if self.compression:
+                g = _open_compressed(self.filename, "rb", self.compression)
             else:
                 g = open(self.filename, "rb")
             try:
@@ -1630,7 +2866,8 @@ class RawPcapWriter:
     def write(self, pkt):
         # type: (Union[_UniPacketList, bytes]) -> None
         """
-        Writes a Packet, a SndRcvList object, or bytes to a pcap file.
+        Writes a Packet, a SndRcvList object, a PacketTemplate, or bytes to
+        a pcap file.
 
         :param pkt: Packet(s) to write (one record for each Packet), or raw
                     bytes to write (as one record).
@@ -1643,6 +2880,14 @@ class RawPcapWriter:
         else:
             # Import here to avoid a circular dependency
             from scapy.plist import SndRcvList
+            from scapy.template import PacketTemplate
+            if isinstance(pkt, PacketTemplate):
+                # Write the bytes of the packets, without dissecting them
+                if not self.header_present:
+                    self.write_header(pkt.base)
+                for data in pkt.iterbytes():
+                    self.write_packet(data)
+                return
             if isinstance(pkt, SndRcvList):
                 def _iter(pkt=cast(SndRcvList, pkt)):
                     # type: (SndRcvList) -> Iterator[Packet]
@@ -1658,7 +2903,8 @@ class RawPcapWriter:
                 if not self.header_present:
                     self.write_header(p)
 
-                if self.linktype != conf.l2types.get(type(p), None):
+                if self.single_linktype and \
+                        self.linktype != conf.l2types.get(type(p), None):
                     warning("Inconsistent linktypes detected!"
                             " The resulting PCAP file might contain"
                             " invalid packets."
@@ -1829,6 +3075,594 @@ class PcapWriter(RawPcapWriter):
         )
 
 
+# The padding of data to 32 bits, by length % 4
+_PADDING = (b"", b"\x00" * 3, b"\x00" * 2, b"\x00")
+
+
+class RawPcapNgWriter(RawPcapWriter):
+    """A stream pcapng writer with more control than wrpcap()
+
+    An Interface Description Block is written for each interface name and
+    link type, before the first packet that uses it. Each packet is
+    written as an Enhanced Packet Block, with its comment and direction.
+    When appending to a file, a new section is started.
+    """
+
+    single_linktype = False
+
+    def __init__(self,
+                 filename,  # type: Union[IO[bytes], str]
+                 linktype=None,  # type: Optional[int]
+                 gz=False,  # type: bool
+                 endianness="",  # type: str
+                 append=False,  # type: bool
+                 sync=False,  # type: bool
+                 nano=False,  # type: bool
+                 snaplen=MTU,  # type: int
+                 compression=None,  # type: Optional[str]
+                 compresslevel=9,  # type: int
+                 ):
+        # type: (...) -> None
+        """
+        :param filename: the name of the file to write packets to, or an open,
+            writable file-like object.
+        :param linktype: force the linktype of all the packets. If None, it
+            is taken from each packet (Ethernet for bytes)
+        :param gz: compress the capture on the fly, with gzip
+        :param endianness: force an endianness (little:"<", big:">").
+            Default is native
+        :param append: append packets to the capture file, in a new section,
+            instead of truncating it
+        :param sync: do not bufferize writes to the capture file
+        :param nano: use nanosecond-precision timestamps
+        :param compression: compress the capture on the fly, with "gzip",
+            "bz2" or "lzma"
+        :param compresslevel: the compression level, from 1 (fastest) to 9
+        """
+        RawPcapWriter.__init__(self, filename, linktype=linktype, gz=gz,
+                               endianness=endianness or "=", append=append,
+                               sync=sync, nano=nano, snaplen=snaplen,
+                               compression=compression,
+                               compresslevel=compresslevel)
+        self.tsresol = 1000000000 if nano else 1000000
+        # The interface ids, by (name, linktype)
+        self.interfaces = {}  # type: Dict[Tuple[Optional[str], int], int]
+        self._epb_header = struct.Struct(self.endian + "7I")
+        self._blocklen = struct.Struct(self.endian + "I")
+
+    def _write_block(self, blocktype, body):
+        # type: (int, bytes) -> None
+        """Writes a block, body being padded to 32 bits"""
+        blocklen = self._blocklen.pack(len(body) + 12)
+        self.f.write(struct.pack(self.endian + "I", blocktype) + blocklen +
+                     body + blocklen)
+
+    def _options(self, options):
+        # type: (List[Tuple[int, bytes]]) -> bytes
+        """Returns the options of a block, followed by opt_endofopt"""
+        if not options:
+            return b""
+        return b"".join(
+            struct.pack(self.endian + "HH", code, len(value)) + value +
+            b"\x00" * (-len(value) % 4)
+            for code, value in options
+        ) + b"\x00" * 4
+
+    def write_header(self, pkt):
+        # type: (Optional[Union[Packet, bytes]]) -> None
+        self._write_header(pkt)
+
+    def _write_header(self, pkt):
+        # type: (Optional[Union[Packet, bytes]]) -> None
+        self.header_present = 1
+        # Section Header Block, of unspecified length
+        self._write_block(0x0A0D0D0A, struct.pack(self.endian + "IHHq",
+                                                  0x1A2B3C4D, 1, 0, -1))
+        self.f.flush()
+
+    def _write_idb(self, ifname, linktype):
+        # type: (Optional[str], int) -> int
+        """Writes an Interface Description Block, and returns the id of the
+        interface"""
+        options = []  # type: List[Tuple[int, bytes]]
+        if ifname is not None:
+            # if_name
+            options.append((2, bytes_encode(ifname)))
+        if self.nano:
+            # if_tsresol
+            options.append((9, b"\x09"))
+        self._write_block(1, struct.pack(self.endian + "HxxI", linktype,
+                                         self.snaplen) +
+                          self._options(options))
+        intid = self.interfaces[(ifname, linktype)] = len(self.interfaces)
+        return intid
+
+    def _write_packet(self,
+                      packet,  # type: bytes
+                      sec=None,  # type: Optional[int]
+                      usec=None,  # type: Optional[int]
+                      caplen=None,  # type: Optional[int]
+                      wirelen=None,  # type: Optional[int]
+                      ifname=None,  # type: Optional[str]
+                      linktype=None,  # type: Optional[int]
+                      comment=None,  # type: Optional[bytes]
+                      direction=None,  # type: Optional[int]
+                      ):
+        # type: (...) -> None
+        """
+        Writes a single packet to the pcapng file.
+
+        :param packet: bytes for a single packet
+        :param sec: time the packet was captured, in seconds since epoch. If
+                    not supplied, defaults to now.
+        :param usec: If ``nano=True``, then number of nanoseconds after the
+                     second that the packet was captured. If ``nano=False``,
+                     then the number of microseconds after the second the
+                     packet was captured
+        :param caplen: The length of the packet in the capture file. If not
+                       specified, uses ``len(packet)``.
+        :param wirelen: The length of the packet on the wire. If not
+                        specified, uses ``caplen``.
+        :param ifname: the name of the interface the packet was captured on
+        :param linktype: the linktype of the packet. If not specified, uses
+                         the linktype of the writer, or Ethernet.
+        :param comment: the comment of the packet
+        :param direction: 1 for an inbound packet, 2 for an outbound one
+        """
+        if caplen is None:
+            caplen = len(packet)
+        if wirelen is None:
+            wirelen = caplen
+        if sec is None or usec is None:
+            t = time.time()
+            it = int(t)
+            if sec is None:
+                sec = it
+                usec = int(round((t - it) * self.tsresol))
+            elif usec is None:
+                usec = 0
+        if linktype is None:
+            linktype = DLT_EN10MB if self.linktype is None else self.linktype
+        try:
+            intid = self.interfaces[(ifname, linktype)]
+        except KeyError:
+            intid = self._write_idb(ifname, linktype)
+        options = b""
+        if comment is not None or direction is not None:
+            opts = []  # type: List[Tuple[int, bytes]]
+            if comment is not None:
+                # opt_comment
+                opts.append((1, bytes_encode(comment)))
+            if direction is not None:
+                # epb_flags
+                opts.append((2, struct.pack(self.endian + "I",
+                                            direction & 0x3)))
+            options = self._options(opts)
+        ts = sec * self.tsresol + usec
+        length = len(packet)
+        blocklen = 32 + ((length + 3) & ~3) + len(options)
+        # A single write for the whole Enhanced Packet Block
+        self.f.write(b"".join((
+            self._epb_header.pack(6, blocklen, intid, ts >> 32,
+                                  ts & 0xffffffff, caplen, wirelen),
+            packet, _PADDING[length & 3], options,
+            self._blocklen.pack(blocklen),
+        )))
+        if self.sync:
+            self.f.flush()
+
+
+class PcapNgWriter(RawPcapNgWriter):
+    """A stream pcapng writer with more control than wrpcap()
+
+    The interface name (``sniffed_on``), the comment, the direction, the
+    wire length and the link type of each packet are kept.
+    """
+
+    def write_packet(self,
+                     packet,  # type: Union[bytes, Packet]
+                     sec=None,  # type: Optional[int]
+                     usec=None,  # type: Optional[int]
+                     caplen=None,  # type: Optional[int]
+                     wirelen=None,  # type: Optional[int]
+                     ):
+        # type: (...) -> None
+        """
+        Writes a single packet to the pcapng file.
+
+        :param packet: Packet, or bytes for a single packet
+        :param sec: time the packet was captured, in seconds since epoch. If
+                    not supplied, defaults to ``packet.time``, or now.
+        :param usec: If ``nano=True``, then number of nanoseconds after the
+                     second that the packet was captured. If ``nano=False``,
+                     then the number of microseconds after the second the
+                     packet was captured. If ``sec`` is not specified,
+                     this value is ignored.
+        :param caplen: The length of the packet in the capture file. If not
+                       specified, uses ``len(raw(packet))``.
+        :param wirelen: The length of the packet on the wire. If not
+                        specified, tries ``packet.wirelen``, otherwise uses
+                        ``caplen``.
+        """
+        if isinstance(packet, bytes):
+            self._write_packet(packet, sec=sec, usec=usec, caplen=caplen,
+                               wirelen=wirelen)
+            return
+        if sec is None:
+            sec = int(packet.time)
+            usec = int(round((packet.time - sec) * self.tsresol))
+        if usec is None:
+            usec = 0
+        rawpkt = bytes_encode(packet)
+        if wirelen is None:
+            wirelen = packet.wirelen
+        linktype = self.linktype
+        if linktype is None:
+            try:
+                linktype = conf.l2types.layer2num[packet.__class__]
+            except KeyError:
+                warning("PcapNgWriter: unknown LL type for %s. Using type 1 (Ethernet)", packet.__class__.__name__)  # noqa: E501
+                linktype = DLT_EN10MB
+        self._write_packet(
+            rawpkt,
+            sec=sec, usec=usec,
+            caplen=caplen, wirelen=wirelen,
+            ifname=packet.sniffed_on, linktype=linktype,
+            comment=packet.pkt_comment, direction=packet.direction,
+        )
+
+
+class RotatingPcapWriter(object):
+    """A capture writer for long-running sniffers, that writes the packets
+    in a background thread and rotates the files, like tcpdump -C, -G and
+    -W.
+
+    write() only puts the packets in a bounded queue, so that the thread
+    receiving them never waits for the disk. When the queue is full, the
+    packets are dropped, and counted in `dropped`::
+
+        >>> w = RotatingPcapWriter("capture-%Y%m%d-%H%M%S.pcap",
+        ...                        interval=3600, compression="gzip",
+        ...                        compresslevel=1)
+        >>> sniff(iface="eth0", writer=w, store=False)
+
+    The names of the files are formatted with time.strftime(), with the
+    time of their first packet. When the name of a new file does not
+    change, a number is appended to it: capture.pcap, capture.pcap1, ...
+
+    :param filename: the name of the files, as a time.strftime() format
+    :param max_size: start a new file when the current one exceeds
+        max_size bytes, before compression
+    :param interval: start a new file when the current one has been
+        written for `interval` seconds, from the time of its first packet
+    :param max_count: start a new file after max_count packets
+    :param max_files: only keep the last max_files files, the older ones
+        are deleted
+    :param queue_size: the maximum number of packets waiting to be written
+    :param pcapng: write pcapng files instead of pcap files
+    :param kargs: the other arguments are passed to PcapWriter (or
+        PcapNgWriter), e.g. linktype, nano, compression and compresslevel
+    """
+
+    def __init__(self,
+                 filename,  # type: str
+                 max_size=None,  # type: Optional[int]
+                 interval=None,  # type: Optional[float]
+                 max_count=None,  # type: Optional[int]
+                 max_files=None,  # type: Optional[int]
+                 queue_size=10000,  # type: int
+                 pcapng=False,  # type: bool
+                 **kargs  # type: Any
+                 ):
+        # type: (...) -> None
+        from scapy.packet import Packet
+        self.filename = filename
+        self.max_size = max_size
+        self.interval = interval
+        self.max_count = max_count
+        self.max_files = max_files
+        self.pcapng = pcapng
+        self.kargs = kargs
+        # The names of the files written, that were not deleted
+        self.files = []  # type: List[str]
+        self.written = 0
+        self.dropped = 0
+        self.writer = None  # type: Optional[RawPcapWriter]
+        self._single = (Packet, bytes)
+        self._name = None  # type: Optional[str]
+        self._index = 0
+        self._start = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+        # No packet is queued after the end marker put by close()
+        self._queue_lock = threading.Lock()
+        self.closed = False
+        self.queue = six.moves.queue.Queue(queue_size)
+        self.thread = threading.Thread(target=self._run,
+                                       name="RotatingPcapWriter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, pkt):
+        # type: (Union[_UniPacketList, bytes]) -> None
+        """Queues a Packet, bytes, or a list of packets, to be written"""
+        pkts = [pkt] if isinstance(pkt, self._single) else pkt
+        with self._queue_lock:
+            if self.closed:
+                raise Scapy_Exception("RotatingPcapWriter is closed")
+            for p in pkts:
+                try:
+                    self.queue.put_nowait(p)
+                except six.moves.queue.Full:
+                    self.dropped += 1
+
+    def _run(self):
+        # type: () -> None
+        """Writes the queued packets, until close() is called"""
+        while True:
+            pkt = self.queue.get()
+            try:
+                if pkt is None:
+                    return
+                with self._lock:
+                    self._write(pkt)
+            except Exception:
+                log_runtime.error("RotatingPcapWriter: cannot write %r",
+                                  pkt, exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, pkt):
+        # type: (Union[Packet, bytes]) -> None
+        if isinstance(pkt, bytes):
+            ts = time.time()
+        else:
+            ts = float(pkt.time)
+        if self.writer is not None and (
+                (self.max_count and self._count >= self.max_count) or
+                (self.max_size and self.writer.f.tell() >= self.max_size) or
+                (self.interval and ts - self._start >= self.interval)
+        ):
+            self.writer.close()
+            self.writer = None
+        if self.writer is None:
+            self._open(ts)
+        self.writer.write(pkt)  # type: ignore
+        self._count += 1
+        self.written += 1
+
+    def _open(self, ts):
+        # type: (float) -> None
+        """Starts a new file, at time ts"""
+        name = time.strftime(self.filename, time.localtime(ts))
+        if name == self._name:
+            self._index += 1
+            filename = "%s%d" % (name, self._index)
+        else:
+            self._name, self._index = name, 0
+            filename = name
+        if self.pcapng:
+            self.writer = PcapNgWriter(filename, **self.kargs)
+        else:
+            self.writer = PcapWriter(filename, **self.kargs)
+        self.files.append(filename)
+        self._start = ts
+        self._count = 0
+        if self.max_files:
+            while len(self.files) > self.max_files:
+                try:
+                    os.unlink(self.files.pop(0))
+                except OSError:
+                    pass
+
+    def flush(self):
+        # type: () -> None
+        """Waits for the queued packets to be written, and flushes the
+        current file"""
+        if self.thread.is_alive():
+            self.queue.join()
+        with self._lock:
+            if self.writer is not None:
+                self.writer.flush()
+
+    def close(self):
+        # type: () -> None
+        """Writes the queued packets, and closes the current file. The
+        packets written afterwards raise a Scapy_Exception."""
+        with self._queue_lock:
+            if not self.closed and self.thread.is_alive():
+                self.queue.put(None)
+            self.closed = True
+        self.thread.join()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        # type: () -> RotatingPcapWriter
+        return self
+
+    def __exit__(self, exc_type, exc_value, tracback):
+        # type: (Optional[Any], Optional[Any], Optional[Any]) -> None
+        self.close()
+
+    def __repr__(self):
+        # type: () -> str
+        return "<RotatingPcapWriter %s: %d files, %d written, %d dropped>" % (
+            self.filename, len(self.files), self.written, self.dropped
+        )
+
+
+# (time in ns, data, wirelen, linktype, ifname, comment, direction)
+_RawRecord = Tuple[int, bytes, int, int, Optional[str], Optional[bytes],
+                   Optional[int]]
+
+
+def _raw_records(reader,  # type: RawPcapReader
+                 start=None,  # type: Optional[int]
+                 end=None,  # type: Optional[int]
+                 ):
+    # type: (...) -> Iterator[_RawRecord]
+    """Yields the (time in ns, data, wirelen, linktype, ifname, comment,
+    direction) of the records of reader, from start (included) until the
+    first one after end (excluded)"""
+    ngreader = isinstance(reader, RawPcapNgReader)
+    ts = 0
+    while True:
+        try:
+            data, meta = reader._read_packet(size=0xffffffff)
+        except EOFError:
+            return
+        if not ngreader:
+            ts = meta.sec * 1000000000 + meta.usec * (1 if reader.nano
+                                                      else 1000)
+            record = (ts, data, meta.wirelen, reader.linktype, None, None,
+                      None)  # type: _RawRecord
+        else:
+            ngmeta = cast(RawPcapNgReader.PacketMetadata, meta)
+            if ngmeta.tshigh is not None:
+                # The Simple Packet Blocks keep the time of the previous one
+                ts = ((ngmeta.tshigh << 32) + ngmeta.tslow) * 1000000000 \
+                    // ngmeta.tsresol
+            record = (ts, data, ngmeta.wirelen, ngmeta.linktype,
+                      ngmeta.ifname, ngmeta.comment, ngmeta.direction)
+        if end is not None and ts >= end:
+            return
+        if start is None or ts >= start:
+            yield record
+
+
+@conf.commands.register
+def merge_pcaps(inputs,  # type: Sequence[Union[RawPcapReader, IO[bytes], str]]  # noqa: E501
+                output,  # type: Union[IO[bytes], str]
+                dedup_window=None,  # type: Optional[Union[float, Decimal]]
+                start=None,  # type: Optional[Union[float, Decimal]]
+                end=None,  # type: Optional[Union[float, Decimal]]
+                pcapng=None,  # type: Optional[bool]
+                **kargs  # type: Any
+                ):
+    # type: (...) -> int
+    """Merges pcap and pcapng files in the order of the time of their
+    packets, e.g. captures made on several taps
+
+    The records are copied without being dissected, and only the next
+    record of each input is kept in memory, so each input must be sorted
+    by time, as captures are.
+
+    :param inputs: the files, or readers, to merge
+    :param output: the name of the file to write, or a file-like object
+    :param dedup_window: drop the packets already seen on another input
+        less than dedup_window seconds before (same bytes)
+    :param start: drop the packets captured before start
+    :param end: stop at the first packet of each input captured after end
+    :param pcapng: write a pcapng file. By default, a pcapng file is
+        written when one of the inputs is a pcapng file.
+    :param kargs: passed to the writer, e.g. nano or compression
+    :return: the number of packets written
+    """
+    readers = []  # type: List[RawPcapReader]
+    opened = []  # type: List[RawPcapReader]
+    try:
+        for inp in inputs:
+            if isinstance(inp, RawPcapReader):
+                readers.append(inp)
+            else:
+                opened.append(RawPcapReader(inp))  # type: ignore
+                readers.append(opened[-1])
+        if pcapng is None:
+            pcapng = any(isinstance(r, RawPcapNgReader) for r in readers)
+        kargs.setdefault("nano", any(isinstance(r, RawPcapNgReader) or
+                                     r.nano for r in readers))
+        if pcapng:
+            writer = RawPcapNgWriter(output, **kargs)  # type: RawPcapWriter
+        else:
+            writer = RawPcapWriter(output, **kargs)
+        records = [_raw_records(r,
+                                None if start is None else _time_ns(start),
+                                None if end is None else _time_ns(end))
+                   for r in readers]
+        # The next record of each input, by time
+        heap = []  # type: List[Tuple[int, int, _RawRecord]]
+        for i, recs in enumerate(records):
+            nxt = next(recs, None)
+            if nxt is not None:
+                heap.append((nxt[0], i, nxt))
+        heapq.heapify(heap)
+        window = None if dedup_window is None else _time_ns(dedup_window)
+        # The packets written during the window, and their (time, input)
+        seen = {}  # type: Dict[bytes, Tuple[int, int]]
+        recent = collections.deque()  # type: Deque[Tuple[int, bytes]]
+        tsdiv = 1 if writer.nano else 1000
+        count = 0
+        with writer:
+            while heap:
+                ts, i, rec = heap[0]
+                nxt = next(records[i], None)
+                if nxt is None:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, (nxt[0], i, nxt))
+                ts, data, wirelen, linktype, ifname, comment, direction = rec
+                if window is not None:
+                    while recent and recent[0][0] < ts - window:
+                        old_ts, old = recent.popleft()
+                        if seen.get(old, (None,))[0] == old_ts:
+                            del seen[old]
+                    first = seen.get(data)
+                    if first is not None and first[1] != i:
+                        continue
+                    seen[data] = (ts, i)
+                    recent.append((ts, data))
+                if not writer.header_present:
+                    if writer.linktype is None and not pcapng:
+                        writer.linktype = linktype
+                    writer._write_header(None)
+                sec, frac = divmod(ts, 1000000000)
+                if pcapng:
+                    cast(RawPcapNgWriter, writer)._write_packet(
+                        data, sec=sec, usec=frac // tsdiv, wirelen=wirelen,
+                        ifname=ifname, linktype=linktype, comment=comment,
+                        direction=direction,
+                    )
+                else:
+                    if linktype != writer.linktype:
+                        warning("merge_pcaps: inconsistent linktypes [%i] "
+                                "and [%i]. Use pcapng=True",
+                                linktype, writer.linktype)
+                    writer._write_packet(data, sec=sec, usec=frac // tsdiv,
+                                         wirelen=wirelen)
+                count += 1
+            if not writer.header_present:
+                if writer.linktype is None and not pcapng:
+                    writer.linktype = DLT_EN10MB
+                writer._write_header(None)
+    finally:
+        for r in opened:
+            r.close()
+    return count
+
+
+@conf.commands.register
+def slice_pcap(filename,  # type: Union[RawPcapReader, IO[bytes], str]
+               output,  # type: Union[IO[bytes], str]
+               start=None,  # type: Optional[Union[float, Decimal]]
+               end=None,  # type: Optional[Union[float, Decimal]]
+               **kargs  # type: Any
+               ):
+    # type: (...) -> int
+    """Copies the packets of a capture, sorted by time, captured between
+    start (included) and end (excluded), without dissecting them
+
+    :param filename: the file, or reader, to read
+    :param output: the name of the file to write, or a file-like object
+    :param start: the time of the first packet, in seconds
+    :param end: stop at the first packet captured after end
+    :param kargs: passed to merge_pcaps(), e.g. pcapng or compression
+    :return: the number of packets written
+    """
+    return merge_pcaps([filename], output, start=start, end=end, **kargs)
+
+
 @conf.commands.register
 def import_hexcap(input_string=None):
     # type: (Optional[str]) -> bytes
@@ -6,10 +6,12 @@ Distutils setup file for Scapy.
 
 try:
     from setuptools import setup, find_packages
+    from setuptools.command.build_py import build_py
 except:
     raise ImportError("setuptools is required to install scapy !")
 import io
 import os
+import sys
 
 
 def get_long_description():
@@ -29,11 +31,24 @@ def get_long_description():
         return None
 
 
+class BuildPy(build_py):
+    """Does not install scapy.asyncio, which uses the syntax of Python 3.6+,
+    with the older versions of Python"""
+
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 6):
+            modules = [m for m in modules
+                       if (m[0], m[1]) != ("scapy", "asyncio")]
+        return modules
+
+
 # https://packaging.python.org/guides/distributing-packages-using-setuptools/
 setup(
     name='scapy',
     version=__import__('scapy').VERSION,
     packages=find_packages(),
+    cmdclass={'build_py': BuildPy},
     data_files=[('share/man/man1', ["doc/scapy.1"])],
     package_data={
         'scapy': ['VERSION'],
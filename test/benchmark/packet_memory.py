@@ -0,0 +1,32 @@
+# This file is part of Scapy
+# See http://www.secdev.org/projects/scapy for more information
+# This program is published under a GPLv2 license
+
+from common import *
+import time
+import tracemalloc
+
+N = 20000
+raw_packet = raw(Ether() / IP() / TCP() / Raw(b"X" * 20))
+
+# Fill the caches of the classes first
+Ether(raw_packet)
+
+start = time.time()
+plist = PacketList([Ether(raw_packet) for i in range(N)])
+print("Dissect - %.2fs" % (time.time() - start))
+
+start = time.time()
+for pkt in plist:
+    pkt.copy()
+print("Copy - %.2fs" % (time.time() - start))
+
+start = time.time()
+for pkt in IP(dst="10.0.0.0/16") / TCP(dport=80):
+    pass
+print("Generate - %.2fs" % (time.time() - start))
+
+del plist
+tracemalloc.start()
+plist = PacketList([Ether(raw_packet) for i in range(N)])
+print("Memory - %d bytes per packet" % (tracemalloc.get_traced_memory()[0] // N))
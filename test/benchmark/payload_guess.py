@@ -0,0 +1,37 @@
+# This file is part of Scapy
+# See http://www.secdev.org/projects/scapy for more information
+# Copyright (C) Guillaume Valadon
+# This program is published under a GPLv2 license
+
+from common import *
+import time
+
+# Load all contribs, to get as many bindings as possible
+for contrib in list_contrib(ret=True):
+    try:
+        load_contrib(contrib["name"])
+    except Exception:
+        pass
+
+print("%d bindings on UDP" % len(UDP.payload_guess))
+
+N = 10000
+raw_packets = [
+    raw(IP() / UDP(sport=5353, dport=5353) / DNS()),
+    raw(IP() / UDP(sport=12345, dport=4789) / VXLAN() / Ether()),
+    raw(IP() / UDP(sport=12345, dport=54321) / Raw(b"X" * 20)),
+]
+
+for raw_packet in raw_packets:
+    p = IP(raw_packet)
+    start = time.time()
+    for i in range(N):
+        p.payload.guess_payload_class(raw_packet[28:])
+    print("Guess %s - %.2fs" % (p.payload.payload.__class__.__name__,
+                                time.time() - start))
+
+start = time.time()
+for i in range(N):
+    for raw_packet in raw_packets:
+        IP(raw_packet)
+print("Dissect - %.2fs" % (time.time() - start))